@@ -0,0 +1,296 @@
+"""
+Timing benchmarks for the simulation engine.
+
+Usage:
+    python benchmarks.py terrain [--sizes 100 360 1020 1380] [--reference]
+    python benchmarks.py noise [--sizes 1020 1380 2048] [--octaves 6]
+    python benchmarks.py chunks [--sizes 360 1020 1380]
+    python benchmarks.py workers [--sizes 1020 1380] [--max-workers N]
+    python benchmarks.py pipeline [--sizes 360 1020 1380]
+    python benchmarks.py hydrology [--sizes 100 360 1020 1380] [--iterations 10]
+    python benchmarks.py memory [--sizes 360 1020 1380] [--precisions float16 float32 float64]
+    python benchmarks.py weather [--sizes 100 360 1020 1380] [--steps 100]
+    python benchmarks.py render [--sizes 100 1380] [--frames 60]
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+import pygame
+from engine.config import Config
+from engine.world import World
+from engine.terrain_generator import TerrainGenerator
+from engine.utils import NoiseGenerator
+from engine.weather_system import WeatherSystem
+from engine import hydrology
+
+# World sizes from the design notes, plus the default test map
+WORLD_SIZES = {'default': 100, 'small': 360, 'medium': 1020, 'large': 1380}
+
+def _sized_config(size: int) -> Config:
+    """Create a Config for a square world of the given size, with generation caches off"""
+    config = Config()
+    config.WORLD.WORLD_WIDTH = size
+    config.WORLD.WORLD_HEIGHT = size
+    config.WORLD.CACHE_WORLD = False
+    config.WORLD.STAGE_CACHE_BUDGET = 0
+    return config
+
+def _reference_terrain(generator: TerrainGenerator) -> dict:
+    """Per-cell terrain pipeline, kept as the baseline for timing comparisons"""
+    width, height = generator.width, generator.height
+    noise = generator.elevation_noise
+    low, high = generator.ELEVATION_RANGE
+    scale = 50.0
+
+    elevation = np.zeros((height, width))
+    for y in range(height):
+        for x in range(width):
+            value = 0
+            amplitude = 1.0
+            frequency = 1.0
+            max_value = 0
+            for offset_x, offset_y in noise.octave_offsets[:6]:
+                value += noise.noise2d(x / scale * frequency + offset_x,
+                                       y / scale * frequency + offset_y) * amplitude
+                max_value += amplitude
+                amplitude *= 0.5
+                frequency *= 2.0
+            elevation[y, x] = min(1.0, max(0.0, (value / max_value - low) / (high - low)))
+
+    temperature = np.zeros((height, width))
+    for y in range(height):
+        base_temp = 1.0 - abs(y - height/2) / (height/2)
+        for x in range(width):
+            temperature[y, x] = base_temp * (1.0 - elevation[y, x])
+
+    moisture = np.zeros((height, width))
+    for y in range(height):
+        for x in range(width):
+            base_moisture = generator.moisture_noise.noise2d(x/30.0, y/30.0)
+            moisture[y, x] = (base_moisture + 1.0 - elevation[y, x]) / 2
+
+    return {"elevation": elevation, "temperature": temperature, "moisture": moisture}
+
+def _vectorized_terrain(generator: TerrainGenerator) -> dict:
+    """Whole-array terrain stages as used by World"""
+    xs = np.arange(generator.width)
+    ys = np.arange(generator.height)[:, np.newaxis]
+    elevation = generator._generate_elevation(xs, ys)
+    return {
+        "elevation": elevation,
+        "temperature": generator._generate_temperature(ys, elevation),
+        "moisture": generator._generate_moisture(xs, ys, elevation)
+    }
+
+def _time(func, *args) -> float:
+    """Return the wall-clock time of a single call in seconds"""
+    return _time_result(func, *args)[0]
+
+def _time_result(func, *args):
+    """Return (seconds, result) for a single call"""
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def bench_terrain(sizes, reference: bool) -> None:
+    """Time the elevation, temperature and moisture stages at each world size"""
+    print(f"{'size':>10} {'vectorized':>12} {'per-cell':>12} {'speedup':>9} {'max diff':>10}")
+    for size in sizes:
+        generator = TerrainGenerator(_sized_config(size))
+        vectorized, layers = _time_result(_vectorized_terrain, generator)
+
+        if reference:
+            per_cell, expected = _time_result(_reference_terrain, generator)
+            diff = max(np.abs(layers[name] - expected[name]).max() for name in expected)
+            print(f"{size:>5}x{size:<4} {vectorized*1000:>10.1f}ms {per_cell*1000:>10.1f}ms "
+                  f"{per_cell/vectorized:>8.0f}x {diff:>10.2e}")
+        else:
+            print(f"{size:>5}x{size:<4} {vectorized*1000:>10.1f}ms {'-':>12} {'-':>9} {'-':>10}")
+
+def bench_noise(sizes, octaves: int) -> None:
+    """Time batched fractal Perlin noise over full coordinate grids"""
+    noise = NoiseGenerator(0)
+    print(f"{'size':>10} {'tiles':>10} {'time':>10} {'ns/tile':>9}")
+    for size in sizes:
+        xs = np.arange(size) / 50.0
+        ys = (np.arange(size) / 50.0)[:, np.newaxis]
+        elapsed = _time(noise.fractal2d, xs, ys, octaves)
+        print(f"{size:>5}x{size:<4} {size*size:>10} {elapsed*1000:>8.1f}ms "
+              f"{elapsed / (size*size) * 1e9:>9.1f}")
+
+def bench_chunks(sizes) -> None:
+    """Time lazy-chunk startup and first viewport fetch, and report resident memory"""
+    print(f"{'size':>10} {'startup':>10} {'viewport':>10} {'resident':>10} {'full map':>10}")
+    for size in sizes:
+        config = _sized_config(size)
+        config.WORLD.LAZY_CHUNKS = True
+        startup, world = _time_result(World, config)
+
+        # One screen of tiles at default zoom, in the middle of the map
+        view_w = config.SCREEN_WIDTH // config.WORLD.TILE_SIZE
+        view_h = config.SCREEN_HEIGHT // config.WORLD.TILE_SIZE
+        x0, y0 = size // 2, size // 2
+        viewport = _time(world.get_region, "biomes", x0, y0, x0 + view_w, y0 + view_h)
+
+        # Bytes per tile across all layers of a generated chunk
+        chunk = next(iter(world.chunks.chunks.values()))
+        full_map = chunk.nbytes / chunk.layers["biomes"].size * size * size
+        print(f"{size:>5}x{size:<4} {startup*1000:>8.2f}ms {viewport*1000:>8.1f}ms "
+              f"{world.chunks.resident_bytes/1024:>8.0f}KB {full_map/1024**2:>8.1f}MB")
+
+def bench_workers(sizes, max_workers: int) -> None:
+    """Time full world generation with 1 to max_workers generation processes"""
+    print(f"{'size':>10} {'workers':>8} {'time':>10} {'speedup':>9}")
+    for size in sizes:
+        baseline = None
+        for workers in range(1, max_workers + 1):
+            config = _sized_config(size)
+            config.WORLD.GENERATION_WORKERS = workers
+            elapsed = _time(World, config)
+            baseline = baseline or elapsed
+            print(f"{size:>5}x{size:<4} {workers:>8} {elapsed*1000:>8.0f}ms "
+                  f"{baseline/elapsed:>8.2f}x")
+
+def bench_pipeline(sizes) -> None:
+    """Time full generation against regeneration after late-stage parameter changes"""
+    print(f"{'size':>10} {'full':>10} {'resources':>10} {'biomes':>10}")
+    for size in sizes:
+        config = _sized_config(size)
+        config.WORLD.STAGE_CACHE_BUDGET = Config().WORLD.STAGE_CACHE_BUDGET
+        full, world = _time_result(World, config)
+
+        config.WORLD.RESOURCE_CHANCE *= 2
+        resources = _time(world.regenerate)
+
+        config.BIOME_THRESHOLDS = dict(config.BIOME_THRESHOLDS)
+        config.BIOME_THRESHOLDS["SWAMP"] = {"temp": (5, 30), "moisture": (0.65, 1.0),
+                                            "elevation": (0, 250)}
+        biomes = _time(world.regenerate)
+        print(f"{size:>5}x{size:<4} {full*1000:>8.0f}ms {resources*1000:>8.0f}ms "
+              f"{biomes*1000:>8.0f}ms")
+
+def bench_hydrology(sizes, iterations: int) -> None:
+    """Time depression filling and routing, flow accumulation, erosion and the full flow stage"""
+    print(f"{'size':>10} {'route':>9} {'accumulate':>11} {'erode/iter':>11} {'flow stage':>11}")
+    for size in sizes:
+        config = _sized_config(size)
+        generator = TerrainGenerator(config)
+        layers = generator.generate_region(0, 0, size, size)
+        elevation, moisture = layers["elevation"], layers["moisture"]
+
+        route, (_, receivers) = _time_result(hydrology.route_flow, elevation)
+        accumulate, flow = _time_result(hydrology.flow_accumulation, receivers, moisture)
+        erode = _time(hydrology.erode, elevation, receivers, flow, iterations, config.WORLD.EROSION_RATE)
+        stage = _time(hydrology.simulate_flow, elevation, moisture, iterations,
+                      config.WORLD.EROSION_RATE)
+        print(f"{size:>5}x{size:<4} {route*1000:>7.0f}ms {accumulate*1000:>9.0f}ms "
+              f"{erode/max(1, iterations)*1000:>9.1f}ms {stage*1000:>9.0f}ms")
+
+def bench_memory(sizes, precisions) -> None:
+    """Report per-layer memory of fully generated worlds at each layer precision"""
+    for size in sizes:
+        for precision in precisions:
+            config = _sized_config(size)
+            config.WORLD.LAYER_PRECISION = precision
+            report = World(config).memory_report()
+            layers = " ".join(f"{name}={nbytes/1024**2:.1f}MB" for name, nbytes in report.items())
+            print(f"{size:>5}x{size:<4} {precision:>8} {layers}")
+
+def bench_weather(sizes, steps: int) -> None:
+    """Time weather steps and a viewport sample, which shouldn't depend on world size"""
+    for size in sizes:
+        weather = WeatherSystem(_sized_config(size), size, size)
+        step = _time(lambda: [weather.step(minute) for minute in range(steps)]) / steps
+        viewport = _time(weather.sample_region, "temperature_offset", 0, 0, 32, 24)
+        print(f"{size:>5}x{size:<4} step {step*1000:>7.3f}ms  32x24 sample {viewport*1000:>7.3f}ms")
+
+def bench_render(sizes, frames: int) -> None:
+    """
+    Time terrain frames at each zoom level in each render mode: the first
+    frame (which bakes chunk surfaces), then warm frames
+    """
+    for size in sizes:
+        config = _sized_config(size)
+        world = World(config)
+        screen = pygame.Surface((config.DISPLAY.SCREEN_WIDTH, config.DISPLAY.SCREEN_HEIGHT))
+        for mode in ("chunks", "palette"):
+            config.DISPLAY.TERRAIN_RENDER_MODE = mode
+            for zoom in config.DISPLAY.ZOOM_LEVELS:
+                tile_size = config.WORLD.TILE_SIZE * zoom
+                area = pygame.Rect(0, 0, screen.get_width() / tile_size, screen.get_height() / tile_size)
+                first = _time(world.render, screen, area, zoom, 0, 0)
+                warm = _time(lambda: [world.render(screen, area, zoom, 0, 0) for _ in range(frames)]) / frames
+                print(f"{size:>5}x{size:<4} {mode:>7} zoom {zoom:<5} first {first*1000:>7.2f}ms  "
+                      f"warm {warm*1000:>6.2f}ms ({1/warm:>6.0f} fps)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulation engine benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    terrain = subparsers.add_parser("terrain", help="World terrain generation stages")
+    terrain.add_argument("--sizes", type=int, nargs="+",
+                         default=list(WORLD_SIZES.values()))
+    terrain.add_argument("--reference", action="store_true",
+                         help="Also time the per-cell reference pipeline (slow)")
+
+    noise = subparsers.add_parser("noise", help="Batched fractal Perlin noise")
+    noise.add_argument("--sizes", type=int, nargs="+", default=[1020, 1380, 2048])
+    noise.add_argument("--octaves", type=int, default=6)
+
+    chunks = subparsers.add_parser("chunks", help="Lazily generated chunked worlds")
+    chunks.add_argument("--sizes", type=int, nargs="+",
+                        default=[WORLD_SIZES['small'], WORLD_SIZES['medium'], WORLD_SIZES['large']])
+
+    workers = subparsers.add_parser("workers", help="Multi-process world generation")
+    workers.add_argument("--sizes", type=int, nargs="+",
+                         default=[WORLD_SIZES['medium'], WORLD_SIZES['large']])
+    workers.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+
+    pipeline = subparsers.add_parser("pipeline", help="Incremental regeneration after parameter changes")
+    pipeline.add_argument("--sizes", type=int, nargs="+",
+                          default=[WORLD_SIZES['small'], WORLD_SIZES['medium'], WORLD_SIZES['large']])
+
+    hydrology_parser = subparsers.add_parser("hydrology", help="Drainage and erosion")
+    hydrology_parser.add_argument("--sizes", type=int, nargs="+",
+                                  default=list(WORLD_SIZES.values()))
+    hydrology_parser.add_argument("--iterations", type=int, default=Config().WORLD.EROSION_ITERATIONS)
+
+    memory = subparsers.add_parser("memory", help="Per-layer world memory by precision")
+    memory.add_argument("--sizes", type=int, nargs="+",
+                        default=[WORLD_SIZES['small'], WORLD_SIZES['medium'], WORLD_SIZES['large']])
+    memory.add_argument("--precisions", nargs="+", default=["float16", "float32", "float64"])
+
+    weather = subparsers.add_parser("weather", help="Coarse-grid weather steps and sampling")
+    weather.add_argument("--sizes", type=int, nargs="+",
+                         default=list(WORLD_SIZES.values()))
+    weather.add_argument("--steps", type=int, default=100)
+
+    render = subparsers.add_parser("render", help="Terrain rendering per zoom level")
+    render.add_argument("--sizes", type=int, nargs="+",
+                        default=[WORLD_SIZES['default'], WORLD_SIZES['large']])
+    render.add_argument("--frames", type=int, default=60)
+
+    args = parser.parse_args()
+    if args.benchmark == "terrain":
+        bench_terrain(args.sizes, args.reference)
+    elif args.benchmark == "noise":
+        bench_noise(args.sizes, args.octaves)
+    elif args.benchmark == "chunks":
+        bench_chunks(args.sizes)
+    elif args.benchmark == "workers":
+        bench_workers(args.sizes, args.max_workers)
+    elif args.benchmark == "pipeline":
+        bench_pipeline(args.sizes)
+    elif args.benchmark == "hydrology":
+        bench_hydrology(args.sizes, args.iterations)
+    elif args.benchmark == "memory":
+        bench_memory(args.sizes, args.precisions)
+    elif args.benchmark == "weather":
+        bench_weather(args.sizes, args.steps)
+    elif args.benchmark == "render":
+        bench_render(args.sizes, args.frames)
+
+if __name__ == "__main__":
+    main()
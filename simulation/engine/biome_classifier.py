@@ -0,0 +1,173 @@
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from .config import Config
+
+class BiomeClassifier:
+    """
+    Biome classification compiled into a lookup table.
+
+    Each axis (temperature, moisture, elevation) is quantized into cells split at
+    every threshold boundary: odd cells hold a boundary value exactly and even
+    cells the open interval between two boundaries. Every value in a cell matches
+    the same threshold ranges, so a (temp, moisture, elevation) cell table gives
+    exactly the first-match result of checking BIOME_THRESHOLDS in order.
+
+    Finding a value's cell is sped up with a uniform pre-binning of each axis:
+    fine bins that are not near any boundary map straight to a cell, and only
+    values in bins near a boundary fall back to an exact binary search.
+    """
+    # Multiplier from normalized elevation to the meters used by the thresholds
+    ELEVATION_SCALE = 3000
+    # Uniform pre-bins per axis
+    AXIS_BINS = 4096
+
+    def __init__(self, thresholds: Dict[str, Dict[str, Tuple[float, float]]],
+                 min_temperature: float, max_temperature: float):
+        self.min_temperature = min_temperature
+        self.max_temperature = max_temperature
+
+        # Shared index <-> name mapping
+        self.names: List[str] = list(thresholds.keys())
+        self.indices: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+
+        self.temp_edges = self._edges(t["temp"] for t in thresholds.values())
+        self.moisture_edges = self._edges(t["moisture"] for t in thresholds.values())
+        self.elevation_edges = self._edges(t["elevation"] for t in thresholds.values())
+        self.table = self._compile(thresholds)
+        self.flat_table = self.table.ravel()
+
+        # Pre-binning per axis in the units of the normalized input layers; cell
+        # offsets are premultiplied by the axis stride into the flattened table
+        temp_span = max_temperature - min_temperature
+        _, moisture_cells, elevation_cells = self.table.shape
+        self.temp_bins = self._axis_bins(
+            (self.temp_edges - min_temperature) / temp_span, moisture_cells * elevation_cells)
+        self.moisture_bins = self._axis_bins(self.moisture_edges, elevation_cells)
+        self.elevation_bins = self._axis_bins(self.elevation_edges / self.ELEVATION_SCALE, 1)
+
+    def classify(self, temperature: np.ndarray, moisture: np.ndarray,
+                 elevation: np.ndarray) -> np.ndarray:
+        """Classify normalized temperature, moisture and elevation arrays into biome indices"""
+        index = self._cell_offsets(temperature, self.temp_bins, self._temp_cells)
+        index += self._cell_offsets(moisture, self.moisture_bins, self._moisture_cells)
+        index += self._cell_offsets(elevation, self.elevation_bins, self._elevation_cells)
+        return self.flat_table[index]
+
+    def _temp_cells(self, temperature: np.ndarray) -> np.ndarray:
+        """Exact temperature cells"""
+        # Convert to actual temperature range
+        actual_temp = self.min_temperature + \
+                      temperature * (self.max_temperature - self.min_temperature)
+        return self._quantize(actual_temp, self.temp_edges)
+
+    def _moisture_cells(self, moisture: np.ndarray) -> np.ndarray:
+        """Exact moisture cells"""
+        return self._quantize(moisture, self.moisture_edges)
+
+    def _elevation_cells(self, elevation: np.ndarray) -> np.ndarray:
+        """Exact elevation cells"""
+        return self._quantize(elevation * self.ELEVATION_SCALE, self.elevation_edges)
+
+    def _axis_bins(self, edges: np.ndarray, stride: int) -> Tuple[float, float, np.ndarray, int]:
+        """
+        Build the pre-binning for one axis from its edges in input units.
+        Bin 0 holds values below the first edge, the last bin values above the
+        last one. Bins within two bins of an edge are marked -1 (ambiguous).
+        """
+        origin = edges[0]
+        width = (edges[-1] - origin) / self.AXIS_BINS or 1.0
+        count = self.AXIS_BINS + 3
+
+        # Cells of bin midpoints, found in input units without the unit conversion
+        midpoints = origin + (np.arange(count) - 0.5) * width
+        offsets = (np.searchsorted(edges, midpoints) * 2).astype(np.intp)
+        offsets[0] = 0
+        offsets[-1] = 2 * len(edges)
+        offsets *= stride
+
+        for edge in edges:
+            edge_bin = int(np.floor((edge - origin) / width)) + 1
+            offsets[max(0, edge_bin - 2):edge_bin + 3] = -1
+        return origin, 1.0 / width, offsets, stride
+
+    @staticmethod
+    def _cell_offsets(values: np.ndarray, bins: Tuple[float, float, np.ndarray, int],
+                      exact_cells) -> np.ndarray:
+        """Flattened-table offsets for one axis, resolving ambiguous bins exactly"""
+        origin, inverse_width, offsets, stride = bins
+        # Half precision can't resolve fine bins; widen before binning
+        if values.dtype.itemsize < 4:
+            values = values.astype(np.float32)
+        bin_index = ((values - origin) * inverse_width).astype(np.intp)
+        bin_index += 1
+        np.clip(bin_index, 0, len(offsets) - 1, out=bin_index)
+
+        result = offsets[bin_index]
+        ambiguous = result < 0
+        if ambiguous.any():
+            result[ambiguous] = exact_cells(values[ambiguous]) * stride
+        return result
+
+    def name_of(self, index: int) -> str:
+        """Get the biome name for an index"""
+        return self.names[index]
+
+    def index_of(self, name: str) -> int:
+        """Get the biome index for a name"""
+        return self.indices[name]
+
+    def _compile(self, thresholds: Dict[str, Dict[str, Tuple[float, float]]]) -> np.ndarray:
+        """Evaluate the threshold rules once at a representative value of every cell"""
+        temp = self._representatives(self.temp_edges)[:, np.newaxis, np.newaxis]
+        moisture = self._representatives(self.moisture_edges)[np.newaxis, :, np.newaxis]
+        elevation = self._representatives(self.elevation_edges)[np.newaxis, np.newaxis, :]
+
+        # Unmatched cells fall back to index 0; apply rules last to first so the
+        # first matching biome wins
+        table = np.zeros((len(temp), moisture.shape[1], elevation.shape[2]), dtype=np.uint8)
+        for index in reversed(range(len(self.names))):
+            rule = thresholds[self.names[index]]
+            match = ((rule["temp"][0] <= temp) & (temp <= rule["temp"][1]) &
+                     (rule["moisture"][0] <= moisture) & (moisture <= rule["moisture"][1]) &
+                     (rule["elevation"][0] <= elevation) & (elevation <= rule["elevation"][1]))
+            table[match] = index
+        return table
+
+    @staticmethod
+    def _edges(ranges: Iterable[Tuple[float, float]]) -> np.ndarray:
+        """Sorted unique boundary values along one axis"""
+        return np.unique(np.array([bound for r in ranges for bound in r], dtype=np.float64))
+
+    @staticmethod
+    def _quantize(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+        """Map values to axis cells: 2i between edges, 2i + 1 exactly on edge i"""
+        i = np.searchsorted(edges, values, side='left')
+        on_edge = edges[np.minimum(i, len(edges) - 1)] == values
+        return 2 * i + on_edge
+
+    @staticmethod
+    def _representatives(edges: np.ndarray) -> np.ndarray:
+        """One value inside each axis cell, in cell order"""
+        bounds = np.concatenate([[edges[0] - 1], edges, [edges[-1] + 1]])
+        representatives = np.empty(2 * len(edges) + 1)
+        representatives[0::2] = (bounds[:-1] + bounds[1:]) / 2
+        representatives[1::2] = edges
+        return representatives
+
+def get_biome_classifier(config: Config) -> BiomeClassifier:
+    """Get the shared classifier for a config's biome thresholds and temperature range"""
+    key = tuple(
+        (name, tuple(rule["temp"]), tuple(rule["moisture"]), tuple(rule["elevation"]))
+        for name, rule in config.BIOME_THRESHOLDS.items()
+    )
+    return _cached_classifier(key, config.WORLD.MIN_TEMPERATURE, config.WORLD.MAX_TEMPERATURE)
+
+@lru_cache(maxsize=16)
+def _cached_classifier(key: tuple, min_temperature: float, max_temperature: float) -> BiomeClassifier:
+    """Build a classifier once per distinct set of thresholds"""
+    thresholds = {
+        name: {"temp": temp, "moisture": moisture, "elevation": elevation}
+        for name, temp, moisture, elevation in key
+    }
+    return BiomeClassifier(thresholds, min_temperature, max_temperature)
@@ -0,0 +1,120 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple
+import numpy as np
+from .terrain_generator import TerrainGenerator
+
+@dataclass
+class Chunk:
+    """A square block of world tiles holding every layer for that area"""
+    chunk_x: int
+    chunk_y: int
+    layers: Dict[str, np.ndarray] = field(default_factory=dict)
+    dirty: bool = False  # Modified since generation, so it can't be regenerated
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the chunk's layer arrays"""
+        return sum(layer.nbytes for layer in self.layers.values())
+
+class ChunkManager:
+    """
+    Lazily generates world chunks on first access and keeps them in an LRU
+    cache bounded by a memory budget. Generation is deterministic per
+    (seed, chunk_x, chunk_y), so an evicted chunk regenerates identically.
+    Dirty chunks are never evicted.
+    """
+    def __init__(self, generator: TerrainGenerator, chunk_size: int,
+                 width: int, height: int, memory_budget: int):
+        self.generator = generator
+        self.chunk_size = chunk_size
+        self.width = width
+        self.height = height
+        self.memory_budget = memory_budget
+
+        self.chunks: "OrderedDict[Tuple[int, int], Chunk]" = OrderedDict()
+        self.resident_bytes = 0
+
+        # Counters for tuning the memory budget
+        self.generated_count = 0
+        self.evicted_count = 0
+        
+        # Called with each newly generated chunk
+        self.on_generate: Optional[Callable[[Chunk], None]] = None
+
+    def get_chunk(self, chunk_x: int, chunk_y: int) -> Chunk:
+        """Get a chunk, generating it if it isn't resident"""
+        key = (chunk_x, chunk_y)
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+
+        # Clip border chunks to the world bounds
+        x0 = chunk_x * self.chunk_size
+        y0 = chunk_y * self.chunk_size
+        width = min(self.chunk_size, self.width - x0)
+        height = min(self.chunk_size, self.height - y0)
+
+        chunk = Chunk(chunk_x, chunk_y, self.generator.generate_region(x0, y0, width, height))
+        self.chunks[key] = chunk
+        self.resident_bytes += chunk.nbytes
+        self.generated_count += 1
+
+        self._evict_cold_chunks()
+        if self.on_generate is not None:
+            self.on_generate(chunk)
+        return chunk
+
+    def get_tile(self, layer: str, x: int, y: int):
+        """Get a single layer value at world coordinates"""
+        chunk = self.get_chunk(x // self.chunk_size, y // self.chunk_size)
+        return chunk.layers[layer][y % self.chunk_size, x % self.chunk_size]
+
+    def get_region(self, layer: str, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """Assemble a layer for the tile rectangle [x0, x1) x [y0, y1) from its chunks"""
+        size = self.chunk_size
+        region = None
+
+        for chunk_y in range(y0 // size, (y1 - 1) // size + 1):
+            for chunk_x in range(x0 // size, (x1 - 1) // size + 1):
+                data = self.get_chunk(chunk_x, chunk_y).layers[layer]
+                if region is None:
+                    region = np.empty((y1 - y0, x1 - x0), dtype=data.dtype)
+
+                # Overlap between this chunk and the requested rectangle
+                left = max(x0, chunk_x * size)
+                top = max(y0, chunk_y * size)
+                right = min(x1, chunk_x * size + data.shape[1])
+                bottom = min(y1, chunk_y * size + data.shape[0])
+
+                region[top - y0:bottom - y0, left - x0:right - x0] = \
+                    data[top - chunk_y * size:bottom - chunk_y * size,
+                         left - chunk_x * size:right - chunk_x * size]
+
+        return region
+
+    def mark_dirty(self, chunk_x: int, chunk_y: int) -> None:
+        """Pin a modified chunk so it is never evicted"""
+        self.get_chunk(chunk_x, chunk_y).dirty = True
+
+    def clear(self) -> None:
+        """Drop every chunk, including dirty ones, so they regenerate on next access"""
+        self.chunks.clear()
+        self.resident_bytes = 0
+
+    def _evict_cold_chunks(self) -> None:
+        """Evict least recently used clean chunks until within the memory budget"""
+        if self.resident_bytes <= self.memory_budget:
+            return
+
+        # Never evict the most recently used chunk, which the caller is about to read
+        for key in list(self.chunks.keys())[:-1]:
+            if self.resident_bytes <= self.memory_budget:
+                break
+            chunk = self.chunks[key]
+            if chunk.dirty:
+                continue
+            del self.chunks[key]
+            self.resident_bytes -= chunk.nbytes
+            self.evicted_count += 1
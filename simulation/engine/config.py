@@ -47,16 +47,51 @@ class WorldConfig:
     CHUNK_SIZE: int = 16
     WORLD_WIDTH: int = 100
     WORLD_HEIGHT: int = 100
+    SEED: int = 0
+    LAZY_CHUNKS: bool = False  # Generate chunks on first access instead of up front
+    CHUNK_MEMORY_BUDGET: int = 64 * 1024 * 1024  # Bytes of resident chunks before eviction
+    GENERATION_WORKERS: int = 1  # Processes used to generate the world up front
+    CACHE_WORLD: bool = True  # Reuse generated worlds from data/world_cache
+    WORLD_CACHE_BUDGET: int = 1024 * 1024 * 1024  # Bytes of layers kept in data/world_cache
+    STAGE_CACHE_BUDGET: int = 256 * 1024 * 1024  # Bytes of generation stage outputs kept in memory
+    RESOURCE_CHANCE: float = 0.1  # Chance of a resource on a tile whose biome has any
+    EROSION_ITERATIONS: int = 10  # Fluvial erosion passes before final drainage
+    EROSION_RATE: float = 0.01  # Stream-power erosion coefficient
+    RIVER_MIN_FLOW: float = 100.0  # Accumulated flow (tiles of rainfall) that makes a river
+    LAYER_PRECISION: str = "float32"  # float16, float32 or float64 for continuous layers
     MIN_TEMPERATURE: float = -50.0
     MAX_TEMPERATURE: float = 45.0
 
+@dataclass
+class WeatherConfig:
+    GRID_WIDTH: int = 32  # Weather cells across the map, whatever its size in tiles
+    GRID_HEIGHT: int = 32
+    UPDATE_MINUTES: int = 10  # Game minutes between weather steps
+    MAX_CATCHUP_STEPS: int = 6  # Steps run at most per update after a time jump
+    PREVAILING_WIND: Tuple[float, float] = (0.4, 0.1)  # Grid cells per step (x, y)
+    WIND_VARIABILITY: float = 0.6  # Noise-driven wind on top of the prevailing wind
+    DIFFUSION: float = 0.15  # Fraction mixed with the neighbor mean per step
+    EVAPORATION: float = 0.03  # Humidity picked up from surface moisture per step
+    CONDENSATION_THRESHOLD: float = 0.65  # Humidity above which clouds form
+    RAIN_THRESHOLD: float = 0.5  # Cloud cover above which it rains
+    DAILY_TEMPERATURE_SWING: float = 6.0  # Degrees of day/night temperature offset
+
 @dataclass
 class DisplayConfig:
     SCREEN_WIDTH: int = 1024
     SCREEN_HEIGHT: int = 768
     FPS: int = 60
-    ZOOM_LEVELS: List[float] = (0.5, 1.0, 2.0)
+    ZOOM_LEVELS: List[float] = (1/128, 1/64, 1/32, 1/16, 0.125, 0.25, 0.5, 1.0, 2.0)  # Below 1/32, tiles are under a pixel
     DEFAULT_ZOOM: float = 1.0
+    TERRAIN_CACHE_BUDGET: int = 64 * 1024 * 1024  # Bytes of pre-rendered terrain chunk surfaces
+    TERRAIN_RENDER_MODE: str = "auto"  # "chunks", "palette", or "auto" to pick by tile size
+    PALETTE_MAX_TILE_SIZE: int = 8  # Largest tile in pixels drawn by the palette mode under "auto"
+    SHOW_MINIMAP: bool = True
+    SPRITE_CACHE_SIZE: int = 4096  # Scaled entity animation frames kept across all zoom levels
+    ANIMATION_MINUTES_PER_FRAME: int = 1  # Game minutes each entity animation frame is shown
+    STREAM_JPEG_QUALITY: int = 70  # Quality of frames streamed to browsers at /stream
+    STREAM_QUEUE_SIZE: int = 1  # Frames waiting for the encoder thread before the oldest is dropped
+    MINIMAP_SIZE: int = 160  # Pixels on the minimap's longer side
 
 @dataclass
 class Config:
@@ -64,6 +99,7 @@ class Config:
     def __init__(self):
         self.TIME = TimeConfig()
         self.WORLD = WorldConfig()
+        self.WEATHER = WeatherConfig()
         self.DISPLAY = DisplayConfig()
         
         # Biome temperature and moisture thresholds
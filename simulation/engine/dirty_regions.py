@@ -0,0 +1,53 @@
+from typing import List
+import pygame
+
+class DirtyRegions:
+    """
+    Screen rectangles that changed since the last frame.
+
+    Rectangles are clipped to the screen as they are marked, and merged when
+    taken: overlapping ones are joined into their union. When the merged
+    rectangles are too many, or cover most of the screen, the whole screen is
+    reported instead, since one large redraw is then cheaper than many small
+    ones.
+    """
+    def __init__(self, bounds: pygame.Rect, max_rects: int = 64, max_coverage: float = 0.5):
+        self.bounds = pygame.Rect(bounds)
+        self.max_rects = max_rects
+        self.max_coverage = max_coverage
+        self.rects: List[pygame.Rect] = []
+        self.full = False
+
+    def mark(self, rect) -> None:
+        """Mark a screen rectangle as changed"""
+        rect = pygame.Rect(rect).clip(self.bounds)
+        if rect.width > 0 and rect.height > 0:
+            self.rects.append(rect)
+
+    def mark_all(self) -> None:
+        """Mark the whole screen as changed"""
+        self.full = True
+
+    def take(self) -> List[pygame.Rect]:
+        """Get the merged changed rectangles and start a new frame"""
+        rects = [self.bounds.copy()] if self.full else self._merge(self.rects)
+        self.rects = []
+        self.full = False
+
+        area = sum(rect.width * rect.height for rect in rects)
+        if len(rects) > self.max_rects or area > self.max_coverage * self.bounds.width * self.bounds.height:
+            return [self.bounds.copy()]
+        return rects
+
+    @staticmethod
+    def _merge(rects: List[pygame.Rect]) -> List[pygame.Rect]:
+        """Join overlapping rectangles until none overlap"""
+        merged: List[pygame.Rect] = []
+        for rect in rects:
+            # Absorb every merged rectangle this one touches; the union may touch more
+            index = rect.collidelist(merged)
+            while index != -1:
+                rect = rect.union(merged.pop(index))
+                index = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
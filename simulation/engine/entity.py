@@ -1,4 +1,5 @@
 import random
+import zlib
 from typing import Dict, List, Optional, Tuple
 import pygame
 import networkx as nx
@@ -125,30 +126,35 @@ class Entity:
         return {skill: 0 for skill in self.config.SKILL_CONFIG}
 
     def _generate_sprite(self) -> pygame.Surface:
-        """Generate a procedural pixel sprite based on DNA traits"""
-        from .sprite_generator import SpriteGenerator
+        """Get the procedural pixel sprite for the entity's DNA traits, shared by identical DNA"""
+        from .sprite_store import get_sprite_store
         
-        # Create sprite generator with size based on DNA height
-        size = int(16 * self.dna.height)  # Base size modified by height
-        generator = SpriteGenerator(size)
+        # Sprite size based on DNA height
+        size = max(1, int(16 * self.dna.height))  # Base size modified by height
         
-        # Use entity ID as seed for consistent generation
-        seed = hash(str(self.dna.height) + str(self.dna.skin_tone) + str(self.dna.hair_color))
+        # Seed from the appearance traits, stable across runs so saved sprite sheets match
+        traits = str(self.dna.height) + str(self.dna.skin_tone) + str(self.dna.hair_color)
+        seed = zlib.crc32(traits.encode())
         
-        # Generate base sprite
-        sprite = generator.generate_sprite(seed)
+        # The sprite store's key, also naming the frames for web viewers and snapshots
+        self.sprite_seed = seed
+        self.sprite_size = size
+        self.sprite_key = f"{seed}_{size}"
         
-        # Generate animation frames
-        self.animation_frames = generator.generate_animation_frames(sprite)
+        # Base sprite and animation frames (base first)
+        self.animation_frames = get_sprite_store().get(seed, size)
         self.current_frame = 0
         
-        return sprite
+        return self.animation_frames[0]
 
     def update(self, world, time_system) -> None:
         """Update entity state for the current tick"""
         if not self.alive:
             return
             
+        # Animation follows simulation time, so it pauses and speeds up with the game
+        self._advance_animation(time_system)
+        
         # Update needs
         self._update_needs()
         
@@ -161,6 +167,12 @@ class Entity:
         # Age and check for death conditions
         self._check_survival()
 
+    def _advance_animation(self, current_time) -> None:
+        """Pick the animation frame for the current game time"""
+        minutes = current_time.to_minutes(self.config.TIME)
+        step = minutes // self.config.DISPLAY.ANIMATION_MINUTES_PER_FRAME
+        self.current_frame = step % len(self.animation_frames)
+
     def _update_needs(self) -> None:
         """Update all needs based on decay rates"""
         for need, value in self.needs.items():
@@ -244,28 +256,34 @@ class Entity:
         })
 
     def render(self, screen: pygame.Surface, camera_x: int, 
-              camera_y: int, zoom: float) -> None:
-        """Render the entity on the screen with animation"""
+              camera_y: int, zoom: float, sprite_cache=None) -> None:
+        """Render the entity's current animation frame, scaled through sprite_cache if given"""
+        sprite = self.get_sprite(camera_x, camera_y, zoom, sprite_cache)
+        if sprite is not None:
+            screen.blit(*sprite)
+
+    def get_sprite(self, camera_x: float, camera_y: float, zoom: float,
+                   sprite_cache=None) -> Optional[Tuple[pygame.Surface, pygame.Rect]]:
+        """Get the scaled current frame and the screen area it covers, or None if nothing is drawn"""
         if not self.alive:
-            return
+            return None
             
         # Calculate screen position
         screen_x = int((self.x - camera_x) * self.config.WORLD.TILE_SIZE * zoom)
         screen_y = int((self.y - camera_y) * self.config.WORLD.TILE_SIZE * zoom)
         
-        # Get current animation frame
-        current_sprite = self.animation_frames[self.current_frame]
-        
-        # Update animation frame (cycle through frames)
-        self.current_frame = (self.current_frame + 1) % len(self.animation_frames)
-        
         # Scale sprite based on zoom
-        scaled_size = int(current_sprite.get_width() * zoom)
-        scaled_sprite = pygame.transform.scale(
-            current_sprite, (scaled_size, scaled_size))
+        if sprite_cache is not None:
+            scaled_sprite = sprite_cache.get(self.animation_frames, self.current_frame, zoom)
+        else:
+            current_sprite = self.animation_frames[self.current_frame]
+            scaled_size = int(current_sprite.get_width() * zoom)
+            scaled_sprite = pygame.transform.scale(
+                current_sprite, (scaled_size, scaled_size)) if scaled_size > 0 else None
         
-        # Draw sprite
-        screen.blit(scaled_sprite, (screen_x, screen_y))
+        if scaled_sprite is None:
+            return None
+        return scaled_sprite, scaled_sprite.get_rect(topleft=(screen_x, screen_y))
 
     def _check_survival(self) -> None:
         """Check if entity should die based on health and needs"""
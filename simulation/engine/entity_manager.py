@@ -3,6 +3,7 @@ import pygame
 import random
 import networkx as nx
 from .entity import Entity, DNA
+from .sprite_cache import ScaledSpriteCache
 
 class EntityManager:
     """
@@ -23,6 +24,9 @@ class EntityManager:
         self.spatial_grid: Dict[Tuple[int, int], Set[int]] = {}
         self.grid_size = 10  # Size of each grid cell
         
+        # Animation frames scaled to the current zoom, shared by all entities
+        self.sprite_cache = ScaledSpriteCache(config.DISPLAY.SPRITE_CACHE_SIZE)
+        
         # Relationship tracking
         self.families: Dict[int, Set[int]] = {}  # Family ID to member IDs
         self.family_counter = 0
@@ -78,10 +82,14 @@ class EntityManager:
         # Create relationship edges
         self.social_network.add_edge(child_id, parent1_id, 
                                    relationship_type="child_parent",
-                                   strength=1.0)
+                                   strength=1.0,
+                                   interactions=0,
+                                   relationship_strength=1.0)
         self.social_network.add_edge(child_id, parent2_id,
                                    relationship_type="child_parent",
-                                   strength=1.0)
+                                   strength=1.0,
+                                   interactions=0,
+                                   relationship_strength=1.0)
 
     def update(self, current_time, world, resource_manager) -> None:
         """Update all entities"""
@@ -251,11 +259,13 @@ class EntityManager:
 
     def _check_for_births(self) -> None:
         """Check for potential new births between compatible entities"""
-        for edge in self.social_network.edges(data=True):
+        # Births add nodes to the network, so iterate over a copy of the edges
+        for edge in list(self.social_network.edges(data=True)):
             entity1_id, entity2_id, data = edge
             
-            # Check if entities are compatible for reproduction
-            if (data['relationship_strength'] > 0.8 and
+            # Check if entities are compatible for reproduction (never parent and child)
+            if (data.get('relationship_type') != "child_parent" and
+                data['relationship_strength'] > 0.8 and
                 random.random() < 0.01):  # 1% chance per update
                 
                 entity1 = self.entities[entity1_id]
@@ -329,20 +339,32 @@ class EntityManager:
     def render(self, screen: pygame.Surface, visible_area: pygame.Rect,
               zoom_level: float, camera_x: float, camera_y: float) -> None:
         """Render all visible entities"""
-        # Calculate visible grid cells
-        start_x = int(camera_x) // self.grid_size
-        start_y = int(camera_y) // self.grid_size
-        end_x = int(camera_x + visible_area.width + 1) // self.grid_size
-        end_y = int(camera_y + visible_area.height + 1) // self.grid_size
-        
-        # Render entities in visible cells
+        for sprite, rect in self.visible_sprites(visible_area, zoom_level, camera_x, camera_y).values():
+            screen.blit(sprite, rect)
+
+    def visible_sprites(self, visible_area: pygame.Rect, zoom_level: float, camera_x: float,
+                        camera_y: float) -> Dict[int, Tuple[pygame.Surface, pygame.Rect]]:
+        """Get the sprite and screen area of every visible entity, by entity id in drawing order"""
+        # Calculate visible grid cells, within the world (far-out views show far more space than map)
+        last_x = (self.config.WORLD.WORLD_WIDTH - 1) // self.grid_size
+        last_y = (self.config.WORLD.WORLD_HEIGHT - 1) // self.grid_size
+        start_x = max(0, int(camera_x) // self.grid_size)
+        start_y = max(0, int(camera_y) // self.grid_size)
+        end_x = min(last_x, int(camera_x + visible_area.width + 1) // self.grid_size)
+        end_y = min(last_y, int(camera_y + visible_area.height + 1) // self.grid_size)
+        
+        # Collect entities in visible cells
+        sprites = {}
         for grid_x in range(start_x, end_x + 1):
             for grid_y in range(start_y, end_y + 1):
                 cell = (grid_x, grid_y)
                 if cell in self.spatial_grid:
                     for entity_id in self.spatial_grid[cell]:
                         entity = self.entities[entity_id]
-                        entity.render(screen, camera_x, camera_y, zoom_level)
+                        sprite = entity.get_sprite(camera_x, camera_y, zoom_level, self.sprite_cache)
+                        if sprite is not None:
+                            sprites[entity_id] = sprite
+        return sprites
 
     def get_entity_at_position(self, pos: Tuple[float, float]) -> Optional[Entity]:
         """Get the entity at a specific world position"""
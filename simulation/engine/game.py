@@ -1,17 +1,22 @@
+import numpy as np
 import pygame
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from .config import Config
 from .world import World
 from .time_system import TimeSystem
 from .entity_manager import EntityManager
 from .resource_manager import ResourceManager
+from .text_renderer import get_text_renderer
+from .dirty_regions import DirtyRegions
+from .snapshot import Snapshot, WorldSnapshot
+from .terrain_generator import RESOURCE_TYPES, NO_RESOURCE
 
 class Game:
     """
     Main game class that coordinates all simulation systems and manages the game state.
     """
-    def __init__(self, screen: pygame.Surface, config: Config):
-        self.screen = screen
+    def __init__(self, screen: Optional[pygame.Surface], config: Config):
+        self.screen = screen  # None when running headless
         self.config = config
         
         # Initialize core systems
@@ -23,6 +28,7 @@ class Game:
         # Game state flags
         self.paused = False
         self.debug_mode = False
+        self.show_minimap = config.DISPLAY.SHOW_MINIMAP
         self.selected_entity = None
         
         # Camera/View settings
@@ -32,6 +38,22 @@ class Game:
         
         # Initialize clock for FPS tracking
         self.clock = pygame.time.Clock()
+        
+        # Cached fonts and text surfaces for the UI
+        self.text = get_text_renderer()
+        
+        # Dirty-rectangle rendering: the terrain for the current view is kept in
+        # a background layer, and only screen areas whose sprites, overlays or
+        # tiles changed are redrawn from it
+        self.dirty_regions: Optional[DirtyRegions] = None
+        self.dirty_rects: List[pygame.Rect] = []
+        self._background: Optional[pygame.Surface] = None
+        self._last_view = None
+        self._tile_version = self.world.tile_version
+        self._sprites: Dict[int, Tuple[pygame.Surface, pygame.Rect]] = {}
+        self._overlays: Dict[str, Tuple[pygame.Surface, pygame.Rect]] = {}
+        self._minimap: Optional[pygame.Surface] = None
+        self._minimap_key = None
 
     def handle_event(self, event: pygame.event.Event) -> None:
         """Handle pygame events for user input"""
@@ -40,6 +62,8 @@ class Game:
                 self.paused = not self.paused
             elif event.key == pygame.K_d:
                 self.debug_mode = not self.debug_mode
+            elif event.key == pygame.K_m:
+                self.show_minimap = not self.show_minimap
             elif event.key == pygame.K_PLUS or event.key == pygame.K_EQUALS:
                 self._adjust_zoom(1)  # Zoom in
             elif event.key == pygame.K_MINUS:
@@ -73,41 +97,129 @@ class Game:
                 self.world
             )
 
-    def render(self) -> None:
-        """Render the current game state to the screen"""
-        # Clear the screen
-        self.screen.fill((0, 0, 0))
+    def snapshot(self) -> Snapshot:
+        """The current tick as compact arrays, for clients that draw the game themselves"""
+        entities = [entity for entity in self.entity_manager.entities.values() if entity.alive]
+        count = len(entities)
+        positions = np.fromiter((coordinate for entity in entities for coordinate in (entity.x, entity.y)),
+                                np.float32, 2 * count).reshape(count, 2)
         
-        # Calculate visible area based on camera position and zoom
+        selected = None
+        if self.selected_entity is not None:
+            selected = {"id": self.selected_entity.id,
+                        "info": self.entity_info_lines(self.selected_entity)}
+        
+        return Snapshot(
+            minute=self.time_system.current_time.to_minutes(self.config.TIME),
+            time=self.time_system.get_time_string(),
+            world_version=self.world.tile_version,
+            ids=np.fromiter((entity.id for entity in entities), np.int32, count),
+            positions=positions,
+            sprite_seeds=np.fromiter((entity.sprite_seed for entity in entities), np.uint32, count),
+            sprite_sizes=np.fromiter((entity.sprite_size for entity in entities), np.uint16, count),
+            frames=np.fromiter((entity.current_frame for entity in entities), np.uint8, count),
+            selected=selected,
+        )
+
+    def world_snapshot(self) -> WorldSnapshot:
+        """A copy of the world layers clients draw from, sent once per tile_version"""
+        world = self.world
+        # Drainage is computed over the whole map, so lazy worlds have no rivers layer
+        names = ("biomes", "resources", "elevation") if world.chunks is not None \
+            else ("biomes", "resources", "rivers", "elevation")
+        layers = {name: np.array(world.get_region(name, 0, 0, world.width, world.height))
+                  for name in names}
+        return WorldSnapshot(
+            version=world.tile_version,
+            width=world.width,
+            height=world.height,
+            biome_names=list(world.biome_classifier.names),
+            resource_types=list(RESOURCE_TYPES),
+            no_resource=int(NO_RESOURCE),
+            layers=layers,
+        )
+
+    def render(self) -> List[pygame.Rect]:
+        """Render the current game state, returning the screen areas that changed"""
         visible_area = self._get_visible_area()
+        if self.dirty_regions is None or self.dirty_regions.bounds != self.screen.get_rect():
+            self.dirty_regions = DirtyRegions(self.screen.get_rect())
         
-        # Render world (terrain, resources)
-        self.world.render(
-            self.screen,
+        # Terrain: a new camera position or zoom redraws the whole view, tile
+        # changes (harvested resources, regeneration) only their own area
+        changed_tiles = self.world.tile_changes_since(self._tile_version)
+        self._tile_version = self.world.tile_version
+        view = (self.camera_x, self.camera_y, self.zoom_level, self.screen.get_size())
+        if view != self._last_view or changed_tiles is None:
+            self._last_view = view
+            self._render_background(visible_area)
+            self.dirty_regions.mark_all()
+        else:
+            for tiles in changed_tiles:
+                area = self.world.renderer.screen_rect(*tiles, self.zoom_level,
+                                                       self.camera_x, self.camera_y)
+                self._render_background(visible_area, area)
+                self.dirty_regions.mark(area)
+        if changed_tiles != []:
+            self._minimap_key = None
+        
+        # Entities and UI elements that moved, changed or disappeared
+        sprites = self.entity_manager.visible_sprites(
             visible_area,
             self.zoom_level,
             self.camera_x,
             self.camera_y
         )
+        overlays = self._layout_ui()
+        self._mark_changes(self._sprites, sprites)
+        self._mark_changes(self._overlays, overlays)
+        self._sprites = sprites
+        self._overlays = overlays
         
-        # Render entities
-        self.entity_manager.render(
-            self.screen,
+        # Redraw each dirty area: terrain, then the entities and UI on top of it
+        layers = list(sprites.values()) + list(overlays.values())
+        layer_rects = [rect for _, rect in layers]
+        self.dirty_rects = self.dirty_regions.take()
+        for area in self.dirty_rects:
+            self.screen.set_clip(area)
+            self.screen.blit(self._background, area, area)
+            for index in area.collidelistall(layer_rects):
+                self.screen.blit(*layers[index])
+        self.screen.set_clip(None)
+        return self.dirty_rects
+
+    def _render_background(self, visible_area: pygame.Rect, area: Optional[pygame.Rect] = None) -> None:
+        """Draw the terrain into the background layer, only within area if given"""
+        if self._background is None or self._background.get_size() != self.screen.get_size():
+            self._background = pygame.Surface(self.screen.get_size(), 0, self.screen)
+        self._background.set_clip(area)
+        self._background.fill((0, 0, 0))
+        self.world.render(
+            self._background,
             visible_area,
             self.zoom_level,
             self.camera_x,
             self.camera_y
         )
-        
-        # Render UI elements
-        self._render_ui()
-        
-        if self.debug_mode:
-            self._render_debug_info()
+        self._background.set_clip(None)
+
+    def _mark_changes(self, previous: Dict, current: Dict) -> None:
+        """Mark the old and new areas of every layer that was added, removed, moved or redrawn"""
+        for key in previous.keys() | current.keys():
+            old = previous.get(key)
+            new = current.get(key)
+            if old is not None and new is not None and old[0] is new[0] and old[1] == new[1]:
+                continue
+            if old is not None:
+                self.dirty_regions.mark(old[1])
+            if new is not None:
+                self.dirty_regions.mark(new[1])
 
     def _adjust_zoom(self, direction: int) -> None:
         """Adjust zoom level within configured bounds"""
-        current_index = self.config.DISPLAY.ZOOM_LEVELS.index(self.zoom_level)
+        zoom_levels = self.config.DISPLAY.ZOOM_LEVELS
+        current_index = min(range(len(zoom_levels)),
+                            key=lambda i: abs(zoom_levels[i] - self.zoom_level))
         new_index = max(0, min(
             current_index + direction,
             len(self.config.DISPLAY.ZOOM_LEVELS) - 1
@@ -136,38 +248,73 @@ class Game:
         world_y = (screen_pos[1] / (self.zoom_level * self.config.WORLD.TILE_SIZE)) + self.camera_y
         return (world_x, world_y)
 
-    def _render_ui(self) -> None:
-        """Render UI elements like time, selected entity info, etc."""
-        # Render time
+    def _layout_minimap(self) -> Tuple[pygame.Surface, pygame.Rect]:
+        """Lay out the minimap in the bottom right corner, outlining the visible area"""
+        size = self.config.DISPLAY.MINIMAP_SIZE
+        world_size = max(self.world.width, self.world.height)
+        width = max(1, size * self.world.width // world_size)
+        height = max(1, size * self.world.height // world_size)
+        rect = pygame.Rect(self.screen.get_width() - width - 10,
+                           self.screen.get_height() - height - 10, width, height)
+        
+        pixels_per_tile = self.zoom_level * self.config.WORLD.TILE_SIZE
+        view = pygame.Rect(self.camera_x, self.camera_y,
+                           self.screen.get_width() / pixels_per_tile,
+                           self.screen.get_height() / pixels_per_tile)
+        
+        # Redrawn only when the view or the map changed
+        key = (rect.size, tuple(view))
+        if self._minimap_key != key:
+            self._minimap = pygame.Surface(rect.size, 0, self.screen)
+            self.world.render_minimap(self._minimap, self._minimap.get_rect(), view)
+            self._minimap_key = key
+        return self._minimap, rect
+
+    def _layout_ui(self) -> Dict[str, Tuple[pygame.Surface, pygame.Rect]]:
+        """Lay out UI elements like the minimap, time, selected entity info, etc."""
+        overlays = {}
+        if self.show_minimap:
+            overlays["minimap"] = self._layout_minimap()
+        
+        # Time
         time_text = self.time_system.get_time_string()
-        font = pygame.font.Font(None, 36)
-        text_surface = font.render(time_text, True, (255, 255, 255))
-        self.screen.blit(text_surface, (10, 10))
+        overlays["time"] = self._layout_text(time_text, (10, 10), (255, 255, 255), 36)
         
-        # Render selected entity info if any
+        # Selected entity info if any
         if self.selected_entity:
-            self._render_entity_info(self.selected_entity)
-
-    def _render_entity_info(self, entity) -> None:
-        """Render detailed information about the selected entity"""
-        font = pygame.font.Font(None, 24)
-        y_offset = 50
+            overlays.update(self._layout_entity_info(self.selected_entity))
         
-        info_lines = [
+        if self.debug_mode:
+            overlays.update(self._layout_debug_info())
+        return overlays
+
+    def _layout_text(self, text: str, pos: Tuple[int, int], color: Tuple[int, int, int],
+                     size: int) -> Tuple[pygame.Surface, pygame.Rect]:
+        """Get the cached surface for a UI string and where it goes"""
+        surface = self.text.render(text, size, color)
+        return surface, surface.get_rect(topleft=pos)
+
+    def entity_info_lines(self, entity) -> List[str]:
+        """Detailed information about an entity, as shown when it is selected"""
+        return [
             f"Name: {entity.name}",
             f"Health: {entity.needs['HEALTH']:.1f}",
             f"Energy: {entity.needs['ENERGY']:.1f}",
             f"Current Task: {entity.current_task}",
         ]
+
+    def _layout_entity_info(self, entity) -> Dict[str, Tuple[pygame.Surface, pygame.Rect]]:
+        """Lay out detailed information about the selected entity"""
+        y_offset = 50
         
-        for line in info_lines:
-            text_surface = font.render(line, True, (255, 255, 255))
-            self.screen.blit(text_surface, (10, y_offset))
+        overlays = {}
+        for index, line in enumerate(self.entity_info_lines(entity)):
+            overlays[f"info{index}"] = self._layout_text(line, (10, y_offset), (255, 255, 255), 24)
             y_offset += 25
+        return overlays
 
-    def _render_debug_info(self) -> None:
-        """Render debug information when debug mode is enabled"""
-        font = pygame.font.Font(None, 20)
+    def _layout_debug_info(self) -> Dict[str, Tuple[pygame.Surface, pygame.Rect]]:
+        """Lay out debug information when debug mode is enabled"""
         y_offset = 100
         
         debug_lines = [
@@ -177,7 +324,8 @@ class Game:
             f"Zoom: {self.zoom_level}x"
         ]
         
-        for line in debug_lines:
-            text_surface = font.render(line, True, (255, 255, 0))
-            self.screen.blit(text_surface, (10, y_offset))
+        overlays = {}
+        for index, line in enumerate(debug_lines):
+            overlays[f"debug{index}"] = self._layout_text(line, (10, y_offset), (255, 255, 0), 20)
             y_offset += 20
+        return overlays
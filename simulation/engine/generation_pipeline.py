@@ -0,0 +1,166 @@
+import hashlib
+import json
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from .config import Config
+from .world_cache import WorldCache
+
+@dataclass(frozen=True)
+class Region:
+    """A rectangle of world tiles that generation runs over"""
+    x0: int
+    y0: int
+    width: int
+    height: int
+
+    @property
+    def xs(self) -> np.ndarray:
+        """Tile x coordinates as a row vector"""
+        return np.arange(self.x0, self.x0 + self.width)
+
+    @property
+    def ys(self) -> np.ndarray:
+        """Tile y coordinates as a column vector"""
+        return np.arange(self.y0, self.y0 + self.height)[:, np.newaxis]
+
+@dataclass
+class Stage:
+    """
+    One step of world generation, producing the layer it is named after.
+    func is called as func(region, params, *input_layers); params(config)
+    returns the JSON-serializable settings the output depends on. Global
+    stages need the whole map (e.g. drainage) and can't run per region.
+    """
+    name: str
+    func: Callable[..., np.ndarray]
+    inputs: Tuple[str, ...] = ()
+    params: Callable[[Config], Any] = lambda config: None
+    version: int = 1
+    is_global: bool = False
+
+class GenerationPipeline:
+    """
+    Runs a graph of generation stages with content-addressed caching.
+
+    Each stage output is keyed by a hash of the stage's name, version and
+    current params, the region, the keys of its inputs and the pipeline's
+    code fingerprint, so editing generation code retires old outputs. A changed
+    parameter therefore changes the key of its stage and every stage
+    downstream of it, while upstream outputs keep their keys and are served
+    from cache. Outputs are cached in memory up to a byte budget and, when a
+    WorldCache is given, persisted to disk for later runs. Cached outputs are
+    read-only arrays shared by every caller.
+    """
+    def __init__(self, config: Config, stages: List[Stage], memory_budget: int = 0,
+                 disk_cache: Optional[WorldCache] = None, code: str = ""):
+        self.config = config
+        self.code = code
+        self.stages: Dict[str, Stage] = OrderedDict()
+        for stage in stages:
+            missing = [name for name in stage.inputs if name not in self.stages]
+            assert not missing, f"Stage {stage.name} listed before its inputs {missing}"
+            self.stages[stage.name] = stage
+
+        self.memory_budget = memory_budget
+        self.disk_cache = disk_cache
+        self.cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.cached_bytes = 0
+
+        # Number of times each stage actually ran
+        self.run_counts: Counter = Counter()
+
+        # Stages that can run on any region: not global and not fed by a global stage
+        self.local_stages: List[str] = []
+        for stage in self.stages.values():
+            if not stage.is_global and all(name in self.local_stages for name in stage.inputs):
+                self.local_stages.append(stage.name)
+
+    def stage_keys(self, region: Region) -> Dict[str, str]:
+        """Content keys of every stage's output for a region under the current config"""
+        keys = {}
+        for stage in self.stages.values():
+            content = json.dumps({
+                "stage": stage.name,
+                "version": stage.version,
+                "params": stage.params(self.config),
+                "region": [region.x0, region.y0, region.width, region.height],
+                "inputs": [keys[name] for name in stage.inputs],
+                "code": self.code
+            }, sort_keys=True)
+            keys[stage.name] = f"{stage.name}-{hashlib.sha256(content.encode()).hexdigest()[:24]}"
+        return keys
+
+    def run(self, region: Region, targets: Optional[Iterable[str]] = None,
+            cached: bool = True, known: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        """
+        Generate layers for a region
+
+        Args:
+            region: Tiles to generate
+            targets: Layers to return (default: every stage)
+            cached: Serve and store outputs through the caches
+            known: Layers already generated for this region and config
+
+        Returns:
+            Dict of layer name to (height, width) array
+        """
+        targets = list(self.stages) if targets is None else list(targets)
+        keys = self.stage_keys(region)
+        results: Dict[str, np.ndarray] = dict(known or {})
+
+        def resolve(name: str) -> np.ndarray:
+            if name in results:
+                return results[name]
+            data = self._lookup(keys[name]) if cached else None
+            if data is None:
+                stage = self.stages[name]
+                inputs = [resolve(input_name) for input_name in stage.inputs]
+                data = stage.func(region, stage.params(self.config), *inputs)
+                self.run_counts[name] += 1
+                if cached:
+                    self._store(keys[name], data, persist=True)
+            results[name] = data
+            return data
+
+        return {name: resolve(name) for name in targets}
+
+    def is_cached(self, region: Region, name: str) -> bool:
+        """Whether a stage's current output for a region is in memory or on disk"""
+        key = self.stage_keys(region)[name]
+        if key in self.cache:
+            return True
+        return self.disk_cache is not None and self.disk_cache.contains(key)
+
+    def store(self, region: Region, layers: Dict[str, np.ndarray]) -> None:
+        """Cache layers generated outside the pipeline (e.g. by a process pool)"""
+        keys = self.stage_keys(region)
+        for name, data in layers.items():
+            self._store(keys[name], data, persist=True)
+
+    def _lookup(self, key: str) -> Optional[np.ndarray]:
+        """Find an output in memory, then on disk"""
+        data = self.cache.get(key)
+        if data is not None:
+            self.cache.move_to_end(key)
+            return data
+        if self.disk_cache is not None:
+            data = self.disk_cache.load_layer(key)
+            if data is not None:
+                self._store(key, data, persist=False)
+        return data
+
+    def _store(self, key: str, data: np.ndarray, persist: bool) -> None:
+        """Add an output to the memory cache, evicting least recently used outputs"""
+        # Callers share cached outputs, so they have to copy before writing, as with disk memory maps
+        data.setflags(write=False)
+        if persist and self.disk_cache is not None:
+            self.disk_cache.save_layer(key, data)
+
+        if key not in self.cache:
+            self.cache[key] = data
+            self.cached_bytes += data.nbytes
+        while self.cached_bytes > self.memory_budget and self.cache:
+            _, evicted = self.cache.popitem(last=False)
+            self.cached_bytes -= evicted.nbytes
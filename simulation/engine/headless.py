@@ -0,0 +1,99 @@
+import json
+import os
+import random
+import time
+from typing import Any, Callable, Dict, Optional
+from .config import Config
+from .game import Game
+
+def snapshot(game: Game, tick: int) -> Dict[str, Any]:
+    """Summarize the simulation state after a tick as plain JSON-friendly data"""
+    entities = list(game.entity_manager.entities.values())
+    return {
+        "tick": tick,
+        "time": game.time_system.get_time_string(),
+        "alive": sum(1 for entity in entities if entity.alive),
+        "entities": [
+            {
+                "id": entity.id,
+                "name": entity.name,
+                "x": entity.x,
+                "y": entity.y,
+                "alive": entity.alive,
+                "task": entity.current_task,
+                "needs": {need: round(value, 2) for need, value in entity.needs.items()},
+            }
+            for entity in entities
+        ],
+    }
+
+class HeadlessRunner:
+    """
+    Runs the simulation without a screen, for batch jobs that only want results.
+
+    No surface is created and pygame's display and font modules are never
+    initialized: the runner calls Game.update in a tight loop, without frame
+    rate limiting, and times it. Every snapshot_every ticks (0 for never) a
+    snapshot() of the state is passed to on_snapshot, or appended as a JSON
+    line to snapshot_path. on_tick, if given, is called with the game after
+    every tick.
+    """
+    def __init__(self, config: Config, entities: int = 0, snapshot_every: int = 0,
+                 snapshot_path: Optional[str] = None,
+                 on_snapshot: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 on_tick: Optional[Callable[[Game], None]] = None):
+        self.config = config
+        self.snapshot_every = snapshot_every
+        self.snapshot_path = snapshot_path
+        self.on_snapshot = on_snapshot
+        self.on_tick = on_tick
+
+        started = time.perf_counter()
+        self.game = Game(None, config)
+        self._populate(entities)
+        self.setup_seconds = time.perf_counter() - started
+        self.ticks = 0
+
+    def run(self, ticks: int) -> Dict[str, float]:
+        """Simulate ticks game minutes as fast as possible and report the throughput"""
+        snapshot_file = None
+        if self.snapshot_path and self.snapshot_every:
+            os.makedirs(os.path.dirname(os.path.abspath(self.snapshot_path)), exist_ok=True)
+            snapshot_file = open(self.snapshot_path, 'a')
+        try:
+            started = time.perf_counter()
+            for _ in range(ticks):
+                self.game.update()
+                self.ticks += 1
+                if self.on_tick is not None:
+                    self.on_tick(self.game)
+                if self.snapshot_every and self.ticks % self.snapshot_every == 0:
+                    state = snapshot(self.game, self.ticks)
+                    if self.on_snapshot is not None:
+                        self.on_snapshot(state)
+                    if snapshot_file is not None:
+                        snapshot_file.write(json.dumps(state) + "\n")
+            seconds = time.perf_counter() - started
+        finally:
+            if snapshot_file is not None:
+                snapshot_file.close()
+
+        return {
+            "ticks": ticks,
+            "seconds": seconds,
+            "ticks_per_second": ticks / seconds if seconds > 0 else float("inf"),
+            "setup_seconds": self.setup_seconds,
+            "entities": len(self.game.entity_manager.entities),
+        }
+
+    def _populate(self, count: int) -> None:
+        """Spawn entities at random tiles"""
+        for _ in range(count):
+            self.game.entity_manager.create_entity(random.randrange(self.game.world.width),
+                                                   random.randrange(self.game.world.height))
+
+def run_headless(config: Config, ticks: int, entities: int = 0, snapshot_every: int = 0,
+                 snapshot_path: Optional[str] = None,
+                 on_tick: Optional[Callable[[Game], None]] = None) -> Dict[str, float]:
+    """Simulate without a display and return the throughput report"""
+    return HeadlessRunner(config, entities, snapshot_every, snapshot_path, on_tick=on_tick).run(ticks)
@@ -193,8 +193,8 @@ class JobSystem:
                 
         return True
 
-    def update(self, current_time) -> None:
-        """Update all job-related activities"""
+    def update(self, current_time, world=None) -> None:
+        """Update all job-related activities (world supplies weather, if given)"""
         hour = current_time.hour
         
         for entity_id, job_name in list(self.active_workers.items()):
@@ -202,12 +202,12 @@ class JobSystem:
             
             # Check work hours
             if job.work_hours[0] <= hour < job.work_hours[1]:
-                self._process_work(entity_id, job)
+                self._process_work(entity_id, job, world)
             else:
                 # Outside work hours
                 self._end_work_day(entity_id, job)
 
-    def _process_work(self, entity_id: int, job: Job) -> None:
+    def _process_work(self, entity_id: int, job: Job, world=None) -> None:
         """Process work activities for an entity"""
         entity = self._get_entity(entity_id)
         if not entity:
@@ -219,7 +219,7 @@ class JobSystem:
         
         # Generate products
         for product in job.products:
-            quality = self._calculate_product_quality(entity, product)
+            quality = self._calculate_product_quality(entity, product, world)
             quantity = product.base_quantity * quality
             
             # Add to entity's inventory or workplace storage
@@ -235,13 +235,16 @@ class JobSystem:
         # Pay wages
         self._pay_wages(entity, job)
 
-    def _calculate_product_quality(self, entity, product: JobProduct) -> float:
+    def _calculate_product_quality(self, entity, product: JobProduct, world=None) -> float:
         """Calculate the quality of produced goods"""
         quality = 0.0
         total_weight = 0.0
         
         for factor, weight in product.quality_factors.items():
-            if factor in entity.skills:
+            if factor == "Weather" and world is not None:
+                # Weather at the worker's tile, on the same 0-100 scale as skills
+                quality += world.weather.growing_conditions(entity.x, entity.y) * 100 * weight
+            elif factor in entity.skills:
                 quality += entity.skills[factor] * weight
             elif factor in entity.stats:
                 quality += entity.stats[factor] * weight
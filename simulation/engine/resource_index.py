@@ -0,0 +1,88 @@
+from typing import Tuple
+import numpy as np
+
+class ResourceIndex:
+    """
+    Sparse index of resource tiles.
+
+    Resource tiles are stored as sorted row-major keys (y * width + x) with a
+    parallel array of resource type indices, so a point lookup is one binary
+    search and a rectangle query is one binary search per row. A type-sorted
+    permutation is built on first use for per-type iteration.
+    """
+    def __init__(self, width: int, keys: np.ndarray, types: np.ndarray):
+        self.width = width
+        self.keys = keys
+        self.types = types
+
+        # Positions grouped by type, built on first per-type query
+        self._type_order = None
+        self._type_starts = None
+
+    @classmethod
+    def from_layer(cls, resources: np.ndarray, empty_value: int) -> "ResourceIndex":
+        """Index every tile of a resources layer that doesn't hold empty_value"""
+        width = resources.shape[1]
+        flat = resources.ravel()
+        keys = np.flatnonzero(flat != empty_value)  # Already in row-major order
+        return cls(width, keys, flat[keys].copy())
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def get(self, x: int, y: int, default: int = -1) -> int:
+        """Get the resource type index at a tile, or default if it has none"""
+        key = y * self.width + x
+        i = np.searchsorted(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return int(self.types[i])
+        return default
+
+    def set(self, x: int, y: int, resource_type: int) -> None:
+        """Add, change or (with a negative type) remove the resource at a tile"""
+        key = y * self.width + x
+        i = int(np.searchsorted(self.keys, key))
+        present = i < len(self.keys) and self.keys[i] == key
+        if resource_type < 0:
+            if present:
+                self.keys = np.delete(self.keys, i)
+                self.types = np.delete(self.types, i)
+        elif present:
+            self.types[i] = resource_type
+        else:
+            self.keys = np.insert(self.keys, i, key)
+            self.types = np.insert(self.types, i, resource_type)
+        self._type_order = None
+
+    def query_rect(self, x0: int, y0: int, x1: int, y1: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find the resources inside the tile rectangle [x0, x1) x [y0, y1)
+
+        Returns:
+            (xs, ys, types) arrays in row-major order
+        """
+        rows = np.arange(y0, y1, dtype=np.int64) * self.width
+        starts = np.searchsorted(self.keys, rows + x0)
+        counts = np.searchsorted(self.keys, rows + x1) - starts
+
+        # Concatenate the per-row index ranges [start, start + count)
+        total = int(counts.sum())
+        offsets = np.cumsum(counts) - counts
+        indices = np.arange(total) + np.repeat(starts - offsets, counts)
+
+        keys = self.keys[indices]
+        return keys % self.width, keys // self.width, self.types[indices]
+
+    def positions_of(self, resource_type: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the (xs, ys) of every tile holding one resource type"""
+        if self._type_order is None:
+            self._type_order = np.argsort(self.types, kind='stable')
+            type_count = int(self.types.max()) + 1 if len(self.types) else 0
+            self._type_starts = np.searchsorted(self.types[self._type_order],
+                                                np.arange(type_count + 1))
+
+        if not 0 <= resource_type < len(self._type_starts) - 1:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        start, end = self._type_starts[resource_type], self._type_starts[resource_type + 1]
+        keys = self.keys[self._type_order[start:end]]
+        return keys % self.width, keys // self.width
@@ -0,0 +1,113 @@
+import json
+import struct
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# Array offsets in a packed snapshot are multiples of this, so clients can view them in place
+ALIGNMENT = 8
+
+def pack_arrays(header: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> List[memoryview]:
+    """
+    Pack arrays behind a JSON header without copying them.
+
+    The result is a list of buffers to write out in order: a little-endian
+    uint32 header length, the JSON header (padded with spaces), then each
+    array's raw bytes. The header's "arrays" entry gives each array's name,
+    dtype, shape and offset from the end of the header.
+    """
+    parts = []
+    layout = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        padding = -offset % ALIGNMENT
+        if padding:
+            parts.append(memoryview(bytes(padding)))
+            offset += padding
+        layout.append({"name": name, "dtype": array.dtype.str, "shape": list(array.shape), "offset": offset})
+        parts.append(memoryview(array.reshape(-1)).cast('B'))
+        offset += array.nbytes
+
+    text = json.dumps({**header, "arrays": layout}, separators=(',', ':')).encode()
+    text += b" " * (-(4 + len(text)) % ALIGNMENT)
+    return [memoryview(struct.pack('<I', len(text)) + text)] + parts
+
+def unpack_arrays(data: bytes) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """Read what pack_arrays wrote: (header, arrays viewing data)"""
+    (length,) = struct.unpack_from('<I', data)
+    header = json.loads(bytes(data[4:4 + length]))
+    base = 4 + length
+    arrays = {}
+    for entry in header.pop("arrays"):
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"]))
+        arrays[entry["name"]] = np.frombuffer(data, dtype, count, base + entry["offset"]).reshape(entry["shape"])
+    return header, arrays
+
+@dataclass
+class Snapshot:
+    """
+    What a client needs to draw one tick, as one array row per living entity.
+
+    Sprites are named by (seed, size), the key of their frames in the sprite
+    store, so clients fetch each appearance once. world_version is the
+    world's tile_version: a client holding an older WorldSnapshot refetches it.
+    """
+    minute: int
+    time: str
+    world_version: int
+    ids: np.ndarray  # int32
+    positions: np.ndarray  # float32, (entities, 2) tile coordinates
+    sprite_seeds: np.ndarray  # uint32
+    sprite_sizes: np.ndarray  # uint16
+    frames: np.ndarray  # uint8, the current animation frame
+    selected: Optional[Dict[str, Any]] = None  # The selected entity's id and info lines
+
+    def pack(self) -> List[memoryview]:
+        """The snapshot as binary buffers (see pack_arrays)"""
+        header = {"minute": self.minute, "time": self.time, "world_version": self.world_version,
+                  "selected": self.selected}
+        return pack_arrays(header, {"ids": self.ids, "positions": self.positions,
+                                    "sprite_seeds": self.sprite_seeds, "sprite_sizes": self.sprite_sizes,
+                                    "frames": self.frames})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The snapshot as JSON-friendly data"""
+        return {"minute": self.minute, "time": self.time, "world_version": self.world_version,
+                "selected": self.selected, "ids": self.ids.tolist(), "positions": self.positions.tolist(),
+                "sprite_seeds": self.sprite_seeds.tolist(), "sprite_sizes": self.sprite_sizes.tolist(),
+                "frames": self.frames.tolist()}
+
+@dataclass
+class WorldSnapshot:
+    """A copy of the world layers at one tile_version, with names for their category values"""
+    version: int
+    width: int
+    height: int
+    biome_names: List[str]
+    resource_types: List[str]
+    no_resource: int
+    layers: Dict[str, np.ndarray]  # (height, width) each
+    _packed: Optional[List[memoryview]] = field(default=None, repr=False)
+    _etag: Optional[str] = field(default=None, repr=False)
+
+    def pack(self) -> List[memoryview]:
+        """The layers as binary buffers (see pack_arrays), packed once"""
+        if self._packed is None:
+            header = {"version": self.version, "width": self.width, "height": self.height,
+                      "biome_names": self.biome_names, "resource_types": self.resource_types,
+                      "no_resource": self.no_resource}
+            self._packed = pack_arrays(header, self.layers)
+        return self._packed
+
+    @property
+    def etag(self) -> str:
+        """HTTP entity tag: a checksum of the packed layers, so it is stable across runs of the same world"""
+        if self._etag is None:
+            checksum = 0
+            for part in self.pack():
+                checksum = zlib.crc32(part, checksum)
+            self._etag = f'"{checksum:08x}"'
+        return self._etag
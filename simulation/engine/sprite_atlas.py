@@ -0,0 +1,66 @@
+from typing import List, Optional
+import numpy as np
+import pygame
+
+class SpriteAtlas:
+    """
+    Shared pages of sprite frames.
+
+    Frames are packed left to right into shelves on fixed-size RGBA pages,
+    and each frame is handed out as a subsurface of its page: a sub-rect
+    lookup that blits and scales like any other surface but owns no pixels
+    of its own. Thousands of entities then share a handful of page surfaces
+    instead of holding four small surfaces each.
+    """
+    def __init__(self, page_size: int = 512):
+        self.page_size = page_size
+        self.pages: List[pygame.Surface] = []
+
+        # Next free position on the last page's current shelf
+        self._shelf_x = 0
+        self._shelf_y = 0
+        self._shelf_height = 0
+
+    def add_frames(self, frames: np.ndarray) -> List[pygame.Surface]:
+        """Copy (frame, x, y, RGBA) images into one strip of the atlas and return a surface per frame"""
+        count, width, height = frames.shape[:3]
+        page, rect = self._allocate(count * width, height)
+
+        # Frames side by side, written through the page's pixel arrays (which lock it until released)
+        strip = frames.reshape(count * width, height, 4)
+        rgb = pygame.surfarray.pixels3d(page)
+        rgb[rect.left:rect.right, rect.top:rect.bottom] = strip[..., :3]
+        del rgb
+        alpha = pygame.surfarray.pixels_alpha(page)
+        alpha[rect.left:rect.right, rect.top:rect.bottom] = strip[..., 3]
+        del alpha
+        return [page.subsurface((rect.x + index * width, rect.y, width, height)) for index in range(count)]
+
+    def _allocate(self, width: int, height: int):
+        """Find room for a width x height strip, starting a new shelf or page when full"""
+        if width > self.page_size or height > self.page_size:
+            # Too big to share a page
+            page = pygame.Surface((width, height), pygame.SRCALPHA)
+            return page, page.get_rect()
+
+        if self._shelf_x + width > self.page_size:
+            self._shelf_y += self._shelf_height
+            self._shelf_x = self._shelf_height = 0
+        if not self.pages or self._shelf_y + height > self.page_size:
+            self.pages.append(pygame.Surface((self.page_size, self.page_size), pygame.SRCALPHA))
+            self._shelf_x = self._shelf_y = self._shelf_height = 0
+
+        rect = pygame.Rect(self._shelf_x, self._shelf_y, width, height)
+        self._shelf_x += width
+        self._shelf_height = max(self._shelf_height, height)
+        return self.pages[-1], rect
+
+# Shared by every entity's sprite generator
+_sprite_atlas: Optional[SpriteAtlas] = None
+
+def get_sprite_atlas() -> SpriteAtlas:
+    """Get the process-wide sprite atlas"""
+    global _sprite_atlas
+    if _sprite_atlas is None:
+        _sprite_atlas = SpriteAtlas()
+    return _sprite_atlas
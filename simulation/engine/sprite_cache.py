@@ -0,0 +1,43 @@
+from collections import OrderedDict
+from typing import List, Optional
+import pygame
+
+class ScaledSpriteCache:
+    """
+    Scaled copies of entity animation frames, shared by every entity.
+
+    Entries are keyed by (frame list identity, frame index, zoom), so a frame
+    is scaled once per zoom level however many entities show it, and drawing
+    an entity is a dictionary lookup and a blit. Each entry keeps its source
+    frames alive, so a recycled id() can never return another sprite's frame.
+    The cache is an LRU bounded by entry count, so frames for zoom levels
+    no longer in use age out.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.scaled_count = 0
+
+    def get(self, frames: List[pygame.Surface], index: int, zoom: float) -> Optional[pygame.Surface]:
+        """Get frame index of frames scaled by zoom, or None if it scales to nothing"""
+        key = (id(frames), index, zoom)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] is frames:
+            self.entries.move_to_end(key)
+            return entry[1]
+
+        frame = frames[index]
+        width = int(frame.get_width() * zoom)
+        height = int(frame.get_height() * zoom)
+        scaled = pygame.transform.scale(frame, (width, height)) if width > 0 and height > 0 else None
+        self.entries[key] = (frames, scaled)
+        self.entries.move_to_end(key)
+        self.scaled_count += 1
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return scaled
+
+    def clear(self) -> None:
+        """Drop every scaled frame"""
+        self.entries.clear()
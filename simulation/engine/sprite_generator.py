@@ -1,98 +1,100 @@
 import pygame
-import random
-from typing import Tuple
+import numpy as np
+from typing import List, Optional, Tuple
+from .sprite_atlas import SpriteAtlas, get_sprite_atlas
 
 class SpriteGenerator:
-    """Generates procedural pixel sprites for entities"""
-    
-    def __init__(self, size: int = 16):
+    """
+    Generates procedural pixel sprites for entities.
+
+    Sprites are built as (x, y, RGBA) arrays with whole-array operations, and
+    finished frames are copied into a shared SpriteAtlas.
+    """
+
+    def __init__(self, size: int = 16, atlas: Optional[SpriteAtlas] = None):
         self.size = size
+        self.atlas = atlas if atlas is not None else get_sprite_atlas()
         self.colors = {
             'skin': [(255, 218, 185), (240, 200, 160), (210, 180, 140), (180, 150, 120)],
             'hair': [(50, 30, 15), (139, 69, 19), (160, 120, 80), (255, 215, 0)],
             'clothes': [(65, 105, 225), (46, 139, 87), (178, 34, 34), (148, 0, 211)]
         }
 
+    def generate_frames(self, seed: int = None, num_frames: int = 4) -> List[pygame.Surface]:
+        """Generate a unique sprite and its animation frames based on a seed, base sprite first"""
+        rng = self._rng(seed)
+        base = self.generate_pixels(rng)
+        return self.atlas.add_frames(self.animate_pixels(base, num_frames, rng))
+
     def generate_sprite(self, seed: int = None) -> pygame.Surface:
         """Generate a unique pixel sprite based on a seed"""
-        if seed is not None:
-            random.seed(seed)
-            
-        # Create surface with alpha channel
-        sprite = pygame.Surface((self.size, self.size), pygame.SRCALPHA)
-        
+        return self.atlas.add_frames(self.generate_pixels(self._rng(seed))[np.newaxis])[0]
+
+    def generate_pixels(self, rng: np.random.Generator) -> np.ndarray:
+        """Generate a sprite as an (x, y, RGBA) array"""
+        pixels = np.zeros((self.size, self.size, 4), dtype=np.uint8)
+
         # Generate base shape (body)
-        skin_color = random.choice(self.colors['skin'])
-        self._generate_body(sprite, skin_color)
-        
+        skin_color = self._choose(rng, 'skin')
+        self._generate_body(pixels, skin_color, rng)
+
         # Add features (hair, clothes)
-        hair_color = random.choice(self.colors['hair'])
-        clothes_color = random.choice(self.colors['clothes'])
-        self._add_features(sprite, hair_color, clothes_color)
-        
-        if seed is not None:
-            random.seed()  # Reset random seed
-            
-        return sprite
+        hair_color = self._choose(rng, 'hair')
+        clothes_color = self._choose(rng, 'clothes')
+        self._add_features(pixels, hair_color, clothes_color, rng)
+        return pixels
 
-    def _generate_body(self, surface: pygame.Surface, color: Tuple[int, int, int]) -> None:
+    def _generate_body(self, pixels: np.ndarray, color: Tuple[int, int, int],
+                       rng: np.random.Generator) -> None:
         """Generate the basic body shape"""
-        # Generate a symmetrical pattern for the body
-        pattern = []
-        half_width = self.size // 2
-        
-        for y in range(self.size):
-            row = []
-            for x in range(half_width):
-                if random.random() > 0.5:
-                    row.append(1)
-                else:
-                    row.append(0)
-            # Mirror the pattern
-            full_row = row + row[::-1]
-            pattern.append(full_row)
-        
-        # Apply the pattern
-        for y in range(self.size):
-            for x in range(self.size):
-                if pattern[y][x]:
-                    surface.set_at((x, y), color)
+        # A random left half mirrored onto the right (sharing the middle column of odd sizes)
+        left = rng.random(((self.size + 1) // 2, self.size)) > 0.5
+        mask = np.concatenate([left, left[:self.size // 2][::-1]])
+        pixels[mask] = (*color, 255)
 
-    def _add_features(self, surface: pygame.Surface, 
+    def _add_features(self, pixels: np.ndarray,
                      hair_color: Tuple[int, int, int],
-                     clothes_color: Tuple[int, int, int]) -> None:
+                     clothes_color: Tuple[int, int, int],
+                     rng: np.random.Generator) -> None:
         """Add distinguishing features to the sprite"""
-        # Add hair (top 1/4 of sprite)
+        # Add hair (top 1/4 of sprite, 70% of pixels)
         hair_height = self.size // 4
-        for y in range(hair_height):
-            for x in range(self.size):
-                if random.random() > 0.3:  # 70% chance of hair pixel
-                    surface.set_at((x, y), hair_color)
-        
-        # Add clothes (bottom 1/3 of sprite)
+        hair = rng.random((self.size, hair_height)) > 0.3
+        pixels[:, :hair_height][hair] = (*hair_color, 255)
+
+        # Add clothes (opaque pixels of the bottom 1/3 of sprite)
         clothes_start = int(self.size * 0.66)
-        for y in range(clothes_start, self.size):
-            for x in range(self.size):
-                if surface.get_at((x, y))[3] > 0:  # If pixel is not transparent
-                    surface.set_at((x, y), clothes_color)
+        clothes = pixels[:, clothes_start:]
+        clothes[clothes[..., 3] > 0] = (*clothes_color, 255)
+
+    def animate_pixels(self, base: np.ndarray, num_frames: int,
+                       rng: np.random.Generator) -> np.ndarray:
+        """Generate animation frames from a base sprite array, as one (frame, x, y, RGBA) array"""
+        # In every frame but the first, 10% of opaque pixels shift one pixel
+        # right (pixels in the last column stay)
+        moving = (base[..., 3] > 0) & (rng.random((num_frames, self.size, self.size)) > 0.9)
+        moving[0] = False
+        moving[:, -1] = False
+        frames = np.repeat(base[np.newaxis], num_frames, axis=0)
+        frames[moving] = 0
+        shifted = frames[:, 1:]
+        shifted[moving[:, :-1]] = np.broadcast_to(base[:-1], shifted.shape)[moving[:, :-1]]
+        return frames
 
-    def generate_animation_frames(self, base_sprite: pygame.Surface, 
+    def generate_animation_frames(self, base_sprite: pygame.Surface,
                                 num_frames: int = 4) -> list[pygame.Surface]:
         """Generate animation frames from a base sprite"""
-        frames = [base_sprite]
-        
-        for _ in range(num_frames - 1):
-            frame = base_sprite.copy()
-            # Add slight variations for animation
-            for y in range(self.size):
-                for x in range(self.size):
-                    if frame.get_at((x, y))[3] > 0:  # If pixel is not transparent
-                        if random.random() > 0.9:  # 10% chance to modify pixel
-                            # Shift pixel slightly
-                            if x + 1 < self.size:
-                                color = frame.get_at((x, y))
-                                frame.set_at((x + 1, y), color)
-                                frame.set_at((x, y), (0, 0, 0, 0))
-            frames.append(frame)
-        
-        return frames
+        base = np.dstack([pygame.surfarray.array3d(base_sprite),
+                          pygame.surfarray.array_alpha(base_sprite)])
+        frames = self.animate_pixels(base, num_frames, self._rng(None))
+        return [base_sprite] + self.atlas.add_frames(frames[1:])
+
+    def _choose(self, rng: np.random.Generator, part: str) -> Tuple[int, int, int]:
+        """Pick one of a part's colors"""
+        options = self.colors[part]
+        return options[rng.integers(len(options))]
+
+    @staticmethod
+    def _rng(seed: Optional[int]) -> np.random.Generator:
+        """A generator for one sprite, reproducible when seeded (seeds may be negative hashes)"""
+        return np.random.default_rng(None if seed is None else seed % 2 ** 64)
@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import pygame
+from . import sprite_generator
+from .sprite_atlas import SpriteAtlas
+from .sprite_generator import SpriteGenerator
+from .utils import code_fingerprint, load_sprite_sheet
+
+# Generated entity sprites are kept with the game's other sprites
+DEFAULT_SPRITE_DIR = Path(__file__).parent.parent / 'assets' / 'sprites'
+
+class SpriteStore:
+    """
+    Entity animation frames shared by every entity with the same appearance.
+
+    Frames are keyed by (seed, size), the two inputs of SpriteGenerator, so
+    memory grows with the number of distinct appearances rather than the
+    number of entities. save() writes them as one sprite sheet per size, a
+    row of frames per appearance, plus an index of the seeds in row order;
+    later runs load the sheets on first use and skip generation for every
+    appearance already seen. The index records a fingerprint of the generator
+    code, and sheets drawn by other code are ignored.
+    """
+    def __init__(self, directory: Optional[Path] = DEFAULT_SPRITE_DIR, num_frames: int = 4,
+                 atlas: Optional[SpriteAtlas] = None):
+        self.directory = Path(directory) if directory is not None else None
+        self.num_frames = num_frames
+        self.atlas = atlas
+        self.code = code_fingerprint(sprite_generator)
+        self.frames: Dict[Tuple[int, int], List[pygame.Surface]] = {}
+        self.generated_count = 0
+        self._loaded = directory is None
+        self._unsaved = False
+
+    def get(self, seed: int, size: int) -> List[pygame.Surface]:
+        """Get the animation frames for an appearance, generating them on a miss"""
+        if not self._loaded:
+            self.load()
+
+        key = (seed, size)
+        frames = self.frames.get(key)
+        if frames is None:
+            frames = self.frames[key] = SpriteGenerator(size, self.atlas).generate_frames(seed, self.num_frames)
+            self.generated_count += 1
+            self._unsaved = True
+        return frames
+
+    def load(self) -> None:
+        """Load the sprite sheets saved by earlier runs"""
+        self._loaded = True
+        try:
+            index = json.loads((self.directory / "entities.json").read_text())
+        except (OSError, ValueError):
+            return
+        if index.get("frames") != self.num_frames or index.get("code") != self.code:
+            return  # Drawn by other settings or another version of the generator
+
+        for size, seeds in index.get("sheets", {}).items():
+            size = int(size)
+            frames = load_sprite_sheet(str(self.directory / f"entities_{size}.png"), size, size)
+            if len(frames) < len(seeds) * self.num_frames:
+                continue  # Sheet missing or out of date with its index
+            for row, seed in enumerate(seeds):
+                self.frames.setdefault((seed, size),
+                                       frames[row * self.num_frames:(row + 1) * self.num_frames])
+
+    def save(self) -> None:
+        """Write every appearance to the sprite sheets, if any were generated since loading"""
+        if self.directory is None or not self._unsaved:
+            return
+
+        seeds_by_size: Dict[int, List[int]] = {}
+        for seed, size in sorted(self.frames):
+            seeds_by_size.setdefault(size, []).append(seed)
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for size, seeds in seeds_by_size.items():
+                sheet = pygame.Surface((self.num_frames * size, len(seeds) * size), pygame.SRCALPHA)
+                for row, seed in enumerate(seeds):
+                    for column, frame in enumerate(self.frames[(seed, size)]):
+                        sheet.blit(frame, (column * size, row * size))
+                self._replace(f"entities_{size}.png", lambda path: pygame.image.save(sheet, path))
+
+            # The index is written last, so it never lists rows a sheet lacks
+            index = {"frames": self.num_frames, "code": self.code,
+                     "sheets": {str(size): seeds for size, seeds in seeds_by_size.items()}}
+            self._replace("entities.json", lambda path: Path(path).write_text(json.dumps(index)))
+            self._unsaved = False
+        except (OSError, pygame.error) as e:
+            print(f"Error writing sprite sheets to {self.directory}: {e}")
+
+    def _replace(self, name: str, write) -> None:
+        """Write a file through a staging file, so it appears atomically once complete"""
+        fd, staging = tempfile.mkstemp(prefix=f".{name}-", suffix=Path(name).suffix, dir=self.directory)
+        os.close(fd)
+        try:
+            write(staging)
+            os.replace(staging, self.directory / name)
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+
+# Shared by every entity
+_sprite_store: Optional[SpriteStore] = None
+
+def get_sprite_store() -> SpriteStore:
+    """Get the process-wide entity sprite store"""
+    global _sprite_store
+    if _sprite_store is None:
+        _sprite_store = SpriteStore()
+    return _sprite_store
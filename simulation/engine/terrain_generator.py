@@ -0,0 +1,327 @@
+import sys
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple
+from .config import Config
+from .utils import NoiseGenerator, code_fingerprint, coordinate_random
+from . import biome_classifier, hydrology
+from .biome_classifier import BiomeClassifier, get_biome_classifier
+from .generation_pipeline import GenerationPipeline, Region, Stage
+from .world_cache import WorldCache
+from .hydrology import simulate_flow
+
+# Resource types, indexed by the values stored in the resources layer
+RESOURCE_TYPES = [
+    "TREE", "BUSH", "HERB", "STONE", "METAL", "GEMSTONE",
+    "VEGETABLE", "MINERAL", "FISH", "SHELL", "CORAL"
+]
+
+# Resources layer value for tiles without a resource
+NO_RESOURCE = 255
+
+# Resource placement rules based on biomes
+RESOURCE_RULES = {
+    "FOREST": ["TREE", "BUSH", "HERB"],
+    "MOUNTAIN": ["STONE", "METAL", "GEMSTONE"],
+    "PLAINS": ["BUSH", "HERB", "VEGETABLE"],
+    "DESERT": ["STONE", "MINERAL"],
+    "WATER": ["FISH", "SHELL", "CORAL"]
+}
+
+# Layers holding continuous values, stored at WorldConfig.LAYER_PRECISION
+CONTINUOUS_LAYERS = ("elevation", "temperature", "moisture")
+
+# Layers holding small indices (biomes, resource types) or flags, stored as bytes
+CATEGORICAL_LAYERS = ("biomes", "resources", "rivers")
+CATEGORICAL_DTYPE = np.uint8
+
+# Accumulated flow outgrows float16, so it is always single precision
+FLOW_DTYPE = np.float32
+
+def layer_dtypes(config: Config) -> Dict[str, np.dtype]:
+    """Storage type of each generated layer"""
+    dtypes = {name: np.dtype(config.WORLD.LAYER_PRECISION) for name in CONTINUOUS_LAYERS}
+    dtypes.update({name: np.dtype(CATEGORICAL_DTYPE) for name in CATEGORICAL_LAYERS})
+    dtypes["flow"] = np.dtype(FLOW_DTYPE)
+    return dtypes
+
+# Per-process generator used by pool workers
+_worker_generator: Optional["TerrainGenerator"] = None
+
+def _init_worker(config: Config) -> None:
+    """Build the worker's generator once instead of once per block"""
+    global _worker_generator
+    _worker_generator = TerrainGenerator(config)
+
+def _generate_block(shm_names: Dict[str, str], shape: Tuple[int, int],
+                    x0: int, y0: int, width: int, height: int) -> None:
+    """Generate one block of the map and write it into the shared layer arrays"""
+    layers = _worker_generator.generate_region(x0, y0, width, height)
+    for name, data in layers.items():
+        shm = SharedMemory(name=shm_names[name])
+        try:
+            target = np.ndarray(shape, dtype=_worker_generator.layer_dtypes[name], buffer=shm.buf)
+            target[y0:y0 + height, x0:x0 + width] = data
+            del target  # Release the buffer export before closing
+        finally:
+            shm.close()
+
+class TerrainGenerator:
+    """
+    Generates world layers for any rectangular region of the map.
+    Every value depends only on the world seed and absolute tile coordinates,
+    so a region generated on its own matches the same area of a full map.
+
+    Generation is a pipeline of stages (elevation -> temperature, moisture ->
+    biomes -> resources, and elevation, moisture -> flow -> rivers). Whole-map
+    outputs are cached per stage, so after a config change only the stages
+    whose parameters changed, and the stages downstream of them, are re-run.
+    Drainage (flow, rivers) depends on the whole map, so it is only generated
+    for the full world, never for separate regions.
+    """
+    # Raw fractal noise range stretched onto elevation [0, 1]
+    ELEVATION_RANGE = (0.25, 0.75)
+
+    def __init__(self, config: Config):
+        self.config = config
+        self._noise_sources: Dict[int, NoiseGenerator] = {}
+
+        world_config = config.WORLD
+        self.pipeline = GenerationPipeline(
+            config,
+            self._build_stages(),
+            memory_budget=world_config.STAGE_CACHE_BUDGET,
+            disk_cache=WorldCache(budget=world_config.WORLD_CACHE_BUDGET) if world_config.CACHE_WORLD else None,
+            code=code_fingerprint(sys.modules[__name__], biome_classifier, hydrology,
+                                  NoiseGenerator, coordinate_random)
+        )
+
+    # World settings are read from the config on use, so they can be tuned
+    # between generation runs
+    @property
+    def width(self) -> int:
+        return self.config.WORLD.WORLD_WIDTH
+
+    @property
+    def height(self) -> int:
+        return self.config.WORLD.WORLD_HEIGHT
+
+    @property
+    def seed(self) -> int:
+        return self.config.WORLD.SEED
+
+    @property
+    def layer_dtypes(self) -> Dict[str, np.dtype]:
+        return layer_dtypes(self.config)
+
+    @property
+    def elevation_noise(self) -> NoiseGenerator:
+        return self._noise(self.seed)
+
+    @property
+    def moisture_noise(self) -> NoiseGenerator:
+        return self._noise(self.seed + 1)
+
+    def _noise(self, seed: int) -> NoiseGenerator:
+        """Get the noise source for a seed, building it on first use"""
+        if seed not in self._noise_sources:
+            self._noise_sources[seed] = NoiseGenerator(seed)
+        return self._noise_sources[seed]
+
+    def _build_stages(self) -> List[Stage]:
+        """Declare the generation stages with their inputs and parameters"""
+        def precision(config: Config) -> str:
+            return config.WORLD.LAYER_PRECISION
+
+        return [
+            Stage("elevation",
+                  lambda region, params: self._generate_elevation(
+                      region.xs, region.ys).astype(params["precision"]),
+                  params=lambda config: {"seed": config.WORLD.SEED,
+                                         "range": list(self.ELEVATION_RANGE),
+                                         "precision": precision(config)}),
+            Stage("temperature",
+                  lambda region, params, elevation: self._generate_temperature(
+                      region.ys, elevation).astype(params["precision"]),
+                  inputs=("elevation",),
+                  params=lambda config: {"world_height": config.WORLD.WORLD_HEIGHT,
+                                         "precision": precision(config)}),
+            Stage("moisture",
+                  lambda region, params, elevation: self._generate_moisture(
+                      region.xs, region.ys, elevation).astype(params["precision"]),
+                  inputs=("elevation",),
+                  params=lambda config: {"seed": config.WORLD.SEED,
+                                         "precision": precision(config)}),
+            Stage("biomes",
+                  lambda region, params, temperature, moisture, elevation:
+                      self._determine_biomes(temperature, moisture, elevation),
+                  inputs=("temperature", "moisture", "elevation"),
+                  params=lambda config: {"thresholds": config.BIOME_THRESHOLDS,
+                                         "temperature_range": [config.WORLD.MIN_TEMPERATURE,
+                                                               config.WORLD.MAX_TEMPERATURE]}),
+            Stage("resources",
+                  lambda region, params, biomes: self._place_resources(
+                      region.xs, region.ys, biomes),
+                  inputs=("biomes",),
+                  params=lambda config: {"seed": config.WORLD.SEED,
+                                         "chance": config.WORLD.RESOURCE_CHANCE,
+                                         "rules": RESOURCE_RULES}),
+            Stage("flow",
+                  lambda region, params, elevation, moisture: simulate_flow(
+                      elevation, moisture, params["iterations"], params["rate"]).astype(FLOW_DTYPE),
+                  inputs=("elevation", "moisture"),
+                  params=lambda config: {"iterations": config.WORLD.EROSION_ITERATIONS,
+                                         "rate": config.WORLD.EROSION_RATE},
+                  is_global=True),
+            Stage("rivers",
+                  lambda region, params, flow: (flow >= params["min_flow"]).astype(CATEGORICAL_DTYPE),
+                  inputs=("flow",),
+                  params=lambda config: {"min_flow": config.WORLD.RIVER_MIN_FLOW})
+        ]
+
+    def generate_region(self, x0: int, y0: int, width: int, height: int) -> Dict[str, np.ndarray]:
+        """
+        Generate the region-local world layers for a region, bypassing the stage caches
+
+        Args:
+            x0, y0: Top-left tile of the region
+            width, height: Region size in tiles
+
+        Returns:
+            Dict of layer name to (height, width) array
+        """
+        return self.pipeline.run(Region(x0, y0, width, height),
+                                 self.pipeline.local_stages, cached=False)
+
+    def generate_world(self, workers: int = 1, block_size: int = 128) -> Dict[str, np.ndarray]:
+        """
+        Generate all layers for the whole map through the stage caches
+
+        A cold start with workers > 1 generates the region-local stages in a
+        process pool; otherwise only stages without a cached output for the
+        current config run.
+        """
+        region = Region(0, 0, self.width, self.height)
+        if workers > 1 and not any(self.pipeline.is_cached(region, name)
+                                   for name in self.pipeline.stages):
+            layers = self.generate_parallel(workers, block_size)
+            self.pipeline.store(region, layers)
+            return self.pipeline.run(region, known=layers)
+        return self.pipeline.run(region)
+
+    def generate_parallel(self, workers: int, block_size: int) -> Dict[str, np.ndarray]:
+        """
+        Generate the region-local layers of the whole map in a process pool
+
+        The map is split into block_size x block_size tile blocks; each worker
+        writes its blocks straight into shared-memory layer arrays. Because every
+        value depends only on absolute coordinates, block borders line up exactly
+        and the result matches generate_region over the full map.
+        """
+        shape = (self.height, self.width)
+        shared = {
+            name: SharedMemory(create=True, size=max(1, self.width * self.height * np.dtype(dtype).itemsize))
+            for name, dtype in self.layer_dtypes.items()
+            if name in self.pipeline.local_stages
+        }
+        shm_names = {name: shm.name for name, shm in shared.items()}
+
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self.config,)) as pool:
+                futures = [
+                    pool.submit(_generate_block, shm_names, shape, x0, y0,
+                                min(block_size, self.width - x0),
+                                min(block_size, self.height - y0))
+                    for y0 in range(0, self.height, block_size)
+                    for x0 in range(0, self.width, block_size)
+                ]
+                for future in futures:
+                    future.result()  # Re-raise worker errors
+
+            # Copy out so the shared segments can be released
+            return {
+                name: np.ndarray(shape, dtype=self.layer_dtypes[name], buffer=shm.buf).copy()
+                for name, shm in shared.items()
+            }
+        finally:
+            for shm in shared.values():
+                shm.close()
+                shm.unlink()
+
+    def _generate_elevation(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Generate elevation using multiple octaves of Perlin noise"""
+        scale = 50.0
+        octaves = 6
+        persistence = 0.5
+        lacunarity = 2.0
+
+        raw_elevation = self.elevation_noise.fractal2d(
+            xs / scale, ys / scale, octaves, persistence, lacunarity)
+
+        # Stretch the raw noise range onto [0, 1]; a fixed range (rather than the
+        # region's own min/max) keeps separately generated regions consistent
+        low, high = self.ELEVATION_RANGE
+        return np.clip((raw_elevation - low) / (high - low), 0.0, 1.0)
+
+    def _generate_temperature(self, ys: np.ndarray, elevation: np.ndarray) -> np.ndarray:
+        """Generate temperature based on elevation and latitude"""
+        # Latitude effect as a column vector, broadcast across every row
+        base_temp = 1.0 - np.abs(ys - self.height/2) / (self.height/2)
+
+        # Temperature decreases with elevation
+        elevation_factor = 1.0 - elevation
+        return base_temp * elevation_factor
+
+    def _generate_moisture(self, xs: np.ndarray, ys: np.ndarray,
+                           elevation: np.ndarray) -> np.ndarray:
+        """Generate moisture levels using noise and elevation data"""
+        scale = 30.0
+        base_moisture = self.moisture_noise.noise2d_array(xs / scale, ys / scale)
+
+        # Moisture tends to collect in lower elevations
+        elevation_factor = 1.0 - elevation
+        return (base_moisture + elevation_factor) / 2
+
+    def _determine_biomes(self, temperature: np.ndarray, moisture: np.ndarray,
+                          elevation: np.ndarray) -> np.ndarray:
+        """Determine biomes based on temperature, moisture, and elevation"""
+        biomes = get_biome_classifier(self.config).classify(temperature, moisture, elevation)
+        return biomes.astype(self.layer_dtypes["biomes"])
+
+    def _place_resources(self, xs: np.ndarray, ys: np.ndarray,
+                         biomes: np.ndarray) -> np.ndarray:
+        """Place resources based on biome types, using per-tile deterministic draws"""
+        resources = np.full(biomes.shape, NO_RESOURCE, dtype=self.layer_dtypes["resources"])
+
+        choices, counts = self._build_resource_choices(get_biome_classifier(self.config))
+
+        # Masked draw: tiles in a biome with resources whose spawn roll succeeds
+        choice_counts = counts[biomes]
+        spawned = coordinate_random(xs, ys, self.seed, salt=1) < self.config.WORLD.RESOURCE_CHANCE
+        spawned &= choice_counts > 0
+        rows, cols = np.nonzero(spawned)
+
+        # Pick each spawned tile's resource from its biome's candidates
+        type_roll = coordinate_random(xs[cols], ys[rows, 0], self.seed, salt=2)
+        choice = (type_roll * choice_counts[rows, cols]).astype(np.intp)
+        resources[rows, cols] = choices[biomes[rows, cols], choice]
+        return resources
+
+    @staticmethod
+    def _build_resource_choices(classifier: BiomeClassifier) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-biome table of candidate resource type indices, and candidate counts"""
+        names = classifier.names
+        choices = np.zeros((len(names), max(map(len, RESOURCE_RULES.values()))), dtype=np.uint8)
+        counts = np.zeros(len(names), dtype=np.intp)
+
+        for index, biome_name in enumerate(names):
+            biome_type = next((k for k in RESOURCE_RULES.keys()
+                             if any(b in biome_name for b in k.split('_'))), None)
+            if biome_type:
+                candidates = [RESOURCE_TYPES.index(r) for r in RESOURCE_RULES[biome_type]]
+                choices[index, :len(candidates)] = candidates
+                counts[index] = len(candidates)
+
+        return choices, counts
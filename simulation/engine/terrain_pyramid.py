@@ -0,0 +1,102 @@
+import math
+from typing import List, Optional
+import numpy as np
+import pygame
+
+class TerrainPyramid:
+    """
+    Mip levels of the terrain image for far-out zoom levels and the minimap.
+
+    Level 0 holds one pixel per tile (the biome palette color); each level
+    above averages 2x2 pixels of the one below, down to a single pixel. Levels
+    are kept both as (x, y, rgb) arrays and as surfaces, and a tile change
+    rewrites only the pixels above that tile. Any view is drawn from the
+    level with at least one pixel per screen pixel, so its cost is bounded by
+    the screen size rather than the number of tiles shown.
+
+    A lazy world's pyramid holds only the chunks generated so far, the rest
+    left black, and the world fills in each chunk as it is generated: drawing
+    the map never generates it.
+    """
+    def __init__(self, world, palette: np.ndarray):
+        self.world = world
+        self.palette = palette
+
+        # The whole map at one pixel per tile
+        if world.chunks is None:
+            biomes = world.get_region("biomes", 0, 0, world.width, world.height)
+            base = palette[biomes.T]
+        else:
+            base = np.zeros((world.width, world.height, 3), dtype=np.uint8)
+            size = world.chunks.chunk_size
+            for chunk in world.chunks.chunks.values():
+                biomes = chunk.layers["biomes"]
+                x0, y0 = chunk.chunk_x * size, chunk.chunk_y * size
+                base[x0:x0 + biomes.shape[1], y0:y0 + biomes.shape[0]] = palette[biomes.T]
+        self.levels: List[np.ndarray] = [base]
+        while max(self.levels[-1].shape[:2]) > 1:
+            self.levels.append(self._downsample(self.levels[-1]))
+        self.surfaces = [pygame.surfarray.make_surface(level) for level in self.levels]
+
+        # Bumped on every change so derived images (the minimap) know to refresh
+        self.version = 0
+
+    def update(self, x0: int, y0: int, x1: int, y1: int, biomes: Optional[np.ndarray] = None) -> None:
+        """Rebuild the pixels above the tile rectangle [x0, x1) x [y0, y1) at every level, from its biomes if given"""
+        if biomes is None:
+            biomes = self.world.get_region("biomes", x0, y0, x1, y1)
+        self._write(0, x0, y0, self.palette[biomes.T])
+
+        for level in range(1, len(self.levels)):
+            below = self.levels[level - 1]
+            x0, y0 = x0 // 2, y0 // 2
+            x1, y1 = (x1 + 1) // 2, (y1 + 1) // 2
+            block = below[2 * x0:2 * x1, 2 * y0:2 * y1]
+            self._write(level, x0, y0, self._downsample(block))
+        self.version += 1
+
+    def level_for(self, pixels_per_tile: float) -> int:
+        """The smallest level with at least one pixel per screen pixel"""
+        if pixels_per_tile >= 1:
+            return 0
+        level = int(math.floor(math.log2(1 / pixels_per_tile)))
+        return min(level, len(self.levels) - 1)
+
+    def render(self, screen: pygame.Surface, pixels_per_tile: float,
+               camera_x: float, camera_y: float) -> None:
+        """Draw the map at any scale, with the camera at the screen's top left corner"""
+        level = self.level_for(pixels_per_tile)
+        tiles_per_pixel = 2 ** level
+        scale = pixels_per_tile * tiles_per_pixel  # Screen pixels per level pixel
+
+        # Level pixels covering the screen
+        surface = self.surfaces[level]
+        left = camera_x / tiles_per_pixel
+        top = camera_y / tiles_per_pixel
+        source = pygame.Rect(
+            math.floor(left), math.floor(top),
+            math.ceil(left + screen.get_width() / scale) - math.floor(left) + 1,
+            math.ceil(top + screen.get_height() / scale) - math.floor(top) + 1
+        ).clip(surface.get_rect())
+        if source.width <= 0 or source.height <= 0:
+            return
+
+        image = surface.subsurface(source)
+        if scale != 1:
+            image = pygame.transform.scale(image, (max(1, round(source.width * scale)),
+                                                   max(1, round(source.height * scale))))
+        screen.blit(image, (round((source.x - left) * scale), round((source.y - top) * scale)))
+
+    def _write(self, level: int, x: int, y: int, pixels: np.ndarray) -> None:
+        """Store pixels in a level's array and surface"""
+        width, height = pixels.shape[:2]
+        self.levels[level][x:x + width, y:y + height] = pixels
+        pygame.surfarray.blit_array(self.surfaces[level].subsurface((x, y, width, height)), pixels)
+
+    @staticmethod
+    def _downsample(image: np.ndarray) -> np.ndarray:
+        """Average 2x2 pixel blocks, repeating the last row/column of odd-sized images"""
+        width, height = image.shape[:2]
+        padded = np.pad(image, ((0, width % 2), (0, height % 2), (0, 0)), mode='edge').astype(np.uint16)
+        total = padded[0::2, 0::2] + padded[1::2, 0::2] + padded[0::2, 1::2] + padded[1::2, 1::2]
+        return ((total + 2) // 4).astype(np.uint8)
@@ -0,0 +1,255 @@
+import math
+from collections import OrderedDict
+from typing import Tuple
+import numpy as np
+import pygame
+from .terrain_pyramid import TerrainPyramid
+
+# Colors for each biome type
+BIOME_COLORS = {
+    "BOREAL_FOREST": (34, 139, 34),      # Forest Green
+    "DECIDUOUS_FOREST": (0, 100, 0),      # Dark Green
+    "RAINFOREST": (0, 128, 0),           # Green
+    "TUNDRA": (238, 233, 233),          # Snow White
+    "STEPPE": (218, 165, 32),           # Golden Rod
+    "SAVANNA": (255, 228, 181),         # Moccasin
+    "POLAR_DESERT": (255, 250, 250),    # Snow
+    "SEMI_ARID_DESERT": (210, 180, 140), # Tan
+    "SAND_DESERT": (244, 164, 96),      # Sandy Brown
+    "HEATH": (85, 107, 47),             # Dark Olive Green
+    "CHAPARRAL": (189, 183, 107),       # Dark Khaki
+    "SWAMP": (47, 79, 79),              # Dark Slate Gray
+}
+DEFAULT_BIOME_COLOR = (128, 128, 128)  # Gray for biomes without a color
+RESOURCE_COLOR = (139, 69, 19)  # Brown
+
+class TerrainRenderer:
+    """
+    Draws world terrain, in one of two modes.
+
+    "chunks" draws from pre-rendered chunk surfaces. Each chunk is baked once
+    per tile size: its biomes are mapped through a color palette, scaled up to
+    the tile size and overlaid with resource markers. A frame is then one blit
+    per visible chunk. Baked surfaces are kept in an LRU cache bounded by
+    DISPLAY.TERRAIN_CACHE_BUDGET bytes, and a chunk is re-baked only after its
+    tiles change.
+
+    "palette" maps the visible biomes through the palette and expands them to
+    screen pixels with np.repeat, overlays resource markers from a mask and
+    writes the result with a single surfarray blit. Its cost depends only on
+    screen pixels, which suits zoomed-out views where tiles are a few pixels
+    wide. "auto" (DISPLAY.TERRAIN_RENDER_MODE's default) uses the palette
+    mode up to DISPLAY.PALETTE_MAX_TILE_SIZE pixels per tile.
+
+    At one pixel per tile or less, and for the minimap, the terrain is drawn
+    from a TerrainPyramid of downsampled images instead.
+    """
+    def __init__(self, world):
+        self.world = world
+        self.config = world.config
+        self.chunk_size = world.config.WORLD.CHUNK_SIZE
+        self.memory_budget = world.config.DISPLAY.TERRAIN_CACHE_BUDGET
+
+        # (chunk_x, chunk_y, tile_size) -> baked surface
+        self.surfaces: "OrderedDict[Tuple[int, int, int], pygame.Surface]" = OrderedDict()
+        self.cached_bytes = 0
+        self.baked_count = 0
+        self.palette = self._build_palette()
+
+        # Built on first far-out view or minimap, then updated tile by tile
+        self._pyramid = None
+        self._minimap = None
+        self._minimap_key = None
+
+    @property
+    def pyramid(self) -> TerrainPyramid:
+        """Mip levels of the terrain image, built on first use"""
+        if self._pyramid is None:
+            self._pyramid = TerrainPyramid(self.world, self.palette)
+        return self._pyramid
+
+    def render(self, screen: pygame.Surface, zoom_level: float, camera_x: float, camera_y: float) -> None:
+        """Draw the terrain covering the screen"""
+        # Single-pixel tiles have no room for resource markers, so they come from the pyramid too
+        pixels_per_tile = self.config.WORLD.TILE_SIZE * zoom_level
+        if pixels_per_tile < 2:
+            self.pyramid.render(screen, pixels_per_tile, camera_x, camera_y)
+            return
+        tile_size = int(pixels_per_tile)
+        size = self.chunk_size
+
+        # Tile (x, y) is drawn at pixel (x, y) * tile_size - origin in both modes
+        origin_x = math.floor(camera_x * tile_size)
+        origin_y = math.floor(camera_y * tile_size)
+
+        # Tiles overlapping the screen
+        start_x = max(0, origin_x // tile_size)
+        start_y = max(0, origin_y // tile_size)
+        end_x = min(self.world.width, -(-(origin_x + screen.get_width()) // tile_size))
+        end_y = min(self.world.height, -(-(origin_y + screen.get_height()) // tile_size))
+        if start_x >= end_x or start_y >= end_y:
+            return
+
+        mode = self.config.DISPLAY.TERRAIN_RENDER_MODE
+        if mode == "auto":
+            mode = "palette" if tile_size <= self.config.DISPLAY.PALETTE_MAX_TILE_SIZE else "chunks"
+        if mode == "palette":
+            self._render_palette(screen, tile_size, origin_x, origin_y, start_x, start_y, end_x, end_y)
+            return
+
+        for chunk_y in range(start_y // size, (end_y - 1) // size + 1):
+            for chunk_x in range(start_x // size, (end_x - 1) // size + 1):
+                surface = self.get_chunk_surface(chunk_x, chunk_y, tile_size)
+                screen.blit(surface, (chunk_x * size * tile_size - origin_x,
+                                      chunk_y * size * tile_size - origin_y))
+
+    def screen_rect(self, x0: int, y0: int, x1: int, y1: int, zoom_level: float,
+                    camera_x: float, camera_y: float) -> pygame.Rect:
+        """Screen area whose pixels depend on the tile rectangle [x0, x1) x [y0, y1)"""
+        pixels_per_tile = self.config.WORLD.TILE_SIZE * zoom_level
+        if pixels_per_tile < 2:
+            # A pyramid pixel averages a whole block of tiles
+            block = 2 ** self.pyramid.level_for(pixels_per_tile)
+            x0, y0 = x0 // block * block, y0 // block * block
+            x1, y1 = -(-x1 // block) * block, -(-y1 // block) * block
+            tile_size = pixels_per_tile
+        else:
+            tile_size = int(pixels_per_tile)
+
+        # One pixel of margin covers the rounding of either drawing path
+        left = math.floor((x0 - camera_x) * tile_size) - 1
+        top = math.floor((y0 - camera_y) * tile_size) - 1
+        right = math.ceil((x1 - camera_x) * tile_size) + 1
+        bottom = math.ceil((y1 - camera_y) * tile_size) + 1
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def _render_palette(self, screen: pygame.Surface, tile_size: int, origin_x: int, origin_y: int,
+                        start_x: int, start_y: int, end_x: int, end_y: int) -> None:
+        """Draw the visible tiles as one pixel array written with surfarray"""
+        # Screen position of the first visible tile, and the on-screen part of the tile range
+        left = start_x * tile_size - origin_x
+        top = start_y * tile_size - origin_y
+        target = pygame.Rect(left, top, (end_x - start_x) * tile_size,
+                             (end_y - start_y) * tile_size).clip(screen.get_rect())
+        if target.width <= 0 or target.height <= 0:
+            return
+
+        # Crop of the expanded tile range that lands on screen
+        crop = (slice(target.x - left, target.right - left), slice(target.y - top, target.bottom - top))
+
+        # Pixel values in the screen's format per tile (surfarray is indexed x, y),
+        # expanded to tile_size blocks
+        colors = np.array([screen.map_rgb(tuple(color)) for color in self.palette], dtype=np.uint32)
+        biomes = self.world.get_region("biomes", start_x, start_y, end_x, end_y)
+        pixels = colors.take(biomes.T)
+        pixels = np.repeat(np.repeat(pixels, tile_size, axis=0), tile_size, axis=1)[crop]
+
+        # Resource markers: a disc in the middle of every resource tile
+        resource_xs, resource_ys, _ = self.world.get_resources_in(start_x, start_y, end_x, end_y)
+        if len(resource_xs):
+            has_resource = np.zeros(biomes.T.shape, dtype=bool)
+            has_resource[resource_xs - start_x, resource_ys - start_y] = True
+            marker = np.repeat(np.repeat(has_resource, tile_size, axis=0), tile_size, axis=1)[crop]
+            marker &= np.tile(self._marker_mask(tile_size), has_resource.shape)[crop]
+            np.copyto(pixels, screen.map_rgb(RESOURCE_COLOR), where=marker)
+
+        pygame.surfarray.blit_array(screen.subsurface(target), pixels)
+
+    @staticmethod
+    def _marker_mask(tile_size: int) -> np.ndarray:
+        """Pixels of one tile covered by a resource marker"""
+        center = tile_size // 2
+        radius = max(1, tile_size // 4)
+        offsets = np.arange(tile_size) - center
+        return offsets[:, np.newaxis] ** 2 + offsets[np.newaxis, :] ** 2 <= radius ** 2
+
+    def render_minimap(self, screen: pygame.Surface, rect: pygame.Rect, view: pygame.Rect) -> None:
+        """Draw the whole map scaled into rect, outlining the view (in tiles)"""
+        pixels_per_tile = min(rect.width / self.world.width, rect.height / self.world.height)
+        size = (max(1, round(self.world.width * pixels_per_tile)),
+                max(1, round(self.world.height * pixels_per_tile)))
+
+        # Rescale from the pyramid only when the map changed or the minimap was resized
+        key = (size, self.pyramid.version)
+        if self._minimap_key != key:
+            level = self.pyramid.level_for(pixels_per_tile)
+            self._minimap = pygame.transform.scale(self.pyramid.surfaces[level], size)
+            self._minimap_key = key
+
+        screen.blit(self._minimap, rect.topleft)
+        outline = pygame.Rect(rect.x + view.x * pixels_per_tile, rect.y + view.y * pixels_per_tile,
+                              max(1, view.width * pixels_per_tile), max(1, view.height * pixels_per_tile))
+        pygame.draw.rect(screen, (255, 255, 255), outline.clip(pygame.Rect(rect.topleft, size)), 1)
+
+    def get_chunk_surface(self, chunk_x: int, chunk_y: int, tile_size: int) -> pygame.Surface:
+        """Get a chunk's baked surface at a tile size, baking it on a miss"""
+        key = (chunk_x, chunk_y, tile_size)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+
+        surface = self._bake(chunk_x, chunk_y, tile_size)
+        self.surfaces[key] = surface
+        self.cached_bytes += self._surface_bytes(surface)
+        self.baked_count += 1
+
+        # Evict least recently used surfaces, never the one just baked
+        while self.cached_bytes > self.memory_budget and len(self.surfaces) > 1:
+            _, evicted = self.surfaces.popitem(last=False)
+            self.cached_bytes -= self._surface_bytes(evicted)
+        return surface
+
+    def invalidate(self, x0: int, y0: int, x1: int, y1: int) -> None:
+        """Drop the baked surfaces of every chunk touching the tile rectangle [x0, x1) x [y0, y1)"""
+        size = self.chunk_size
+        chunk_xs = range(x0 // size, (x1 - 1) // size + 1)
+        chunk_ys = range(y0 // size, (y1 - 1) // size + 1)
+        for key in [key for key in self.surfaces if key[0] in chunk_xs and key[1] in chunk_ys]:
+            self.cached_bytes -= self._surface_bytes(self.surfaces.pop(key))
+        if self._pyramid is not None:
+            self._pyramid.update(x0, y0, x1, y1)
+
+    def add_generated(self, x0: int, y0: int, biomes: np.ndarray) -> None:
+        """Fill a newly generated block of a lazy world into the pyramid"""
+        if self._pyramid is not None:
+            height, width = biomes.shape
+            self._pyramid.update(x0, y0, x0 + width, y0 + height, biomes)
+
+    def clear(self) -> None:
+        """Drop every baked surface and the pyramid, and rebuild the palette (after regeneration)"""
+        self.surfaces.clear()
+        self.cached_bytes = 0
+        self.palette = self._build_palette()
+        self._pyramid = None
+        self._minimap_key = None
+
+    def _bake(self, chunk_x: int, chunk_y: int, tile_size: int) -> pygame.Surface:
+        """Render one chunk: palette colors scaled to the tile size, then resource markers"""
+        x0 = chunk_x * self.chunk_size
+        y0 = chunk_y * self.chunk_size
+        x1 = min(x0 + self.chunk_size, self.world.width)
+        y1 = min(y0 + self.chunk_size, self.world.height)
+
+        # surfarray is indexed (x, y), so the color image is transposed
+        colors = self.palette[self.world.get_region("biomes", x0, y0, x1, y1)]
+        tiles = pygame.surfarray.make_surface(colors.transpose(1, 0, 2))
+        surface = pygame.transform.scale(tiles, ((x1 - x0) * tile_size, (y1 - y0) * tile_size))
+
+        resource_xs, resource_ys, _ = self.world.get_resources_in(x0, y0, x1, y1)
+        for x, y in zip(resource_xs.tolist(), resource_ys.tolist()):
+            pygame.draw.circle(surface, RESOURCE_COLOR,
+                               ((x - x0) * tile_size + tile_size // 2,
+                                (y - y0) * tile_size + tile_size // 2),
+                               tile_size // 4)
+        return surface
+
+    def _build_palette(self) -> np.ndarray:
+        """RGB color per biome index, in the current biome classifier's order"""
+        names = self.world.biome_classifier.names
+        return np.array([BIOME_COLORS.get(name, DEFAULT_BIOME_COLOR) for name in names],
+                        dtype=np.uint8)
+
+    @staticmethod
+    def _surface_bytes(surface: pygame.Surface) -> int:
+        return surface.get_pitch() * surface.get_height()
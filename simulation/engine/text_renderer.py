@@ -0,0 +1,61 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import pygame
+
+class TextRenderer:
+    """
+    Renders UI text with cached fonts and text surfaces.
+
+    Fonts are created once per size, and rendered strings are kept in an LRU
+    keyed by (text, size, color), so text that rarely changes (the clock, the
+    selected entity's name) is rendered once rather than every frame. Fonts
+    are only loaded on first use, so a renderer costs nothing when no text is
+    ever drawn.
+    """
+    def __init__(self, max_surfaces: int = 256):
+        self.max_surfaces = max_surfaces
+        self.fonts: Dict[int, pygame.font.Font] = {}
+        self.surfaces: "OrderedDict[Tuple[str, int, Tuple[int, ...]], pygame.Surface]" = OrderedDict()
+        self.rendered_count = 0
+
+    def font(self, size: int) -> pygame.font.Font:
+        """Get the default font at a size"""
+        font = self.fonts.get(size)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = self.fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def render(self, text: str, size: int, color: Tuple[int, ...]) -> pygame.Surface:
+        """Get the surface for a string, rendering it only on a cache miss"""
+        key = (text, size, tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+
+        surface = self.surfaces[key] = self.font(size).render(text, True, color)
+        self.rendered_count += 1
+        if len(self.surfaces) > self.max_surfaces:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def draw(self, surface: pygame.Surface, text: str, pos: Tuple[int, int],
+             color: Tuple[int, ...], size: int = 20, centered: bool = False) -> pygame.Rect:
+        """Draw text onto a surface, returning the area it covers"""
+        text_surface = self.render(text, size, color)
+        if centered:
+            pos = (pos[0] - text_surface.get_width() // 2,
+                   pos[1] - text_surface.get_height() // 2)
+        return surface.blit(text_surface, pos)
+
+# Shared by the game UI and utils.draw_text
+_text_renderer: Optional[TextRenderer] = None
+
+def get_text_renderer() -> TextRenderer:
+    """Get the process-wide text renderer"""
+    global _text_renderer
+    if _text_renderer is None:
+        _text_renderer = TextRenderer()
+    return _text_renderer
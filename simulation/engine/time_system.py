@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from typing import Tuple
-from .config import TimeOfDay, Month, Weekday, Config
+from .config import TimeOfDay, Month, Weekday, Config, TimeConfig
 
 @dataclass
 class GameTime:
@@ -21,6 +21,12 @@ class GameTime:
             year=self.year
         )
 
+    def to_minutes(self, time_config: TimeConfig) -> int:
+        """Minutes elapsed since the start of the calendar"""
+        days = ((self.year - 1) * time_config.MONTHS_PER_YEAR +
+                (self.month - 1)) * time_config.DAYS_PER_MONTH + self.day - 1
+        return (days * time_config.HOURS_PER_DAY + self.hour) * time_config.MINUTES_PER_HOUR + self.minute
+
 class TimeSystem:
     """
     Manages the passage of time in the game world, including the custom calendar system.
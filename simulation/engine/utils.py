@@ -1,8 +1,11 @@
+import hashlib
+import inspect
 import math
 import random
 from typing import Dict, List, Optional, Tuple, Any
 import pygame
 import numpy as np
+from .text_renderer import get_text_renderer
 
 class Point:
     """2D point with utility methods"""
@@ -99,95 +102,154 @@ class PathFinder:
         return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
 class NoiseGenerator:
-    """Perlin noise generator for terrain generation"""
+    """
+    Perlin noise generator for terrain generation.
+    Accepts scalar or NumPy array coordinates; arrays are broadcast against each
+    other, so a row of x samples and a column of y samples yield a full 2D field.
+    """
+    # Gradient directions indexed by the low 3 bits of the permutation hash
+    GRAD_X = np.array([1, -1, 1, -1, 1, -1, 0, 0], dtype=np.float32)
+    GRAD_Y = np.array([1, 1, -1, -1, 0, 0, 1, -1], dtype=np.float32)
+    MAX_OCTAVES = 16
+
     def __init__(self, seed: Optional[int] = None):
         self.seed = seed if seed is not None else random.randint(0, 1000000)
-        random.seed(self.seed)
+        rng = np.random.default_rng(self.seed)
         
-        # Generate permutation table
-        self.perm = list(range(256))
-        random.shuffle(self.perm)
-        self.perm += self.perm
+        # Generate permutation table, doubled so corner lookups never wrap
+        perm = rng.permutation(256)
+        self.perm = np.concatenate([perm, perm]).astype(np.intp)
+        self.grad_index = self.perm & 7
+        
+        # Per-octave sample offsets so octaves don't share lattice points
+        self.octave_offsets = rng.uniform(0, 256, size=(self.MAX_OCTAVES, 2))
     
     def noise2d(self, x: float, y: float) -> float:
-        """Generate 2D Perlin noise value"""
-        # Integer coordinates
-        xi = int(x) & 255
-        yi = int(y) & 255
+        """Generate a single 2D Perlin noise value in [0, 1]"""
+        return float(self.noise2d_array(x, y))
+    
+    def noise2d_array(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        Generate 2D Perlin noise in [0, 1] for broadcastable coordinate arrays.
+        Lattice math runs on the (small) input arrays; only the corner hashing and
+        blending run at the full broadcast shape, in float32 and mostly in place.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
         
-        # Decimal parts
-        xf = x - int(x)
-        yf = y - int(y)
+        # Integer lattice coordinates and decimal parts
+        x_floor = np.floor(x)
+        y_floor = np.floor(y)
+        xi = x_floor.astype(np.intp) & 255
+        yi = y_floor.astype(np.intp) & 255
+        xf = (x - x_floor).astype(np.float32)
+        yf = (y - y_floor).astype(np.float32)
         
         # Fade functions
         u = self._fade(xf)
         v = self._fade(yf)
         
-        # Hash coordinates
-        aa = self.perm[self.perm[xi] + yi]
-        ab = self.perm[self.perm[xi] + yi + 1]
-        ba = self.perm[self.perm[xi + 1] + yi]
-        bb = self.perm[self.perm[xi + 1] + yi + 1]
+        # Hash the x lattice coordinates once; corners add the y coordinate
+        px0 = self.perm[xi]
+        px1 = self.perm[xi + 1]
         
         # Blend results
-        x1 = self._lerp(
-            self._grad(aa, xf, yf),
-            self._grad(ba, xf - 1, yf),
-            u
-        )
-        x2 = self._lerp(
-            self._grad(ab, xf, yf - 1),
-            self._grad(bb, xf - 1, yf - 1),
-            u
-        )
+        x1 = self._grad(px0 + yi, xf, yf)
+        x1 += u * (self._grad(px1 + yi, xf - 1, yf) - x1)
+        x2 = self._grad(px0 + yi + 1, xf, yf - 1)
+        x2 += u * (self._grad(px1 + yi + 1, xf - 1, yf - 1) - x2)
+        x1 += v * (x2 - x1)
+        
+        x1 += 1
+        x1 *= 0.5
+        return x1
+    
+    def fractal2d(self, x: np.ndarray, y: np.ndarray, octaves: int = 6,
+                  persistence: float = 0.5, lacunarity: float = 2.0) -> np.ndarray:
+        """
+        Generate fractal (multi-octave) Perlin noise in [0, 1]
+        
+        Args:
+            x, y: Broadcastable sample coordinates
+            octaves: Number of noise layers to sum (at most MAX_OCTAVES)
+            persistence: Amplitude multiplier between octaves
+            lacunarity: Frequency multiplier between octaves
         
-        return (self._lerp(x1, x2, v) + 1) / 2
+        Returns:
+            Noise field with the broadcast shape of x and y
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        
+        total = np.zeros(np.broadcast_shapes(x.shape, y.shape))
+        amplitude = 1.0
+        frequency = 1.0
+        max_value = 0.0
+        
+        for offset_x, offset_y in self.octave_offsets[:octaves]:
+            total += self.noise2d_array(x * frequency + offset_x,
+                                        y * frequency + offset_y) * amplitude
+            max_value += amplitude
+            amplitude *= persistence
+            frequency *= lacunarity
+        
+        return total / max_value
     
-    def _fade(self, t: float) -> float:
+    def _fade(self, t: np.ndarray) -> np.ndarray:
         """Fade function for smooth interpolation"""
         return t * t * t * (t * (t * 6 - 15) + 10)
     
-    def _lerp(self, a: float, b: float, t: float) -> float:
-        """Linear interpolation"""
-        return a + t * (b - a)
+    def _grad(self, corner: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Dot product of the hashed corner gradient with the offset vector"""
+        h = self.grad_index[corner]
+        result = self.GRAD_X[h] * x
+        result += self.GRAD_Y[h] * y
+        return result
+
+def coordinate_random(x: np.ndarray, y: np.ndarray, seed: int, salt: int = 0) -> np.ndarray:
+    """
+    Deterministic uniform [0, 1) values keyed by integer tile coordinates.
+    Each value depends only on (seed, salt, x, y), so any region of the world
+    draws the same numbers no matter how generation is split up.
+    """
+    x, y = np.broadcast_arrays(np.atleast_1d(x), np.atleast_1d(y))
+    key = np.uint64((seed * 0x9E3779B97F4A7C15 + salt * 0xD1B54A32D192ED03 +
+                     0x632BE59BD9B4E019) & 0xFFFFFFFFFFFFFFFF)
+    h = (x.astype(np.int64).astype(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)) ^ \
+        (y.astype(np.int64).astype(np.uint64) * np.uint64(0x165667B19E3779F9)) ^ key
+    
+    # SplitMix64 finalizer
+    h ^= h >> np.uint64(30)
+    h *= np.uint64(0xBF58476D1CE4E5B9)
+    h ^= h >> np.uint64(27)
+    h *= np.uint64(0x94D049BB133111EB)
+    h ^= h >> np.uint64(31)
     
-    def _grad(self, hash: int, x: float, y: float) -> float:
-        """Gradient function"""
-        h = hash & 15
-        grad_x = 1 + (h & 7)  # Gradient x
-        grad_y = 1 + (h >> 4)  # Gradient y
-        return ((grad_x * x + grad_y * y) * (1 if (h & 8) == 0 else -1))
+    return (h >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
 
 def load_sprite_sheet(path: str, sprite_width: int, sprite_height: int) -> List[pygame.Surface]:
-    """Load a sprite sheet and split into individual sprites"""
+    """Load a sprite sheet and split into individual sprites (sub-rects of the sheet)"""
     try:
-        sheet = pygame.image.load(path).convert_alpha()
+        sheet = pygame.image.load(path)
+        # Converting needs a display mode; headless and web runs keep the loaded format
+        if pygame.display.get_init() and pygame.display.get_surface() is not None:
+            sheet = sheet.convert_alpha()
         sprites = []
         
-        for y in range(0, sheet.get_height(), sprite_height):
-            for x in range(0, sheet.get_width(), sprite_width):
-                sprite = pygame.Surface((sprite_width, sprite_height), 
-                                     pygame.SRCALPHA)
-                sprite.blit(sheet, (0, 0), (x, y, sprite_width, sprite_height))
-                sprites.append(sprite)
+        for y in range(0, sheet.get_height() - sprite_height + 1, sprite_height):
+            for x in range(0, sheet.get_width() - sprite_width + 1, sprite_width):
+                sprites.append(sheet.subsurface((x, y, sprite_width, sprite_height)))
         
         return sprites
-    except pygame.error as e:
+    except (pygame.error, FileNotFoundError) as e:
         print(f"Error loading sprite sheet {path}: {e}")
         return []
 
 def draw_text(surface: pygame.Surface, text: str, pos: Tuple[int, int],
               color: Tuple[int, int, int], font_size: int = 20,
               centered: bool = False) -> None:
-    """Draw text on a surface with optional centering"""
-    font = pygame.font.Font(None, font_size)
-    text_surface = font.render(text, True, color)
-    
-    if centered:
-        pos = (pos[0] - text_surface.get_width()//2,
-               pos[1] - text_surface.get_height()//2)
-    
-    surface.blit(text_surface, pos)
+    """Draw text on a surface with optional centering (fonts and text surfaces are cached)"""
+    get_text_renderer().draw(surface, text, pos, color, font_size, centered)
 
 def create_color_gradient(color1: Tuple[int, int, int],
                          color2: Tuple[int, int, int],
@@ -255,6 +317,13 @@ def calculate_line_of_sight(start: Tuple[int, int], end: Tuple[int, int],
     
     return True
 
+def code_fingerprint(*sources: Any) -> str:
+    """A hash of the source code of modules, classes or functions, to key outputs of that code"""
+    digest = hashlib.sha256()
+    for source in sources:
+        digest.update(inspect.getsource(source).encode())
+    return digest.hexdigest()[:16]
+
 def generate_unique_id() -> str:
     """Generate a unique identifier"""
     return f"{random.getrandbits(32):08x}"
@@ -0,0 +1,168 @@
+import math
+from typing import Optional, Union
+import numpy as np
+from .config import Config
+from .utils import NoiseGenerator
+
+def block_mean(layer: np.ndarray, shape) -> np.ndarray:
+    """Average a tile layer down to a coarse grid, one block of at least one tile per cell"""
+    def bounds(tiles: int, cells: int):
+        starts = np.arange(cells) * tiles // cells
+        starts = np.minimum(starts, tiles - 1)
+        return starts, np.maximum((np.arange(1, cells + 1) * tiles) // cells, starts + 1)
+
+    # Block sums from a summed-area table
+    table = np.zeros((layer.shape[0] + 1, layer.shape[1] + 1))
+    table[1:, 1:] = layer.astype(np.float64).cumsum(axis=0).cumsum(axis=1)
+    y0, y1 = bounds(layer.shape[0], shape[0])
+    x0, x1 = bounds(layer.shape[1], shape[1])
+    sums = (table[y1][:, x1] - table[y0][:, x1] - table[y1][:, x0] + table[y0][:, x0])
+    return sums / np.outer(y1 - y0, x1 - x0)
+
+class WeatherSystem:
+    """
+    Weather as coarse fields over the map: temperature offset, precipitation,
+    cloud cover and wind, plus the humidity that drives clouds and rain.
+
+    Fields live on a fixed GRID_WIDTH x GRID_HEIGHT grid stretched over the
+    world, so a weather step costs the same whatever the map size. Every
+    UPDATE_MINUTES game minutes the fields are advected by the wind and
+    diffused with whole-array operations. Tile values are bilinear samples of
+    the grid.
+    """
+    FIELDS = ("temperature_offset", "precipitation", "cloud_cover", "wind_x", "wind_y", "humidity")
+
+    def __init__(self, config: Config, world_width: int, world_height: int,
+                 surface_moisture: Optional[np.ndarray] = None):
+        self.config = config
+        self.world_width = world_width
+        self.world_height = world_height
+        settings = config.WEATHER
+        shape = (settings.GRID_HEIGHT, settings.GRID_WIDTH)
+
+        # Grid coordinates, and the evaporation source (mean moisture per cell)
+        self.grid_y, self.grid_x = np.mgrid[0:shape[0], 0:shape[1]].astype(np.float64)
+        if surface_moisture is None:
+            surface_moisture = np.full(shape, 0.5)
+        self.surface_moisture = surface_moisture
+
+        # Seeded per world so weather is reproducible
+        self.noise = NoiseGenerator(config.WORLD.SEED + 2)
+        self.humidity = surface_moisture * 0.8
+        self.cloud_cover = self.noise.noise2d_array(self.grid_x / 6, self.grid_y / 6 + 50).astype(np.float64)
+        self.precipitation = np.zeros(shape)
+        self.temperature_offset = np.zeros(shape)
+        self.wind_x = np.zeros(shape)
+        self.wind_y = np.zeros(shape)
+
+        self.last_step_minute: Optional[int] = None
+        self.step_count = 0
+
+    def update(self, current_time) -> None:
+        """Run the weather steps due since the last update"""
+        minutes = current_time.to_minutes(self.config.TIME)
+        if self.last_step_minute is None:
+            self.last_step_minute = minutes
+            return
+
+        interval = self.config.WEATHER.UPDATE_MINUTES
+        due = (minutes - self.last_step_minute) // interval
+        if due <= 0:
+            return
+        self.last_step_minute += due * interval
+
+        # Long time jumps are caught up with a bounded number of steps
+        minute_of_day = self._minute_of_day(current_time)
+        for _ in range(min(due, self.config.WEATHER.MAX_CATCHUP_STEPS)):
+            self.step(minute_of_day)
+
+    def step(self, minute_of_day: int) -> None:
+        """Advance every field by one weather step"""
+        settings = self.config.WEATHER
+        self.step_count += 1
+
+        # Prevailing wind plus slowly drifting noise
+        drift = self.step_count * 0.02
+        self.wind_x = settings.PREVAILING_WIND[0] + settings.WIND_VARIABILITY * (
+            2 * self.noise.noise2d_array(self.grid_x / 8 + drift, self.grid_y / 8) - 1)
+        self.wind_y = settings.PREVAILING_WIND[1] + settings.WIND_VARIABILITY * (
+            2 * self.noise.noise2d_array(self.grid_x / 8 + 100, self.grid_y / 8 + drift) - 1)
+
+        # Carry the transported fields along the wind, then mix neighbors
+        for name in ("humidity", "cloud_cover", "temperature_offset"):
+            field = self._advect(getattr(self, name))
+            setattr(self, name, self._diffuse(field, settings.DIFFUSION))
+
+        # Evaporation, condensation into clouds and rain out of them
+        self.humidity += settings.EVAPORATION * self.surface_moisture * (1 - self.humidity)
+        condensed = np.maximum(self.humidity - settings.CONDENSATION_THRESHOLD, 0) * 0.5
+        self.humidity -= condensed
+        self.cloud_cover = np.clip(self.cloud_cover * 0.98 + condensed, 0, 1)
+        self.precipitation = np.maximum(self.cloud_cover - settings.RAIN_THRESHOLD, 0) * 0.5
+        self.cloud_cover -= self.precipitation * 0.2
+
+        # Temperature relaxes toward a daily cycle damped by clouds and cooled by rain
+        day_phase = 2 * math.pi * (minute_of_day / self._minutes_per_day() - 0.375)
+        target = settings.DAILY_TEMPERATURE_SWING * math.sin(day_phase) * (1 - 0.6 * self.cloud_cover)
+        target -= 4 * self.precipitation
+        self.temperature_offset += 0.2 * (target - self.temperature_offset)
+
+    def sample(self, field: str, x: Union[float, np.ndarray],
+               y: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+        """Bilinearly sample a field at tile coordinates (scalars or arrays)"""
+        gx, gy = self._tile_to_grid(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+        values = self._bilinear(getattr(self, field), gx, gy)
+        return float(values) if values.ndim == 0 else values
+
+    def sample_region(self, field: str, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """Sample a field for every tile of the rectangle [x0, x1) x [y0, y1)"""
+        xs = np.arange(x0, x1, dtype=np.float64)
+        ys = np.arange(y0, y1, dtype=np.float64)[:, np.newaxis]
+        return self.sample(field, xs, ys)
+
+    def growing_conditions(self, x: float, y: float) -> float:
+        """How favorable the weather at a tile is for crops, from 0 to 1"""
+        rain = min(1.0, self.sample("precipitation", x, y) / 0.1)
+        temperature = abs(self.sample("temperature_offset", x, y))
+        return min(1.0, max(0.0, 0.6 + 0.4 * rain - 0.03 * temperature))
+
+    def _advect(self, field: np.ndarray) -> np.ndarray:
+        """Semi-Lagrangian advection: each cell takes the value upwind of it"""
+        return self._bilinear(field, self.grid_x - self.wind_x, self.grid_y - self.wind_y)
+
+    @staticmethod
+    def _diffuse(field: np.ndarray, rate: float) -> np.ndarray:
+        """Mix each cell toward the mean of its four neighbors"""
+        padded = np.pad(field, 1, mode='edge')
+        neighbors = (padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:]) / 4
+        return field + rate * (neighbors - field)
+
+    @staticmethod
+    def _bilinear(field: np.ndarray, gx: np.ndarray, gy: np.ndarray) -> np.ndarray:
+        """Interpolate a grid at fractional grid coordinates, clamped to its edges"""
+        height, width = field.shape
+        gx = np.clip(gx, 0, width - 1)
+        gy = np.clip(gy, 0, height - 1)
+        x0 = np.minimum(gx.astype(np.intp), width - 2) if width > 1 else np.zeros_like(gx, dtype=np.intp)
+        y0 = np.minimum(gy.astype(np.intp), height - 2) if height > 1 else np.zeros_like(gy, dtype=np.intp)
+        x1 = np.minimum(x0 + 1, width - 1)
+        y1 = np.minimum(y0 + 1, height - 1)
+        fx = gx - x0
+        fy = gy - y0
+
+        top = field[y0, x0] * (1 - fx) + field[y0, x1] * fx
+        bottom = field[y1, x0] * (1 - fx) + field[y1, x1] * fx
+        return top * (1 - fy) + bottom * fy
+
+    def _tile_to_grid(self, x: np.ndarray, y: np.ndarray):
+        """Convert tile coordinates to grid coordinates (cell centers at integers)"""
+        settings = self.config.WEATHER
+        gx = (x + 0.5) * settings.GRID_WIDTH / self.world_width - 0.5
+        gy = (y + 0.5) * settings.GRID_HEIGHT / self.world_height - 0.5
+        return gx, gy
+
+    def _minutes_per_day(self) -> int:
+        return self.config.TIME.HOURS_PER_DAY * self.config.TIME.MINUTES_PER_HOUR
+
+    def _minute_of_day(self, current_time) -> int:
+        return current_time.hour * self.config.TIME.MINUTES_PER_HOUR + current_time.minute
@@ -1,228 +1,235 @@
+import itertools
+from collections import deque
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import pygame
 from .config import Config
+from .terrain_generator import TerrainGenerator, RESOURCE_TYPES, NO_RESOURCE
+from .chunk_manager import ChunkManager
+from .biome_classifier import get_biome_classifier
+from .resource_index import ResourceIndex
+from .weather_system import WeatherSystem, block_mean
+from .terrain_renderer import TerrainRenderer, BIOME_COLORS, DEFAULT_BIOME_COLOR
 
 class World:
     """
     Handles world generation and management including terrain, biomes, and resources.
     Uses layered noise for realistic terrain generation and biome distribution.
     """
+    # Chunks per side of each block handed to a generation worker
+    PARALLEL_BLOCK_CHUNKS = 8
+    
+    # Tile changes remembered for views that have not caught up yet
+    TILE_LOG_LENGTH = 4096
+    
     def __init__(self, config: Config):
         self.config = config
         
         # Initialize world arrays
         self.width = config.WORLD.WORLD_WIDTH
         self.height = config.WORLD.WORLD_HEIGHT
+        self.seed = config.WORLD.SEED
+        self.generator = TerrainGenerator(config)
+        self.biome_classifier = get_biome_classifier(config)
         
-        # Terrain layers
-        self.elevation = np.zeros((self.height, self.width))
-        self.temperature = np.zeros((self.height, self.width))
-        self.moisture = np.zeros((self.height, self.width))
-        self.biomes = np.zeros((self.height, self.width), dtype=np.int32)
-        self.resources = np.zeros((self.height, self.width), dtype=np.int32)
+        # Terrain layers (whole-map arrays; left as None when chunks are lazy)
+        self.elevation = None
+        self.temperature = None
+        self.moisture = None
+        self.biomes = None
+        self.resources = None
         
-        # Resource tracking
-        self.resource_locations = {}  # Dict to track resource positions
+        # Drainage layers (whole-map worlds only)
+        self.flow = None  # Upstream rainfall draining through each tile
+        self.rivers = None  # 1 where flow is high enough to form a river
         
-        # Generate initial world
-        self._generate_world()
+        # Sparse index of resource tiles (whole-map worlds only)
+        self.resource_index = None
+        
+        # Layers copied by set_tile, so edits stay out of the generation caches
+        self._owned_layers = set()
+        
+        # Lazily generated chunks replace the whole-map arrays for large worlds
+        self.chunks = None
+        if config.WORLD.LAZY_CHUNKS:
+            self.chunks = ChunkManager(
+                self.generator,
+                config.WORLD.CHUNK_SIZE,
+                self.width,
+                self.height,
+                config.WORLD.CHUNK_MEMORY_BUDGET
+            )
+        else:
+            # Generate initial world
+            self._generate_world()
+        
+        # Weather runs on a coarse grid; evaporation follows the moisture layer when there is one
+        surface_moisture = None
+        if self.moisture is not None:
+            weather_grid = (config.WEATHER.GRID_HEIGHT, config.WEATHER.GRID_WIDTH)
+            surface_moisture = block_mean(self.moisture, weather_grid)
+        self.weather = WeatherSystem(config, self.width, self.height, surface_moisture)
+        
+        # Pre-rendered terrain chunks
+        self.renderer = TerrainRenderer(self)
+        
+        # Changed tile rectangles (x0, y0, x1, y1), numbered by tile_version so each
+        # view (the game's renderer, web viewers) can follow them at its own pace
+        self.tile_version = 0
+        self._tile_log: deque = deque(maxlen=self.TILE_LOG_LENGTH)
+        
+        if self.chunks is not None:
+            self.chunks.on_generate = self._chunk_generated
 
     def _generate_world(self) -> None:
-        """Generate the complete world using a series of noise layers and algorithms"""
-        self._generate_elevation()
-        self._generate_temperature()
-        self._generate_moisture()
-        self._determine_biomes()
-        self._place_resources()
-
-    def _generate_elevation(self) -> None:
-        """Generate elevation using multiple octaves of Perlin noise"""
-        scale = 50.0
-        octaves = 6
-        persistence = 0.5
-        lacunarity = 2.0
-        
-        # Generate raw elevation values
-        raw_elevation = np.zeros((self.height, self.width))
-        for y in range(self.height):
-            for x in range(self.width):
-                elevation = 0
-                amplitude = 1.0
-                frequency = 1.0
-                max_value = 0
-                
-                for i in range(octaves):
-                    sample_x = x / scale * frequency
-                    sample_y = y / scale * frequency
-                    
-                    # Use numpy's random instead of noise library for simplicity
-                    elevation += self._get_noise(sample_x, sample_y) * amplitude
-                    
-                    max_value += amplitude
-                    amplitude *= persistence
-                    frequency *= lacunarity
-                
-                raw_elevation[y, x] = elevation / max_value
-        
-        # Normalize elevation values to [0, 1] range
-        min_elevation = np.min(raw_elevation)
-        max_elevation = np.max(raw_elevation)
-        self.elevation = (raw_elevation - min_elevation) / (max_elevation - min_elevation)
-
-    def _generate_temperature(self) -> None:
-        """Generate temperature based on elevation and latitude"""
-        for y in range(self.height):
-            base_temp = 1.0 - abs(y - self.height/2) / (self.height/2)  # Latitude effect
-            for x in range(self.width):
-                # Temperature decreases with elevation
-                elevation_factor = 1.0 - self.elevation[y, x]
-                self.temperature[y, x] = base_temp * elevation_factor
-
-    def _generate_moisture(self) -> None:
-        """Generate moisture levels using noise and elevation data"""
-        scale = 30.0
-        for y in range(self.height):
-            for x in range(self.width):
-                base_moisture = self._get_noise(x/scale, y/scale)
-                # Moisture tends to collect in lower elevations
-                elevation_factor = 1.0 - self.elevation[y, x]
-                self.moisture[y, x] = (base_moisture + elevation_factor) / 2
-
-    def _determine_biomes(self) -> None:
-        """Determine biomes based on temperature, moisture, and elevation"""
-        for y in range(self.height):
-            for x in range(self.width):
-                temp = self.temperature[y, x]
-                moisture = self.moisture[y, x]
-                elevation = self.elevation[y, x]
-                
-                # Convert to actual temperature range
-                actual_temp = self.config.WORLD.MIN_TEMPERATURE + \
-                            temp * (self.config.WORLD.MAX_TEMPERATURE - 
-                                  self.config.WORLD.MIN_TEMPERATURE)
-                
-                # Find matching biome
-                for biome_name, thresholds in self.config.BIOME_THRESHOLDS.items():
-                    temp_range = thresholds["temp"]
-                    moisture_range = thresholds["moisture"]
-                    elevation_range = thresholds["elevation"]
-                    
-                    if (temp_range[0] <= actual_temp <= temp_range[1] and
-                        moisture_range[0] <= moisture <= moisture_range[1] and
-                        elevation_range[0] <= elevation * 3000 <= elevation_range[1]):
-                        self.biomes[y, x] = list(self.config.BIOME_THRESHOLDS.keys()).index(biome_name)
-                        break
-
-    def _place_resources(self) -> None:
-        """Place resources throughout the world based on biome types"""
-        self.resource_locations.clear()
-        
-        # Define resource types as enum values
-        RESOURCE_TYPES = [
-            "TREE", "BUSH", "HERB", "STONE", "METAL", "GEMSTONE",
-            "VEGETABLE", "MINERAL", "FISH", "SHELL", "CORAL"
-        ]
-        
-        # Define resource placement rules based on biomes
-        resource_rules = {
-            "FOREST": ["TREE", "BUSH", "HERB"],
-            "MOUNTAIN": ["STONE", "METAL", "GEMSTONE"],
-            "PLAINS": ["BUSH", "HERB", "VEGETABLE"],
-            "DESERT": ["STONE", "MINERAL"],
-            "WATER": ["FISH", "SHELL", "CORAL"]
-        }
-        
-        # Place resources according to rules
-        for y in range(self.height):
-            for x in range(self.width):
-                biome_name = list(self.config.BIOME_THRESHOLDS.keys())[self.biomes[y, x]]
-                biome_type = next((k for k in resource_rules.keys() 
-                                 if any(b in biome_name for b in k.split('_'))), None)
-                
-                if biome_type and np.random.random() < 0.1:  # 10% chance of resource
-                    resource = np.random.choice(resource_rules[biome_type])
-                    self.resources[y, x] = RESOURCE_TYPES.index(resource)
-                    self.resource_locations[(x, y)] = resource
-
-    def _get_noise(self, x: float, y: float) -> float:
-        """Simple noise function for demonstration"""
-        # This is a very basic noise implementation
-        # In a real implementation, you'd want to use a proper noise library
-        return (np.sin(x) + np.cos(y)) / 2 + 0.5
+        """Generate the complete world, reusing cached stage outputs"""
+        block_size = self.config.WORLD.CHUNK_SIZE * self.PARALLEL_BLOCK_CHUNKS
+        layers = self.generator.generate_world(self.config.WORLD.GENERATION_WORKERS, block_size)
+        
+        self.elevation = layers["elevation"]
+        self.temperature = layers["temperature"]
+        self.moisture = layers["moisture"]
+        self.biomes = layers["biomes"]
+        self.resources = layers["resources"]
+        self.flow = layers["flow"]
+        self.rivers = layers["rivers"]
+        self._owned_layers = set()
+        
+        self.resource_index = ResourceIndex.from_layer(self.resources, NO_RESOURCE)
+
+    def regenerate(self) -> None:
+        """
+        Rebuild the world after config changes (biome thresholds, resource odds, ...).
+        Only generation stages affected by the changes are re-run.
+        """
+        self.biome_classifier = get_biome_classifier(self.config)
+        if self.chunks is not None:
+            self.chunks.clear()
+        else:
+            self._generate_world()
+        self.renderer.clear()
+        self._log_tiles(0, 0, self.width, self.height)
+
+    def memory_report(self) -> Dict[str, int]:
+        """Bytes held by each world layer (resident chunks only when lazy), plus the total"""
+        report = dict.fromkeys(self.generator.layer_dtypes, 0)
+        if self.chunks is not None:
+            for chunk in self.chunks.chunks.values():
+                for name, data in chunk.layers.items():
+                    report[name] += data.nbytes
+        else:
+            for name in report:
+                report[name] = getattr(self, name).nbytes
+        
+        report["total"] = sum(report.values())
+        return report
+
+    def get_region(self, layer: str, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """Get a layer for the tile rectangle [x0, x1) x [y0, y1), generating chunks as needed"""
+        if self.chunks is not None:
+            return self.chunks.get_region(layer, x0, y0, x1, y1)
+        return getattr(self, layer)[y0:y1, x0:x1]
+
+    def _get_tile(self, layer: str, x: int, y: int):
+        """Get a single layer value, generating its chunk if needed"""
+        if self.chunks is not None:
+            return self.chunks.get_tile(layer, x, y)
+        return getattr(self, layer)[y, x]
+
+    def set_tile(self, layer: str, x: int, y: int, value) -> None:
+        """Change one layer value (e.g. a harvested resource) and redraw its chunk"""
+        if self.chunks is not None:
+            size = self.chunks.chunk_size
+            self.chunks.mark_dirty(x // size, y // size)
+            self.chunks.get_chunk(x // size, y // size).layers[layer][y % size, x % size] = value
+        else:
+            # Generated layers are shared with the stage caches (or are read-only
+            # memory maps), so the first edit of a layer copies it
+            if layer not in self._owned_layers:
+                setattr(self, layer, np.array(getattr(self, layer)))
+                self._owned_layers.add(layer)
+            getattr(self, layer)[y, x] = value
+            if layer == "resources":
+                self.resource_index.set(x, y, -1 if value == NO_RESOURCE else int(value))
+        
+        self.renderer.invalidate(x, y, x + 1, y + 1)
+        self._log_tiles(x, y, x + 1, y + 1)
 
     def get_biome_at(self, x: int, y: int) -> str:
         """Get the biome type at the given coordinates"""
         if 0 <= x < self.width and 0 <= y < self.height:
-            biome_index = self.biomes[y, x]
-            return list(self.config.BIOME_THRESHOLDS.keys())[biome_index]
+            biome_index = self._get_tile("biomes", x, y)
+            return self.biome_classifier.name_of(biome_index)
         return "NONE"
 
     def get_resource_at(self, x: int, y: int) -> str:
         """Get the resource type at the given coordinates"""
-        return self.resource_locations.get((x, y), "NONE")
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return "NONE"
+        resource_index = self._get_tile("resources", x, y)
+        if resource_index == NO_RESOURCE:
+            return "NONE"
+        return RESOURCE_TYPES[resource_index]
+
+    def get_resources_in(self, x0: int, y0: int, x1: int, y1: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get (xs, ys, type indices) of the resources in the tile rectangle [x0, x1) x [y0, y1)"""
+        if self.resource_index is not None:
+            return self.resource_index.query_rect(x0, y0, x1, y1)
+        
+        # Lazy worlds scan the region's chunks instead
+        resources = self.get_region("resources", x0, y0, x1, y1)
+        ys, xs = np.nonzero(resources != NO_RESOURCE)
+        return xs + x0, ys + y0, resources[ys, xs]
+
+    def get_resource_positions(self, resource_type: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the (xs, ys) of every tile holding a resource type"""
+        type_index = RESOURCE_TYPES.index(resource_type)
+        if self.resource_index is not None:
+            return self.resource_index.positions_of(type_index)
+        
+        # Lazy worlds have to generate the whole map to answer this
+        xs, ys, types = self.get_resources_in(0, 0, self.width, self.height)
+        matches = types == type_index
+        return xs[matches], ys[matches]
 
     def update(self, current_time) -> None:
         """Update world state based on time (weather, resource regeneration, etc.)"""
-        # TODO: Implement weather system
+        self.weather.update(current_time)
+        
         # TODO: Implement resource regeneration
-        pass
 
     def render(self, screen: pygame.Surface, visible_area: pygame.Rect,
               zoom_level: float, camera_x: float, camera_y: float) -> None:
-        """Render the visible portion of the world"""
-        tile_size = int(self.config.WORLD.TILE_SIZE * zoom_level)
-        
-        # Calculate visible range
-        start_x = max(0, int(camera_x))
-        start_y = max(0, int(camera_y))
-        end_x = min(self.width, int(camera_x + visible_area.width + 1))
-        end_y = min(self.height, int(camera_y + visible_area.height + 1))
-        
-        # Render terrain and biomes
-        for y in range(start_y, end_y):
-            for x in range(start_x, end_x):
-                screen_x = int((x - camera_x) * tile_size)
-                screen_y = int((y - camera_y) * tile_size)
-                
-                # Skip if outside screen
-                if (screen_x + tile_size < 0 or screen_x >= self.config.DISPLAY.SCREEN_WIDTH or
-                    screen_y + tile_size < 0 or screen_y >= self.config.DISPLAY.SCREEN_HEIGHT):
-                    continue
-                
-                # Get biome color
-                biome_index = self.biomes[y, x]
-                color = self._get_biome_color(biome_index)
-                
-                # Draw terrain tile
-                pygame.draw.rect(screen, color, 
-                               (screen_x, screen_y, tile_size, tile_size))
-                
-                # Draw resource if present
-                if (x, y) in self.resource_locations:
-                    resource_color = (139, 69, 19)  # Brown
-                    pygame.draw.circle(screen, resource_color,
-                                    (screen_x + tile_size//2,
-                                     screen_y + tile_size//2),
-                                    tile_size//4)
+        """Render the visible portion of the world (the tiles covering the screen)"""
+        self.renderer.render(screen, zoom_level, camera_x, camera_y)
+
+    def tile_changes_since(self, version: int) -> Optional[List[Tuple[int, int, int, int]]]:
+        """Get the tile rectangles changed after tile_version was version, or None if too many to remember"""
+        if version == self.tile_version:
+            return []
+        if not self._tile_log or self._tile_log[0][0] > version + 1:
+            return None
+        start = version + 1 - self._tile_log[0][0]
+        return [tiles for _, tiles in itertools.islice(self._tile_log, start, None)]
+
+    def _chunk_generated(self, chunk) -> None:
+        """Show a newly generated chunk in views that only draw the generated part of a lazy world"""
+        biomes = chunk.layers["biomes"]
+        x0 = chunk.chunk_x * self.chunks.chunk_size
+        y0 = chunk.chunk_y * self.chunks.chunk_size
+        self.renderer.add_generated(x0, y0, biomes)
+        self._log_tiles(x0, y0, x0 + biomes.shape[1], y0 + biomes.shape[0])
+
+    def _log_tiles(self, x0: int, y0: int, x1: int, y1: int) -> None:
+        """Record a changed tile rectangle under the next tile_version"""
+        self.tile_version += 1
+        self._tile_log.append((self.tile_version, (x0, y0, x1, y1)))
+
+    def render_minimap(self, screen: pygame.Surface, rect: pygame.Rect, view: pygame.Rect) -> None:
+        """Render the whole map into rect, outlining the view (a rectangle of tiles)"""
+        self.renderer.render_minimap(screen, rect, view)
 
     def _get_biome_color(self, biome_index: int) -> Tuple[int, int, int]:
         """Get the color for a specific biome type"""
-        # Define colors for each biome type
-        colors = {
-            "BOREAL_FOREST": (34, 139, 34),      # Forest Green
-            "DECIDUOUS_FOREST": (0, 100, 0),      # Dark Green
-            "RAINFOREST": (0, 128, 0),           # Green
-            "TUNDRA": (238, 233, 233),          # Snow White
-            "STEPPE": (218, 165, 32),           # Golden Rod
-            "SAVANNA": (255, 228, 181),         # Moccasin
-            "POLAR_DESERT": (255, 250, 250),    # Snow
-            "SEMI_ARID_DESERT": (210, 180, 140), # Tan
-            "SAND_DESERT": (244, 164, 96),      # Sandy Brown
-            "HEATH": (85, 107, 47),             # Dark Olive Green
-            "CHAPARRAL": (189, 183, 107),       # Dark Khaki
-            "SWAMP": (47, 79, 79),              # Dark Slate Gray
-        }
-        
-        biome_name = list(self.config.BIOME_THRESHOLDS.keys())[biome_index]
-        return colors.get(biome_name, (128, 128, 128))  # Default gray if not found
+        biome_name = self.biome_classifier.name_of(biome_index)
+        return BIOME_COLORS.get(biome_name, DEFAULT_BIOME_COLOR)
@@ -0,0 +1,78 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+import numpy as np
+
+# Cached worlds live under the simulation's runtime data directory
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / 'data' / 'world_cache'
+
+class WorldCache:
+    """
+    On-disk cache of generated world layers, one .npy file per layer named by
+    the content key of the generation stage that produced it. Cached layers
+    are opened as read-only memory maps, so a warm start costs one mmap per
+    layer and pages are shared between processes using the same world.
+
+    Files are kept up to a byte budget: each write deletes the least recently
+    used layers (by modification time, which a load refreshes) beyond it.
+    """
+    def __init__(self, directory: Optional[Path] = None, budget: Optional[int] = None):
+        self.directory = Path(directory if directory is not None else DEFAULT_CACHE_DIR)
+        self.budget = budget
+
+    def contains(self, key: str) -> bool:
+        """Whether a layer is cached for a key"""
+        return (self.directory / f"{key}.npy").exists()
+
+    def load_layer(self, key: str) -> Optional[np.ndarray]:
+        """Memory-map the cached layer for a key, or return None on a miss"""
+        path = self.directory / f"{key}.npy"
+        try:
+            data = np.load(path, mmap_mode='r')
+            os.utime(path)
+            return data
+        except (OSError, ValueError):
+            return None
+
+    def save_layer(self, key: str, data: np.ndarray) -> None:
+        """Write a layer for a key; the file appears atomically once complete"""
+        path = self.directory / f"{key}.npy"
+        if path.exists():
+            return
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, staging = tempfile.mkstemp(prefix=f".{key}-", suffix=".npy", dir=self.directory)
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, data)
+            os.replace(staging, path)
+        except OSError as e:
+            print(f"Error writing world cache {path}: {e}")
+            return
+        self.prune(keep=path)
+
+    def prune(self, keep: Optional[Path] = None) -> None:
+        """Delete the least recently used layers until the cache fits its budget"""
+        if self.budget is None:
+            return
+        files = []
+        for path in self.directory.glob("*.npy"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # Pruned by another process
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.budget:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+            except OSError as e:
+                print(f"Error pruning world cache {path}: {e}")
+                continue
+            total -= size
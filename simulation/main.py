@@ -1,12 +1,16 @@
+import argparse
 import pygame
 import sys
 import os
 from engine.game import Game
 from engine.config import Config
-from web_display import WebDisplay
+from engine.sprite_store import get_sprite_store
+from engine.headless import run_headless
+from web_display import FrameStream, FrameEncoder, DeltaEncoder, DeltaStream, SnapshotStream
+from server import PORT, serve_in_background
 
 class SimulationEngine:
-    def __init__(self):
+    def __init__(self, port: int = PORT):
         try:
             # Initialize pygame without audio to avoid ALSA warnings
             pygame.display.init()
@@ -26,6 +30,23 @@ class SimulationEngine:
             self.clock = pygame.time.Clock()
             self.game = Game(self.screen, self.config)
             self.running = True
+            
+            # The page renders from per-tick deltas at /updates; whole frames
+            # are streamed from memory at /stream, and state snapshots served
+            # at /snapshot. Each is only produced while someone is watching it
+            self.delta_encoder = DeltaEncoder(self.game)
+            self.deltas = DeltaStream(self.delta_encoder.assets)
+            self.frames = FrameStream()
+            self.frame_encoder = FrameEncoder(self.frames, self.config.DISPLAY.STREAM_JPEG_QUALITY,
+                                              self.config.DISPLAY.STREAM_QUEUE_SIZE)
+            self.frame_stale = True
+            self.snapshots = SnapshotStream()
+            try:
+                self.server = serve_in_background(self.frames, port, self.deltas, self.snapshots)
+                print(f"Streaming at http://localhost:{port}")
+            except OSError as e:
+                self.server = None
+                print(f"Web server error: {e}")
             print("Game initialization complete")
             
         except Exception as e:
@@ -46,19 +67,26 @@ class SimulationEngine:
 
     def update(self):
         self.game.update()
+        
+        # Snapshots follow the simulation, whether or not frames are rendered
+        self.snapshots.follow(self.game)
 
     def render(self):
         try:
-            # Clear screen and render game
-            self.screen.fill((0, 0, 0))
-            self.game.render()
+            # Render game; only the returned areas changed since the last frame
+            dirty_rects = self.game.render()
+            if dirty_rects:
+                self.frame_stale = True
+            
+            # What changed since the last tick, for the page's renderer
+            if self.deltas.viewers:
+                self.deltas.publish(*self.delta_encoder.encode())
+            if not (self.frames.viewers and self.frame_stale):
+                return
             
-            # Convert the display to web format and update the webpage
-            print("Converting surface to image data...")
-            image_data = WebDisplay.surface_to_image_data(self.screen)
-            print("Updating webpage...")
-            WebDisplay.update_webpage(image_data)
-            print("Render complete")
+            # The frame is encoded for the stream's viewers off the game loop
+            self.frame_encoder.submit(self.screen)
+            self.frame_stale = False
             
         except Exception as e:
             print(f"Render error: {str(e)}")
@@ -74,9 +102,56 @@ class SimulationEngine:
         except Exception as e:
             print(f"Critical error: {e}")
         finally:
+            self.frame_encoder.close()
+            self.frames.close()
+            self.deltas.close()
+            self.snapshots.close()
+            if self.server is not None:
+                self.server.shutdown()
+            
+            # Keep generated entity sprites for the next run
+            get_sprite_store().save()
             pygame.quit()
             sys.exit()
 
-if __name__ == "__main__":
-    engine = SimulationEngine()
+def main():
+    parser = argparse.ArgumentParser(description="Life survival simulation")
+    parser.add_argument("--port", type=int, default=PORT,
+                        help="Port the page and its streams are served on")
+    parser.add_argument("--headless", action="store_true",
+                        help="Simulate as fast as possible without a display and report ticks per second")
+    parser.add_argument("--ticks", type=int, default=1440,
+                        help="Game minutes to simulate headless (default: one day)")
+    parser.add_argument("--entities", type=int, default=0,
+                        help="Entities to spawn before a headless run")
+    parser.add_argument("--snapshot-every", type=int, default=0,
+                        help="Ticks between state snapshots in a headless run (0 for none)")
+    parser.add_argument("--snapshot-path", default=os.path.join(os.path.dirname(__file__), "logs", "snapshots.jsonl"),
+                        help="JSON lines file the headless snapshots are appended to")
+    parser.add_argument("--serve", action="store_true",
+                        help="Serve /snapshot and /world during a headless run, without rendering")
+    args = parser.parse_args()
+
+    if args.headless:
+        snapshots = SnapshotStream() if args.serve else None
+        server = None
+        if snapshots is not None:
+            server = serve_in_background(FrameStream(), args.port, snapshots=snapshots)
+            print(f"Serving snapshots at http://localhost:{args.port}/snapshot")
+        try:
+            report = run_headless(Config(), args.ticks, args.entities, args.snapshot_every,
+                                  args.snapshot_path, snapshots.follow if snapshots else None)
+        finally:
+            if server is not None:
+                snapshots.close()
+                server.shutdown()
+        print(f"{report['ticks']} ticks in {report['seconds']:.2f}s: "
+              f"{report['ticks_per_second']:.1f} ticks/s "
+              f"({report['entities']} entities, setup {report['setup_seconds']:.2f}s)")
+        return
+
+    engine = SimulationEngine(args.port)
     engine.run()
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,285 @@
 import http.server
 import socketserver
+import threading
 import webbrowser
 import os
-import socket
-import time
+import gzip
+import json
+import zlib
+from typing import Optional
+from urllib.parse import urlsplit, parse_qs
+from web_display import FrameStream, DeltaStream, SnapshotStream
 
 PORT = 8000
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
 
-def is_port_in_use(port):
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        return s.connect_ex(('localhost', port)) == 0
+# Seconds a stream waits for a frame before checking whether it was closed
+STREAM_POLL_SECONDS = 1.0
 
-def wait_for_port_release(port, timeout=30):
-    start_time = time.time()
-    while is_port_in_use(port):
-        if time.time() - start_time > timeout:
-            raise TimeoutError(f"Port {port} did not become available within {timeout} seconds")
-        time.sleep(1)
+# Seconds a request waits for the simulation to take a snapshot
+SNAPSHOT_TIMEOUT_SECONDS = 5.0
+
+# Seconds an idle keep-alive connection (or a viewer that stopped reading) is kept
+KEEP_ALIVE_SECONDS = 30
+
+# JSON bodies are gzipped for clients that accept it, from this size up
+GZIP_MIN_BYTES = 512
+GZIP_LEVEL = 6
 
 class Handler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serves the page and its files, plus the simulation's live views:
+    /updates, DeltaStream messages as server-sent events for the page's
+    renderer; /assets/<name>, the terrain and sprite images they refer to;
+    /stream, whole frames as MJPEG; and /snapshot and /world, the
+    Game.snapshot() arrays and world layers for clients that draw
+    (or analyze) the game themselves.
+
+    Connections are kept alive between requests (HTTP/1.1), static files
+    carry an ETag and Last-Modified so browsers revalidate them with a 304,
+    and JSON is gzipped for clients that accept it. Streams hold their
+    connection until the viewer goes away.
+    """
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEP_ALIVE_SECONDS
+    frames: Optional[FrameStream] = None
+    deltas: Optional[DeltaStream] = None
+    snapshots: Optional[SnapshotStream] = None
+    _etag: Optional[str] = None
+
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory=os.path.dirname(os.path.abspath(__file__)), **kwargs)
-
-try:
-    # Wait for the port to become available
-    wait_for_port_release(PORT)
-    
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
-        print(f"Serving at port {PORT}")
-        print(f"Open http://localhost:{PORT} in your browser")
-        httpd.serve_forever()
-except Exception as e:
-    print(f"Error: {e}")
-    if isinstance(e, TimeoutError):
-        print("Try manually killing the process using the port or choose a different port")
+        super().__init__(*args, directory=DIRECTORY, **kwargs)
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/stream':
+            self._stream_frames()
+        elif path == '/updates':
+            self._stream_deltas()
+        elif path.startswith('/assets/'):
+            self._send_asset(path[len('/assets/'):])
+        elif path == '/snapshot':
+            self._send_snapshot()
+        elif path == '/world':
+            self._send_world()
+        else:
+            super().do_GET()
+
+    def send_head(self):
+        """Open a static file for sending, or answer 304 if the client's copy has its ETag"""
+        self._etag = self._file_etag()
+        if self._etag is not None and self._etag in [tag.strip() for tag in
+                                                     self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.end_headers()
+            return None
+        return super().send_head()
+
+    def end_headers(self):
+        if self._etag is not None:
+            # Static files are revalidated on every use, which keep-alive makes cheap
+            self.send_header('ETag', self._etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self._etag = None
+        super().end_headers()
+
+    def _file_etag(self) -> Optional[str]:
+        """An entity tag for the static file a request names, from its modification time and size"""
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not self.path.split('?')[0].endswith('/'):
+                return None  # Redirected to the slash-terminated path
+            path = next((os.path.join(path, index) for index in ('index.html', 'index.htm')
+                         if os.path.isfile(os.path.join(path, index))), path)
+        if not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    def _accepts_gzip(self) -> bool:
+        return 'gzip' in self.headers.get('Accept-Encoding', '')
+
+    def _start_stream(self, content_type: str, compress: bool = False):
+        """Send the headers of a response that runs until the viewer goes away; returns a gzip compressor if used"""
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if compress and self._accepts_gzip() else None
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        if compress:
+            self.send_header('Vary', 'Accept-Encoding')
+        if compressor is not None:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        self.close_connection = True
+        return compressor
+
+    def _stream_frames(self):
+        """Send each new frame as one part of a multipart/x-mixed-replace response"""
+        if self.frames is None:
+            self.send_error(404, "No simulation is streaming to this server")
+            return
+
+        self._start_stream('multipart/x-mixed-replace; boundary=frame')
+
+        sequence = 0
+        self.frames.join()
+        try:
+            while not self.frames.closed:
+                sequence, frame = self.frames.wait(sequence, STREAM_POLL_SECONDS)
+                if frame is None:
+                    continue
+                self.wfile.write(b'--frame\r\nContent-Type: image/jpeg\r\n'
+                                 b'Content-Length: %d\r\n\r\n' % len(frame))
+                self.wfile.write(frame)
+                self.wfile.write(b'\r\n')
+                self.wfile.flush()
+        except OSError:
+            pass  # The viewer went away or stopped reading
+        finally:
+            self.frames.leave()
+
+    def _stream_deltas(self):
+        """Send the latest keyframe, then each tick's delta, as server-sent events"""
+        if self.deltas is None:
+            self.send_error(404, "No simulation is streaming to this server")
+            return
+
+        # One gzip stream for the whole connection, flushed after every tick
+        compressor = self._start_stream('text/event-stream', compress=True)
+
+        sequence = 0
+        self.deltas.join()
+        try:
+            while not self.deltas.closed:
+                sequence, messages = self.deltas.wait(sequence, STREAM_POLL_SECONDS)
+                if messages:
+                    data = b''.join(b'data: %s\n\n' % message for message in messages)
+                else:
+                    data = b': idle\n\n'  # Finds viewers that went away
+                if compressor is not None:
+                    data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                self.wfile.write(data)
+                self.wfile.flush()
+        except OSError:
+            pass  # The viewer went away or stopped reading
+        finally:
+            self.deltas.leave()
+
+    def _send_asset(self, name: str):
+        """Send an image named in the delta stream; names change with content, so it is cached for good"""
+        data = self.deltas.assets.get(name) if self.deltas is not None else None
+        if data is None:
+            self.send_error(404, "No such asset")
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_snapshot(self):
+        """
+        Send the current snapshot, packed as binary arrays (see engine.snapshot),
+        or as JSON with ?format=json. With ?after=<minute>, wait for a snapshot
+        from a later game minute, answering 204 if none comes in time.
+        """
+        if self.snapshots is None:
+            self.send_error(404, "No simulation is publishing snapshots to this server")
+            return
+        query = parse_qs(urlsplit(self.path).query)
+        try:
+            after = int(query['after'][0]) if 'after' in query else None
+        except ValueError:
+            self.send_error(400, "after must be a game minute")
+            return
+
+        snapshot = self.snapshots.latest(after, STREAM_POLL_SECONDS if after is not None else SNAPSHOT_TIMEOUT_SECONDS)
+        if snapshot is None:
+            if after is not None:
+                self.send_response(204)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+            else:
+                self.send_error(503, "The simulation did not take a snapshot in time")
+            return
+
+        if query.get('format') == ['json']:
+            self._send_parts('application/json', [json.dumps(snapshot.to_dict()).encode()], compress=True)
+        else:
+            self._send_parts('application/octet-stream', snapshot.pack())
+
+    def _send_world(self):
+        """Send the world layers for the current snapshot, revalidated by ETag"""
+        if self.snapshots is None:
+            self.send_error(404, "No simulation is publishing snapshots to this server")
+            return
+        snapshot = self.snapshots.latest(timeout=SNAPSHOT_TIMEOUT_SECONDS)
+        world = self.snapshots.world_at(snapshot.world_version, SNAPSHOT_TIMEOUT_SECONDS) if snapshot else None
+        if world is None:
+            self.send_error(503, "The simulation did not copy the world in time")
+            return
+
+        if self.headers.get('If-None-Match') == world.etag:
+            self.send_response(304)
+            self.send_header('ETag', world.etag)
+            self.end_headers()
+            return
+        self._send_parts('application/octet-stream', world.pack(), {'ETag': world.etag})
+
+    def _send_parts(self, content_type: str, parts, headers=None, compress: bool = False):
+        """Send a response body given as buffers, written out without joining them unless gzipped"""
+        headers = dict(headers or {})
+        if compress:
+            headers['Vary'] = 'Accept-Encoding'
+            if self._accepts_gzip() and sum(memoryview(part).nbytes for part in parts) >= GZIP_MIN_BYTES:
+                parts = [gzip.compress(b''.join(parts), GZIP_LEVEL)]
+                headers['Content-Encoding'] = 'gzip'
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(sum(memoryview(part).nbytes for part in parts)))
+        self.send_header('Cache-Control', 'no-cache')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        for part in parts:
+            self.wfile.write(part)
+
+class StreamingServer(socketserver.ThreadingTCPServer):
+    """
+    A thread per connection, so open streams and slow viewers don't block
+    other requests. The address is bound with SO_REUSEADDR, so a restarted
+    simulation gets its port back at once rather than after the last run's
+    connections finish closing.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 64  # Connections waiting to be accepted, for many viewers arriving at once
+
+def create_server(port: int = PORT, frames: Optional[FrameStream] = None,
+                  deltas: Optional[DeltaStream] = None,
+                  snapshots: Optional[SnapshotStream] = None) -> StreamingServer:
+    """Create a server for the page, streaming frames, deltas and snapshots if given"""
+    handler = type('StreamHandler', (Handler,), {'frames': frames, 'deltas': deltas, 'snapshots': snapshots})
+    return StreamingServer(("", port), handler)
+
+def serve_in_background(frames: FrameStream, port: int = PORT, deltas: Optional[DeltaStream] = None,
+                        snapshots: Optional[SnapshotStream] = None) -> StreamingServer:
+    """Start serving the page and the simulation's streams from a daemon thread"""
+    httpd = create_server(port, frames, deltas, snapshots)
+    threading.Thread(target=httpd.serve_forever, name="web-server", daemon=True).start()
+    return httpd
+
+if __name__ == "__main__":
+    try:
+        with create_server(PORT) as httpd:
+            print(f"Serving at port {PORT}")
+            print(f"Open http://localhost:{PORT} in your browser")
+            httpd.serve_forever()
+    except Exception as e:
+        print(f"Error: {e}")
+        if isinstance(e, OSError):
+            print("Another server is probably using the port; stop it or choose a different port")
@@ -2,6 +2,7 @@ import unittest
 import pygame
 import numpy as np
 import random
+import os
 from engine.config import Config
 from engine.game import Game
 from engine.world import World
@@ -10,8 +11,43 @@ from engine.entity_manager import EntityManager
 from engine.resource_manager import ResourceManager, ResourceType
 from engine.job_system import JobSystem
 from engine.ai_system import AISystem
-from engine.time_system import TimeSystem
+from engine.time_system import TimeSystem, GameTime
+from engine.utils import NoiseGenerator, draw_text
+from engine.text_renderer import TextRenderer, get_text_renderer
+from engine.sprite_generator import SpriteGenerator
+from engine.sprite_atlas import SpriteAtlas
+from engine.sprite_store import SpriteStore
+from engine.headless import HeadlessRunner
+from engine.snapshot import unpack_arrays
+from engine.biome_classifier import get_biome_classifier
+from engine import world_cache
+from engine.world_cache import WorldCache
+from engine.terrain_generator import TerrainGenerator, RESOURCE_TYPES, NO_RESOURCE
+from engine.terrain_pyramid import TerrainPyramid
+from engine import hydrology
+from web_display import WebDisplay, FrameStream, FrameEncoder, DeltaEncoder, DeltaStream, SnapshotStream
+from server import serve_in_background, create_server
+import http.client
+import threading
+import io
+from PIL import Image
+import json
+import gzip
+import zlib
+import tempfile
+import heapq
 from dataclasses import dataclass
+from collections import Counter
+from pathlib import Path
+
+def setUpModule():
+    # Worlds generated by the tests are cached in a scratch directory, not data/world_cache
+    global _cache_directory
+    _cache_directory = tempfile.TemporaryDirectory()
+    world_cache.DEFAULT_CACHE_DIR = Path(_cache_directory.name)
+
+def tearDownModule():
+    _cache_directory.cleanup()
 
 class TestSimulation(unittest.TestCase):
     @classmethod
@@ -45,6 +81,447 @@ class TestSimulation(unittest.TestCase):
         # Check that biomes are assigned
         self.assertTrue(np.any(self.world.biomes != 0))
 
+    def test_terrain_matches_per_cell_formulas(self):
+        """Test that the vectorized terrain layers match the per-cell formulas"""
+        height = self.world.height
+        for x, y in [(0, 0), (17, 42), (self.world.width - 1, height - 1)]:
+            base_temp = 1.0 - abs(y - height/2) / (height/2)
+            expected_temp = base_temp * (1.0 - self.world.elevation[y, x])
+            self.assertAlmostEqual(self.world.temperature[y, x], expected_temp)
+
+            base_moisture = self.world.generator.moisture_noise.noise2d(x/30.0, y/30.0)
+            expected_moisture = (base_moisture + 1.0 - self.world.elevation[y, x]) / 2
+            self.assertAlmostEqual(self.world.moisture[y, x], expected_moisture)
+
+    def test_batched_noise(self):
+        """Test that array noise matches scalar noise and is seed-deterministic"""
+        noise = NoiseGenerator(seed=7)
+        xs = np.linspace(-3.7, 12.3, 9)
+        ys = np.linspace(0.1, 5.9, 4)[:, np.newaxis]
+        field = noise.fractal2d(xs, ys, octaves=4)
+
+        self.assertEqual(field.shape, (4, 9))
+        self.assertTrue(np.all((field >= 0) & (field <= 1)))
+        np.testing.assert_array_equal(field, NoiseGenerator(seed=7).fractal2d(xs, ys, octaves=4))
+        self.assertAlmostEqual(noise.noise2d(xs[3], ys[2, 0]),
+                               noise.noise2d_array(xs, ys)[2, 3])
+
+    def test_lazy_chunks_match_full_world(self):
+        """Test that lazily generated chunks match the eagerly generated map"""
+        config = Config()
+        config.WORLD.WORLD_WIDTH = 50
+        config.WORLD.WORLD_HEIGHT = 40
+        eager = World(config)
+
+        config.WORLD.LAZY_CHUNKS = True
+        config.WORLD.CHUNK_MEMORY_BUDGET = 0  # Evict everything but the latest chunk
+        lazy = World(config)
+        self.assertIsNone(lazy.elevation)
+        self.assertEqual(len(lazy.chunks.chunks), 0)
+
+        for layer in ("elevation", "moisture", "biomes", "resources"):
+            np.testing.assert_array_equal(lazy.get_region(layer, 0, 0, 50, 40),
+                                          getattr(eager, layer))
+        self.assertEqual(len(lazy.chunks.chunks), 1)
+        self.assertGreater(lazy.chunks.evicted_count, 0)
+
+        # Evicted chunks regenerate identically
+        for x, y in [(3, 4), (49, 39), (20, 17)]:
+            self.assertEqual(lazy.get_biome_at(x, y), eager.get_biome_at(x, y))
+            self.assertEqual(lazy.get_resource_at(x, y), eager.get_resource_at(x, y))
+
+    def test_parallel_generation_is_seam_free(self):
+        """Test that pool-generated blocks tile into the single-process map"""
+        config = Config()
+        config.WORLD.WORLD_WIDTH = 70
+        config.WORLD.WORLD_HEIGHT = 45
+        serial = World(config)
+
+        layers = serial.generator.generate_parallel(workers=2, block_size=32)
+        for layer, data in layers.items():
+            np.testing.assert_array_equal(data, getattr(serial, layer))
+
+    def test_biome_lookup_table_matches_threshold_rules(self):
+        """Test that the compiled biome table reproduces first-match threshold checks"""
+        classifier = get_biome_classifier(self.config)
+        world_config = self.config.WORLD
+        temp_span = world_config.MAX_TEMPERATURE - world_config.MIN_TEMPERATURE
+
+        # Random samples plus values landing exactly on threshold boundaries
+        rng = np.random.default_rng(3)
+        temperature = list(rng.random(2000))
+        moisture = list(rng.random(2000))
+        elevation = list(rng.random(2000))
+        for rule in self.config.BIOME_THRESHOLDS.values():
+            for bound in rule["temp"]:
+                temperature.append((bound - world_config.MIN_TEMPERATURE) / temp_span)
+                moisture.append(rule["moisture"][0])
+                elevation.append(rule["elevation"][1] / 3000)
+        temperature, moisture, elevation = map(np.array, (temperature, moisture, elevation))
+
+        biomes = classifier.classify(temperature, moisture, elevation)
+        for temp, moist, elev, biome in zip(temperature, moisture, elevation, biomes):
+            actual_temp = world_config.MIN_TEMPERATURE + temp * temp_span
+            expected = 0
+            for index, rule in enumerate(self.config.BIOME_THRESHOLDS.values()):
+                if (rule["temp"][0] <= actual_temp <= rule["temp"][1] and
+                    rule["moisture"][0] <= moist <= rule["moisture"][1] and
+                    rule["elevation"][0] <= elev * 3000 <= rule["elevation"][1]):
+                    expected = index
+                    break
+            self.assertEqual(biome, expected)
+
+        self.assertIs(get_biome_classifier(Config()), classifier)
+
+    def test_world_cache_round_trip(self):
+        """Test that cached stage outputs reload as memory maps matching fresh generation"""
+        config = Config()
+        config.WORLD.WORLD_WIDTH = 30
+        config.WORLD.WORLD_HEIGHT = 20
+        config.WORLD.STAGE_CACHE_BUDGET = 0  # Serve everything from disk
+        generator = TerrainGenerator(config)
+        layers = generator.generate_region(0, 0, 30, 20)
+
+        with tempfile.TemporaryDirectory() as directory:
+            generator.pipeline.disk_cache = WorldCache(directory)
+            generator.generate_world()
+            self.assertEqual(sum(generator.pipeline.run_counts.values()), 5 + 7)
+
+            cached = generator.generate_world()
+            self.assertEqual(sum(generator.pipeline.run_counts.values()), 5 + 7)
+            for name, data in layers.items():
+                self.assertIsInstance(cached[name], np.memmap)
+                np.testing.assert_array_equal(cached[name], data)
+
+        # A warm World maps its layers from the default cache (a scratch directory here)
+        World(self.config)
+        self.assertIsInstance(World(self.config).elevation, np.memmap)
+
+    def test_world_cache_budget(self):
+        """Test that the world cache deletes its least recently used layers beyond its budget"""
+        layer = np.zeros(1000, dtype=np.uint8)
+        with tempfile.TemporaryDirectory() as directory:
+            cache = WorldCache(directory, budget=3 * layer.nbytes + 500)
+            for age, key in enumerate(["a", "b", "c"]):
+                cache.save_layer(key, layer)
+                os.utime(os.path.join(directory, f"{key}.npy"), (age, age))
+            self.assertIsNotNone(cache.load_layer("a"))  # Now the most recently used
+
+            cache.save_layer("d", layer)
+            self.assertFalse(cache.contains("b"))
+            self.assertTrue(all(cache.contains(key) for key in ["a", "c", "d"]))
+
+    def test_pipeline_reruns_only_downstream_stages(self):
+        """Test that changing a stage parameter re-runs only that stage and its dependents"""
+        config = Config()
+        config.WORLD.WORLD_WIDTH = 40
+        config.WORLD.WORLD_HEIGHT = 30
+        config.WORLD.CACHE_WORLD = False
+        world = World(config)
+        pipeline = world.generator.pipeline
+        self.assertEqual(set(pipeline.run_counts.values()), {1})
+        self.assertFalse(any(data.flags.writeable for data in pipeline.cache.values()))
+
+        # Resource odds only affect the resources stage
+        config.WORLD.RESOURCE_CHANCE = 0.5
+        world.regenerate()
+        self.assertEqual(pipeline.run_counts["resources"], 2)
+        self.assertEqual(pipeline.run_counts["biomes"], 1)
+        self.assertGreater(len(world.resource_index), 0)
+
+        # Biome thresholds re-run biomes and resources but no terrain stages
+        config.BIOME_THRESHOLDS = dict(config.BIOME_THRESHOLDS)
+        config.BIOME_THRESHOLDS["PLAINS"] = {
+            "temp": (0, 35), "moisture": (0.2, 0.6), "elevation": (0, 800)
+        }
+        world.regenerate()
+        self.assertEqual(pipeline.run_counts["biomes"], 2)
+        self.assertEqual(pipeline.run_counts["resources"], 3)
+        self.assertEqual(pipeline.run_counts["elevation"], 1)
+        self.assertEqual(pipeline.run_counts["moisture"], 1)
+
+        # Going back to earlier settings is served from the memory cache
+        config.WORLD.RESOURCE_CHANCE = 0.1
+        config.BIOME_THRESHOLDS = Config().BIOME_THRESHOLDS
+        world.regenerate()
+        self.assertEqual(pipeline.run_counts["resources"], 3)
+        np.testing.assert_array_equal(world.resources,
+                                      world.generator.generate_region(0, 0, 40, 30)["resources"])
+
+        # Edited generation code re-runs every stage
+        runs = pipeline.run_counts.copy()
+        pipeline.code = "edited"
+        world.regenerate()
+        self.assertEqual(pipeline.run_counts - runs, Counter(dict.fromkeys(pipeline.stages, 1)))
+
+    def test_set_tile_leaves_stage_caches_alone(self):
+        """Test that edited tiles are dropped on regeneration instead of leaking into cached stage outputs"""
+        config = Config()
+        config.WORLD.WORLD_WIDTH = 40
+        config.WORLD.WORLD_HEIGHT = 30
+        config.WORLD.CACHE_WORLD = False
+        world = World(config)
+        ys, xs = np.nonzero(world.resources != NO_RESOURCE)
+        world.set_tile("resources", xs[0], ys[0], NO_RESOURCE)
+        world.set_tile("biomes", 0, 0, world.biomes[0, 0] + 1)
+
+        # Erosion only affects drainage, so biomes and resources come from the memory cache
+        config.WORLD.EROSION_RATE = 0.02
+        world.regenerate()
+        self.assertEqual(world.generator.pipeline.run_counts["resources"], 1)
+        cold = world.generator.generate_region(0, 0, 40, 30)
+        np.testing.assert_array_equal(world.resources, cold["resources"])
+        np.testing.assert_array_equal(world.biomes, cold["biomes"])
+
+    def test_compact_layer_dtypes(self):
+        """Test configurable layer precision and the per-layer memory report"""
+        self.assertEqual(self.world.elevation.dtype, np.float32)
+        self.assertEqual(self.world.biomes.dtype, np.uint8)
+        self.assertEqual(self.world.resources.dtype, np.uint8)
+
+        config = Config()
+        config.WORLD.WORLD_WIDTH = 40
+        config.WORLD.WORLD_HEIGHT = 30
+        config.WORLD.LAYER_PRECISION = "float16"
+        world = World(config)
+        self.assertEqual(world.moisture.dtype, np.float16)
+
+        # Biomes are classified from the stored half-precision values
+        classifier = world.biome_classifier
+        expected = classifier._temp_cells(world.temperature.astype(np.float64)) * classifier.temp_bins[3] + \
+                   classifier._moisture_cells(world.moisture.astype(np.float64)) * classifier.moisture_bins[3] + \
+                   classifier._elevation_cells(world.elevation.astype(np.float64))
+        np.testing.assert_array_equal(world.biomes, classifier.flat_table[expected])
+
+        report = world.memory_report()
+        self.assertEqual(report["elevation"], 40 * 30 * 2)
+        self.assertEqual(report["biomes"], 40 * 30)
+        self.assertEqual(report["flow"], 40 * 30 * 4)
+        self.assertEqual(report["total"], 40 * 30 * (3 * 2 + 3 + 4))
+
+    def test_resource_index_queries(self):
+        """Test the sparse resource index against the resources layer"""
+        resources = self.world.resources
+        index = self.world.resource_index
+        self.assertEqual(len(index), np.count_nonzero(resources != NO_RESOURCE))
+
+        for y in range(0, self.world.height, 7):
+            for x in range(0, self.world.width, 3):
+                self.assertEqual(index.get(x, y, NO_RESOURCE), resources[y, x])
+
+        xs, ys, types = self.world.get_resources_in(13, 21, 58, 47)
+        expected_ys, expected_xs = np.nonzero(resources[21:47, 13:58] != NO_RESOURCE)
+        np.testing.assert_array_equal(xs, expected_xs + 13)
+        np.testing.assert_array_equal(ys, expected_ys + 21)
+        np.testing.assert_array_equal(types, resources[ys, xs])
+
+        for type_index, name in enumerate(RESOURCE_TYPES):
+            xs, ys = self.world.get_resource_positions(name)
+            np.testing.assert_array_equal(np.sort(ys * self.world.width + xs),
+                                          np.flatnonzero(resources == type_index))
+
+        # Viewport rendering draws from the same query
+        self.world.render(self.screen, pygame.Rect(0, 0, 25, 19), 1.0, 0, 0)
+
+    def test_hydrology(self):
+        """Test depression filling, drainage and the flow and river layers"""
+        # Depression filling matches cell-by-cell Priority-Flood
+        rng = np.random.default_rng(5)
+        surface = rng.random((23, 31))
+        filled, receivers = hydrology.route_flow(surface)
+
+        expected = surface.copy()
+        queue = [(surface[y, x], y, x) for y in range(23) for x in range(31)
+                 if y in (0, 22) or x in (0, 30)]
+        heapq.heapify(queue)
+        visited = np.zeros(surface.shape, dtype=bool)
+        for _, y, x in queue:
+            visited[y, x] = True
+        while queue:
+            level, y, x = heapq.heappop(queue)
+            for dy, dx in hydrology.D8_OFFSETS:
+                ny, nx = y + dy, x + dx
+                if 0 <= ny < 23 and 0 <= nx < 31 and not visited[ny, nx]:
+                    visited[ny, nx] = True
+                    expected[ny, nx] = max(expected[ny, nx], level)
+                    heapq.heappush(queue, (expected[ny, nx], ny, nx))
+        np.testing.assert_array_equal(filled, expected)
+
+        # Every tile drains off the map, and all rainfall arrives there
+        rainfall = rng.random(surface.shape)
+        flow = hydrology.flow_accumulation(receivers, rainfall)
+        outlets = receivers == hydrology.NO_RECEIVER
+        self.assertTrue(np.all(np.isin(np.flatnonzero(outlets) // 31, (0, 22)) |
+                               np.isin(np.flatnonzero(outlets) % 31, (0, 30))))
+        self.assertAlmostEqual(flow[outlets].sum(), rainfall.sum())
+
+        # World layers
+        self.assertEqual(self.world.flow.shape, self.world.elevation.shape)
+        self.assertTrue(np.all(self.world.flow >= self.world.moisture - 1e-6))
+        np.testing.assert_array_equal(self.world.rivers,
+                                      self.world.flow >= self.config.WORLD.RIVER_MIN_FLOW)
+        self.assertTrue(np.any(self.world.rivers))
+
+    def test_weather(self):
+        """Test the coarse weather grid, its step cadence and tile sampling"""
+        weather = self.world.weather
+        grid = (self.config.WEATHER.GRID_HEIGHT, self.config.WEATHER.GRID_WIDTH)
+        self.assertEqual(weather.cloud_cover.shape, grid)
+
+        # The grid doesn't grow with the world
+        config = Config()
+        config.WORLD.WORLD_WIDTH, config.WORLD.WORLD_HEIGHT = 160, 96
+        config.WORLD.CACHE_WORLD = False
+        self.assertEqual(World(config).weather.cloud_cover.shape, grid)
+
+        # Steps run every UPDATE_MINUTES, and catch-up after a jump is bounded
+        weather.update(GameTime(minute=0, hour=6))
+        weather.update(GameTime(minute=self.config.WEATHER.UPDATE_MINUTES - 1, hour=6))
+        self.assertEqual(weather.step_count, 0)
+        weather.update(GameTime(minute=self.config.WEATHER.UPDATE_MINUTES, hour=6))
+        self.assertEqual(weather.step_count, 1)
+        weather.update(GameTime(minute=0, hour=6, day=2))
+        self.assertEqual(weather.step_count, 1 + self.config.WEATHER.MAX_CATCHUP_STEPS)
+        self.assertTrue(np.all((weather.cloud_cover >= 0) & (weather.cloud_cover <= 1)))
+
+        # Sampling is exact at cell centers and between the two neighbors elsewhere
+        cell_width = self.world.width / grid[1]
+        cell_height = self.world.height / grid[0]
+        center_x, center_y = 3.5 * cell_width - 0.5, 2.5 * cell_height - 0.5
+        self.assertAlmostEqual(weather.sample("cloud_cover", center_x, center_y),
+                               weather.cloud_cover[2, 3])
+        between = weather.sample("cloud_cover", center_x + cell_width / 2, center_y)
+        self.assertAlmostEqual(between, weather.cloud_cover[2, 3:5].mean())
+        region = weather.sample_region("temperature_offset", 10, 20, 30, 25)
+        self.assertEqual(region.shape, (5, 20))
+        self.assertAlmostEqual(region[2, 4], weather.sample("temperature_offset", 14, 22))
+
+        # Farm output quality reads the weather at the farmer's tile
+        entity = self.entity_manager.create_entity(5, 5)
+        entity.skills["Farming"] = 50
+        product = self.job_system.jobs["farmer"].products[0]
+        weather.precipitation[:] = 0.2
+        wet = self.job_system._calculate_product_quality(entity, product, self.world)
+        weather.precipitation[:] = 0.0
+        dry = self.job_system._calculate_product_quality(entity, product, self.world)
+        self.assertGreater(wet, dry)
+
+    def test_terrain_chunk_surfaces(self):
+        """Test that terrain renders from cached chunk surfaces invalidated per chunk"""
+        world = self.world
+        renderer = world.renderer
+        screen = pygame.Surface((800, 600))
+        area = pygame.Rect(0, 0, 800 // self.config.WORLD.TILE_SIZE, 600 // self.config.WORLD.TILE_SIZE)
+        world.render(screen, area, 1.0, 0, 0)
+        baked = renderer.baked_count
+        self.assertGreater(baked, 0)
+
+        # Tile corners show their biome color (resource markers sit in the middle)
+        tile = self.config.WORLD.TILE_SIZE
+        for x, y in ((0, 0), (3, 5), (20, 14)):
+            expected = renderer.palette[world.biomes[y, x]]
+            self.assertEqual(tuple(screen.get_at((x * tile + 1, y * tile + 1)))[:3], tuple(expected))
+
+        # A second frame reuses every surface
+        world.render(screen, area, 1.0, 0, 0)
+        self.assertEqual(renderer.baked_count, baked)
+
+        # Changing a tile re-bakes only its chunk
+        x, y = 3, 5
+        new_resource = 0 if world.resources[y, x] == NO_RESOURCE else NO_RESOURCE
+        world.set_tile("resources", x, y, new_resource)
+        self.assertEqual(world.get_resource_at(x, y),
+                         "NONE" if new_resource == NO_RESOURCE else RESOURCE_TYPES[0])
+        world.render(screen, area, 1.0, 0, 0)
+        self.assertEqual(renderer.baked_count, baked + 1)
+        center = tuple(screen.get_at((x * tile + tile // 2, y * tile + tile // 2)))[:3]
+        self.assertEqual(center == (139, 69, 19), new_resource != NO_RESOURCE)
+
+        # The cache stays within its byte budget
+        renderer.memory_budget = 3 * renderer.cached_bytes // len(renderer.surfaces)
+        world.render(screen, area, 2.0, 0, 0)
+        self.assertLessEqual(renderer.cached_bytes, max(renderer.memory_budget,
+                             max(renderer._surface_bytes(s) for s in renderer.surfaces.values())))
+
+    def test_palette_renderer_matches_chunks(self):
+        """Test that the palette renderer draws the same terrain as the chunk renderer"""
+        display = self.config.DISPLAY
+        self.addCleanup(setattr, display, "TERRAIN_RENDER_MODE", display.TERRAIN_RENDER_MODE)
+        resource_color = np.array([139, 69, 19])
+        for zoom, camera_x, camera_y in ((0.25, 0, 0), (0.5, 3.3, 7.6), (1.0, 80.5, 70.25)):
+            tile_size = int(self.config.WORLD.TILE_SIZE * zoom)
+            area = pygame.Rect(0, 0, 800 / tile_size, 600 / tile_size)
+            frames = []
+            for mode in ("chunks", "palette"):
+                display.TERRAIN_RENDER_MODE = mode
+                screen = pygame.Surface((800, 600))
+                self.world.render(screen, area, zoom, camera_x, camera_y)
+                frames.append(pygame.surfarray.array3d(screen))
+
+            # Identical apart from how resource discs are rasterized
+            markers = [np.all(frame == resource_color, axis=2) for frame in frames]
+            differ = np.any(frames[0] != frames[1], axis=2)
+            self.assertFalse(np.any(differ & ~markers[0] & ~markers[1]))
+            self.assertTrue(np.any(markers[1]))
+
+    def test_terrain_pyramid(self):
+        """Test the zoom pyramid, its incremental updates and far-out rendering"""
+        world = self.world
+        pyramid = world.renderer.pyramid
+        self.assertEqual(pyramid.levels[0].shape, (world.width, world.height, 3))
+        self.assertEqual(pyramid.levels[1].shape, (50, 50, 3))
+        self.assertEqual(pyramid.levels[-1].shape[:2], (1, 1))
+        block = pyramid.levels[0][2:4, 6:8].reshape(4, 3).astype(float)
+        np.testing.assert_allclose(pyramid.levels[1][1, 3], block.mean(axis=0), atol=0.5)
+
+        # Changing tiles updates every level as a full rebuild would
+        version = pyramid.version
+        other_biome = (int(world.biomes[37, 61]) + 1) % len(world.biome_classifier.names)
+        world.set_tile("biomes", 61, 37, other_biome)
+        self.assertGreater(pyramid.version, version)
+        rebuilt = TerrainPyramid(world, world.renderer.palette)
+        for level, expected in zip(pyramid.levels, rebuilt.levels):
+            np.testing.assert_array_equal(level, expected)
+        np.testing.assert_array_equal(pygame.surfarray.array3d(pyramid.surfaces[2]), rebuilt.levels[2])
+
+        # Far-out zoom draws the downsampled map, scaled to the screen
+        screen = pygame.Surface((80, 60))
+        world.render(screen, pygame.Rect(0, 0, 320, 240), 1 / 128, 0, 0)
+        self.assertEqual(tuple(screen.get_at((10, 10)))[:3], tuple(pyramid.levels[2][10, 10]))
+        self.assertEqual(tuple(screen.get_at((30, 30)))[:3], (0, 0, 0))  # Past the map edge
+
+        # Zoom steps through every configured level, and the minimap draws in a game frame
+        self.game._adjust_zoom(-len(self.config.DISPLAY.ZOOM_LEVELS))
+        self.assertEqual(self.game.zoom_level, min(self.config.DISPLAY.ZOOM_LEVELS))
+        self.game.render()
+        self.game._adjust_zoom(len(self.config.DISPLAY.ZOOM_LEVELS))
+        self.assertEqual(self.game.zoom_level, max(self.config.DISPLAY.ZOOM_LEVELS))
+        self.game.render()
+
+    def test_lazy_world_pyramid(self):
+        """Test that drawing a lazy world (minimap included) doesn't generate it, and new chunks fill the pyramid"""
+        config = Config()
+        config.WORLD.WORLD_WIDTH = config.WORLD.WORLD_HEIGHT = 256
+        config.WORLD.LAZY_CHUNKS = True
+        game = Game(pygame.Surface((320, 240)), config)
+        game.show_minimap = True
+        game.render()
+        world = game.world
+        generated = world.chunks.generated_count
+        self.assertLess(generated, 256 * 256 // config.WORLD.CHUNK_SIZE ** 2 // 4)
+
+        # Chunks generated later are drawn into the pyramid, and redrawn by the game
+        pyramid = world.renderer.pyramid
+        self.assertFalse(pyramid.levels[0][200:216, 200:216].any())
+        version = world.tile_version
+        biomes = world.get_region("biomes", 200, 200, 216, 216)
+        np.testing.assert_array_equal(pyramid.levels[0][200:216, 200:216], pyramid.palette[biomes.T])
+        changes = world.tile_changes_since(version)
+        self.assertEqual(len(changes), 4)
+        self.assertIn((192, 192, 208, 208), changes)
+        game.render()
+        self.assertEqual(world.chunks.generated_count, generated + 4)
+
     def test_entity_creation(self):
         """Test entity creation and DNA inheritance"""
         # Create parent entities with specific positions
@@ -71,6 +548,35 @@ class TestSimulation(unittest.TestCase):
         self.assertTrue(0 <= child.dna.height <= 1.5)
         self.assertTrue(0 <= child.dna.physical_aptitude <= 1)
 
+    def test_scaled_sprite_cache(self):
+        """Test that entity frames are scaled once per zoom and animate on game time"""
+        entities = [self.entity_manager.create_entity(2 + i, 3, DNA(height=0.8 + 0.1 * i)) for i in range(3)]
+        cache = self.entity_manager.sprite_cache
+        screen = pygame.Surface((800, 600))
+        area = pygame.Rect(0, 0, 25, 19)
+
+        # Rendering doesn't advance animation, and repeat frames reuse the scaled surfaces
+        for _ in range(3):
+            self.entity_manager.render(screen, area, 2.0, 0, 0)
+        self.assertEqual(cache.scaled_count, len(entities))
+        self.assertTrue(all(entity.current_frame == 0 for entity in entities))
+        scaled = cache.get(entities[0].animation_frames, 0, 2.0)
+        self.assertIs(scaled, cache.get(entities[0].animation_frames, 0, 2.0))
+        self.assertEqual(scaled.get_width(), int(entities[0].animation_frames[0].get_width() * 2.0))
+
+        # Frames follow simulation time
+        minutes_per_frame = self.config.DISPLAY.ANIMATION_MINUTES_PER_FRAME
+        frame_count = len(entities[0].animation_frames)
+        start = self.time_system.current_time.to_minutes(self.config.TIME) // minutes_per_frame
+        self.time_system.current_time.minute += minutes_per_frame
+        entities[0]._advance_animation(self.time_system.current_time)
+        self.assertEqual(entities[0].current_frame, (start + 1) % frame_count)
+
+        # The cache is bounded
+        cache.max_entries = 2
+        self.entity_manager.render(screen, area, 1.0, 0, 0)
+        self.assertLessEqual(len(cache.entries), 2)
+
     def test_resource_management(self):
         """Test resource spawning and collection"""
         # Add a test resource directly
@@ -167,6 +673,425 @@ class TestSimulation(unittest.TestCase):
         self.assertIn(entity.id, self.ai_system.entity_goals)
         self.assertIsInstance(self.ai_system.entity_goals[entity.id], list)
 
+    def test_text_rendering_cache(self):
+        """Test that fonts and rendered text are cached across frames"""
+        text = TextRenderer(max_surfaces=2)
+        first = text.render("Year 1", 24, (255, 255, 255))
+        self.assertIs(text.render("Year 1", 24, (255, 255, 255)), first)
+        self.assertIs(text.font(24), text.font(24))
+        self.assertIsNot(text.render("Year 1", 20, (255, 255, 255)), first)
+        text.render("Year 2", 24, (255, 255, 255))
+        self.assertEqual(len(text.surfaces), 2)
+        self.assertEqual(text.rendered_count, 3)
+
+        area = text.draw(self.screen, "Year 2", (100, 50), (255, 255, 255), 24, centered=True)
+        self.assertEqual(area.center, (100, 50))
+
+        # Repeated UI frames render unchanged strings only once
+        shared = get_text_renderer()
+        self.game.render()
+        rendered = shared.rendered_count
+        self.game.render()
+        self.game.render()
+        self.assertEqual(shared.rendered_count, rendered)
+        draw_text(self.screen, "FPS", (0, 0), (255, 255, 0))
+        self.assertIn(("FPS", 20, (255, 255, 0)), shared.surfaces)
+
+    def test_sprite_generation(self):
+        """Test that sprites are generated reproducibly into a shared atlas"""
+        atlas = SpriteAtlas(page_size=72)
+        for size in (7, 16, 17):
+            generator = SpriteGenerator(size, atlas)
+            frames = generator.generate_frames(seed=-12345)
+            self.assertEqual(len(frames), 4)
+            self.assertTrue(all(frame.get_size() == (size, size) for frame in frames))
+            again = generator.generate_frames(seed=-12345)
+            for frame, other in zip(frames, again):
+                np.testing.assert_array_equal(pygame.surfarray.array3d(frame),
+                                              pygame.surfarray.array3d(other))
+
+            # Below the hair the body is mirrored, and frames only move pixels right
+            alpha = pygame.surfarray.array_alpha(frames[0])[:, size // 4:]
+            np.testing.assert_array_equal(alpha, alpha[::-1])
+            base_pixels = pygame.surfarray.array_alpha(frames[0])
+            for frame in frames[1:]:
+                self.assertLessEqual(np.count_nonzero(pygame.surfarray.array_alpha(frame)),
+                                     np.count_nonzero(base_pixels))
+
+        # Frames are sub-rects of shared pages, spilling onto new pages when full
+        self.assertIs(frames[0].get_parent(), frames[1].get_parent())
+        self.assertGreater(len(atlas.pages), 1)
+
+    def test_sprite_store(self):
+        """Test that entities share sprites by appearance and sheets persist across runs"""
+        first = self.entity_manager.create_entity(1, 1)
+        second = self.entity_manager.create_entity(2, 2)
+        self.assertIs(first.animation_frames, second.animation_frames)
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = SpriteStore(directory)
+            frames = store.get(42, 16)
+            self.assertIs(store.get(42, 16), frames)
+            store.get(-7, 13)
+            self.assertEqual(store.generated_count, 2)
+            store.save()
+
+            # A warm start loads every appearance from the sheets instead of generating it
+            warm = SpriteStore(directory)
+            loaded = warm.get(42, 16)
+            warm.get(-7, 13)
+            self.assertEqual(warm.generated_count, 0)
+            self.assertEqual(len(loaded), len(frames))
+            for frame, saved in zip(frames, loaded):
+                np.testing.assert_array_equal(pygame.surfarray.array_alpha(frame),
+                                              pygame.surfarray.array_alpha(saved))
+                np.testing.assert_array_equal(pygame.surfarray.array3d(frame)[pygame.surfarray.array_alpha(frame) > 0],
+                                              pygame.surfarray.array3d(saved)[pygame.surfarray.array_alpha(saved) > 0])
+
+            # Sheets drawn by another version of the generator are regenerated
+            edited = SpriteStore(directory)
+            edited.code = "edited"
+            edited.get(42, 16)
+            self.assertEqual(edited.generated_count, 1)
+
+    def test_dirty_rect_rendering(self):
+        """Test that frames redraw only what changed, matching a full redraw"""
+        screen = pygame.Surface((320, 240))
+        game = Game(screen, self.config)
+        game.show_minimap = False
+
+        def assert_matches_full_redraw():
+            incremental = pygame.surfarray.array3d(screen)
+            game._last_view = None
+            game.render()
+            np.testing.assert_array_equal(pygame.surfarray.array3d(screen), incremental)
+
+        # The first frame is a full redraw; an unchanged frame redraws nothing
+        self.assertEqual(game.render(), [screen.get_rect()])
+        self.assertEqual(game.render(), [])
+
+        # A new entity, then a moved one, redraw only around the sprite
+        entity = game.entity_manager.create_entity(3, 3)
+        dirty = game.render()
+        self.assertTrue(dirty)
+        self.assertLess(sum(rect.width * rect.height for rect in dirty), 320 * 240 // 4)
+        assert_matches_full_redraw()
+        old_area = game._sprites[entity.id][1]
+        entity.x += 0.5
+        dirty = game.render()
+        new_area = game._sprites[entity.id][1]
+        self.assertNotEqual(old_area, new_area)
+        self.assertNotEqual(old_area.collidelist(dirty), -1)
+        self.assertNotEqual(new_area.collidelist(dirty), -1)
+        assert_matches_full_redraw()
+
+        # A tile change redraws its own area of the terrain
+        world = game.world
+        x, y = 5, 5
+        old = world.resources[y, x]
+        world.set_tile("resources", x, y, NO_RESOURCE if old != NO_RESOURCE else 0)
+        dirty = game.render()
+        tile_size = self.config.WORLD.TILE_SIZE
+        self.assertNotEqual(pygame.Rect(x * tile_size, y * tile_size, tile_size, tile_size).collidelist(dirty), -1)
+        assert_matches_full_redraw()
+
+        # Moving the camera redraws everything
+        game.camera_x += 1
+        self.assertEqual(game.render(), [screen.get_rect()])
+        self.assertEqual(game.render(), [])
+
+    def test_headless_run(self):
+        """Test that a headless run simulates without a screen and reports throughput"""
+        snapshots = []
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        snapshot_path = os.path.join(directory.name, "logs", "snapshots.jsonl")  # A directory yet to be made
+        runner = HeadlessRunner(self.config, entities=3, snapshot_every=10, snapshot_path=snapshot_path,
+                                on_snapshot=snapshots.append)
+        self.assertIsNone(runner.game.screen)
+        start = runner.game.time_system.current_time.to_minutes(self.config.TIME)
+
+        report = runner.run(30)
+        with open(snapshot_path) as snapshot_file:
+            self.assertEqual([json.loads(line)["tick"] for line in snapshot_file], [10, 20, 30])
+        self.assertEqual(report["ticks"], 30)
+        self.assertGreater(report["ticks_per_second"], 0)
+        self.assertEqual(runner.game.time_system.current_time.to_minutes(self.config.TIME), start + 30)
+        self.assertEqual([snapshot["tick"] for snapshot in snapshots], [10, 20, 30])
+        self.assertGreaterEqual(len(snapshots[-1]["entities"]), 3)
+
+    def test_frame_stream(self):
+        """Test that published frames reach /stream viewers from memory as MJPEG parts"""
+        frames = FrameStream()
+        httpd = serve_in_background(frames, port=0)
+        try:
+            connection = http.client.HTTPConnection("localhost", httpd.server_address[1], timeout=5)
+            connection.request("GET", "/stream")
+            response = connection.getresponse()
+            self.assertEqual(response.status, 200)
+            self.assertIn("multipart/x-mixed-replace", response.getheader("Content-Type"))
+
+            jpeg = WebDisplay.surface_to_jpeg(self.screen)
+            self.assertEqual(jpeg[:2], b"\xff\xd8")
+            frames.publish(jpeg)
+
+            self.assertEqual(response.readline(), b"--frame\r\n")
+            headers = {}
+            for line in iter(response.readline, b"\r\n"):
+                name, value = line.decode().split(":", 1)
+                headers[name] = value.strip()
+            self.assertEqual(headers["Content-Type"], "image/jpeg")
+            self.assertEqual(response.read(int(headers["Content-Length"])), jpeg)
+            connection.close()
+        finally:
+            frames.close()
+            httpd.shutdown()
+            httpd.server_close()
+
+    def test_frame_encoder(self):
+        """Test that frames are encoded off the caller's thread, dropping stale ones but never the newest"""
+        frames = FrameStream()
+        encoder = FrameEncoder(frames, queue_size=1)
+        surface = pygame.Surface((320, 240))
+        for shade in range(0, 200, 10):
+            surface.fill((shade, shade, shade))
+            encoder.submit(surface)
+        surface.fill((250, 0, 0))  # Changing the surface after submit must not affect the copy
+
+        sequence, newest = 0, None
+        while newest is None or newest.getpixel((160, 120))[0] < 185:
+            sequence, frame = frames.wait(sequence, 5)
+            self.assertIsNotNone(frame)
+            newest = Image.open(io.BytesIO(frame))
+        self.assertLess(abs(newest.getpixel((160, 120))[1] - 190), 5)
+        encoder.close(5)
+        self.assertEqual(encoder.encoded_count + encoder.dropped_count, 20)
+        self.assertEqual(encoder.encoded_count, frames.sequence)
+
+    def test_delta_stream(self):
+        """Test that ticks send only what changed, and new viewers start from a keyframe"""
+        game = self.game
+        entity = game.entity_manager.create_entity(3, 3)
+        encoder = DeltaEncoder(game)
+
+        # The first tick names the terrain images and lists everything
+        delta, keyframe = encoder.encode()
+        self.assertIn(delta["terrain"], encoder.assets)
+        self.assertEqual(encoder.assets[delta["resources"]][:4], b"\x89PNG")
+        self.assertEqual(delta["entities"], {entity.id: [3.0, 3.0, entity.sprite_key, entity.current_frame]})
+        self.assertIn(f"sprite-{entity.sprite_key}.png", encoder.assets)
+
+        # Nothing changed, then only the moved entity and the changed tile
+        self.assertIsNone(encoder.encode()[0])
+        entity.x += 1
+        x, y = 5, 5
+        resource = NO_RESOURCE if game.world.resources[y, x] != NO_RESOURCE else 0
+        game.world.set_tile("resources", x, y, resource)
+        delta, keyframe = encoder.encode()
+        self.assertEqual(set(delta), {"type", "tick", "entities", "tiles"})
+        self.assertEqual(delta["entities"][entity.id][0], 4.0)
+        self.assertEqual(delta["tiles"], [[x, y, *game.world.renderer.pyramid.levels[0][x, y].tolist(),
+                                           int(resource != NO_RESOURCE)]])
+        self.assertEqual(keyframe["tiles"], delta["tiles"])
+
+        entity.alive = False
+        self.assertEqual(encoder.encode()[0]["removed"], [entity.id])
+
+        # Viewers replay deltas they missed, unless they fell behind the history
+        stream = DeltaStream(encoder.assets, history=2)
+        stream.publish(*encoder.encode())
+        self.assertEqual(json.loads(stream.wait(0, 0)[1][0])["type"], "keyframe")
+        for tick in range(3):
+            entity = game.entity_manager.create_entity(tick, tick)
+            stream.publish(*encoder.encode())
+        sequence, messages = stream.wait(2, 0)
+        self.assertEqual(sequence, 4)
+        self.assertEqual([json.loads(message)["type"] for message in messages], ["delta", "delta"])
+        self.assertEqual(json.loads(stream.wait(1, 0)[1][0])["type"], "keyframe")
+
+        # Over HTTP: server-sent events and cacheable images
+        httpd = serve_in_background(FrameStream(), port=0, deltas=stream)
+        try:
+            connection = http.client.HTTPConnection("localhost", httpd.server_address[1], timeout=5)
+            connection.request("GET", "/updates")
+            response = connection.getresponse()
+            self.assertEqual(response.getheader("Content-Type"), "text/event-stream")
+            line = response.readline()
+            self.assertTrue(line.startswith(b"data: "))
+            state = json.loads(line[len(b"data: "):])
+            self.assertEqual(len(state["entities"]), 3)
+            connection.close()
+
+            connection = http.client.HTTPConnection("localhost", httpd.server_address[1], timeout=5)
+            connection.request("GET", f"/assets/{state['terrain']}")
+            response = connection.getresponse()
+            self.assertIn("immutable", response.getheader("Cache-Control"))
+            self.assertEqual(response.read(), encoder.assets[state["terrain"]])
+            connection.close()
+        finally:
+            stream.close()
+            httpd.shutdown()
+            httpd.server_close()
+
+    def test_snapshot_api(self):
+        """Test that snapshots pack entity arrays, and that HTTP clients follow them and revalidate the world"""
+        game = self.game
+        entities = [game.entity_manager.create_entity(x, 2 * x) for x in range(3)]
+        game.selected_entity = entities[1]
+
+        header, arrays = unpack_arrays(b"".join(game.snapshot().pack()))
+        self.assertEqual(header["time"], game.time_system.get_time_string())
+        self.assertEqual(header["selected"]["info"], game.entity_info_lines(entities[1]))
+        self.assertEqual(arrays["ids"].tolist(), [entity.id for entity in entities])
+        self.assertEqual(arrays["positions"].tolist(), [[0, 0], [1, 2], [2, 4]])
+        self.assertEqual(arrays["sprite_seeds"][0], entities[0].sprite_seed)
+        self.assertEqual(arrays["sprite_sizes"][0], entities[0].sprite_size)
+        header, layers = unpack_arrays(b"".join(game.world_snapshot().pack()))
+        np.testing.assert_array_equal(layers["biomes"], game.world.biomes)
+        self.assertEqual(game.world_snapshot().etag, game.world_snapshot().etag)
+
+        # A stand-in for the game loop, publishing while clients ask
+        snapshots = SnapshotStream()
+        stop = threading.Event()
+        def simulate():
+            while not stop.is_set():
+                game.update()
+                snapshots.follow(game)
+                stop.wait(0.01)
+        loop = threading.Thread(target=simulate)
+        loop.start()
+        httpd = serve_in_background(FrameStream(), port=0, snapshots=snapshots)
+        try:
+            def get(path, headers={}):
+                connection = http.client.HTTPConnection("localhost", httpd.server_address[1], timeout=10)
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+                connection.close()
+                return response, body
+
+            response, body = get("/snapshot")
+            header, arrays = unpack_arrays(body)
+            self.assertLessEqual({entity.id for entity in entities}, set(arrays["ids"].tolist()))
+            response, body = get(f"/snapshot?after={header['minute']}")
+            self.assertEqual(response.status, 200)
+            self.assertGreater(unpack_arrays(body)[0]["minute"], header["minute"])
+
+            response, body = get("/world")
+            etag = response.getheader("ETag")
+            self.assertEqual(unpack_arrays(body)[1]["resources"].shape, game.world.resources.shape)
+            self.assertEqual(get("/world", {"If-None-Match": etag})[0].status, 304)
+        finally:
+            stop.set()
+            loop.join()
+            snapshots.close()
+            httpd.shutdown()
+            httpd.server_close()
+
+    def test_lazy_world_keyframe(self):
+        """Test that a keyframe of a lazy world encodes its generated chunks without generating the rest"""
+        config = Config()
+        config.WORLD.WORLD_WIDTH = config.WORLD.WORLD_HEIGHT = 256
+        config.WORLD.LAZY_CHUNKS = True
+        game = Game(pygame.Surface((320, 240)), config)
+        world = game.world
+        world.get_region("resources", 0, 0, 16, 16)
+        generated = world.chunks.generated_count
+
+        encoder = DeltaEncoder(game)
+        delta, keyframe = encoder.encode()
+        self.assertEqual(world.chunks.generated_count, generated)
+        mask = np.array(Image.open(io.BytesIO(encoder.assets[delta["resources"]]))) > 127
+        np.testing.assert_array_equal(mask[:16, :16], world.get_region("resources", 0, 0, 16, 16) != NO_RESOURCE)
+        self.assertFalse(mask[200:216, 200:216].any())
+
+        # A chunk generated later is sent as changed tiles
+        world.get_region("resources", 200, 200, 201, 201)
+        delta, keyframe = encoder.encode()
+        self.assertEqual(len(delta["tiles"]), 16 * 16)
+
+    def test_lazy_world_snapshot(self):
+        """Test that a lazy world, which has no drainage layers, is served without them"""
+        config = Config()
+        config.WORLD.WORLD_WIDTH = config.WORLD.WORLD_HEIGHT = 256
+        config.WORLD.LAZY_CHUNKS = True
+        game = Game(pygame.Surface((320, 240)), config)
+        self.assertEqual(set(game.world_snapshot().layers), {"biomes", "resources", "elevation"})
+
+        snapshots = SnapshotStream()
+        stop = threading.Event()
+        def simulate():
+            while not stop.is_set():
+                snapshots.follow(game)
+                stop.wait(0.01)
+        loop = threading.Thread(target=simulate)
+        loop.start()
+        httpd = serve_in_background(FrameStream(), port=0, snapshots=snapshots)
+        try:
+            connection = http.client.HTTPConnection("localhost", httpd.server_address[1], timeout=30)
+            connection.request("GET", "/world")
+            response = connection.getresponse()
+            self.assertEqual(response.status, 200)
+            header, layers = unpack_arrays(response.read())
+            connection.close()
+            self.assertEqual(layers["biomes"].shape, (256, 256))
+        finally:
+            stop.set()
+            loop.join()
+            snapshots.close()
+            httpd.shutdown()
+            httpd.server_close()
+
+    def test_http_server(self):
+        """Test keep-alive, static file revalidation, gzipped JSON and rebinding the port at once"""
+        deltas = DeltaStream()
+        deltas.publish(None, {"type": "keyframe", "entities": {}})
+        snapshots = SnapshotStream()
+        for x in range(20):
+            self.game.entity_manager.create_entity(x, x)
+        snapshots.latest(timeout=0)  # Counts as a client asking, so the next snapshot is current
+        snapshots.publish(self.game.snapshot())
+        httpd = serve_in_background(FrameStream(), port=0, deltas=deltas, snapshots=snapshots)
+        port = httpd.server_address[1]
+        try:
+            # An open stream doesn't hold up other requests, and is gzipped as it goes
+            stream = http.client.HTTPConnection("localhost", port, timeout=5)
+            stream.request("GET", "/updates", headers={"Accept-Encoding": "gzip"})
+            response = stream.getresponse()
+            self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+            events = zlib.decompressobj(31).decompress(response.read1(4096))
+            self.assertEqual(json.loads(events[len(b"data: "):])["type"], "keyframe")
+
+            # Requests share one connection, and a current copy is answered with 304
+            connection = http.client.HTTPConnection("localhost", port, timeout=5)
+            connection.request("GET", "/index.html")
+            response = connection.getresponse()
+            self.assertIn(b"EventSource", response.read())
+            self.assertIsNotNone(response.getheader("Last-Modified"))
+            etag = response.getheader("ETag")
+            sock = connection.sock
+            connection.request("GET", "/index.html", headers={"If-None-Match": etag})
+            response = connection.getresponse()
+            response.read()
+            self.assertEqual(response.status, 304)
+            self.assertIs(connection.sock, sock)
+
+            connection.request("GET", "/snapshot?format=json", headers={"Accept-Encoding": "gzip"})
+            response = connection.getresponse()
+            self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+            self.assertEqual(len(json.loads(gzip.decompress(response.read()))["ids"]), 20)
+            self.assertIs(connection.sock, sock)
+            connection.close()
+            stream.close()
+        finally:
+            deltas.close()
+            snapshots.close()
+            httpd.shutdown()
+            httpd.server_close()
+
+        # Closed connections may linger on the old port, but it can be bound again straight away
+        create_server(port).server_close()
+
     def test_game_integration(self):
         """Test that all systems work together"""
         # Set up game with all systems
@@ -1,47 +1,428 @@
 import pygame
-import base64
 import io
+import json
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
 from PIL import Image
+from engine.terrain_generator import NO_RESOURCE
+from engine.snapshot import Snapshot, WorldSnapshot
 
 class WebDisplay:
     """Handles converting Pygame display to web-friendly format"""
-    
+
+    @staticmethod
+    def surface_to_jpeg(surface: pygame.Surface, quality: int = 70) -> bytes:
+        """Encode a Pygame surface as JPEG bytes for the frame stream"""
+        return WebDisplay.pixels_to_jpeg(pygame.image.tobytes(surface, 'RGBX'), surface.get_size(), quality)
+
     @staticmethod
-    def surface_to_image_data(surface):
-        """Convert a Pygame surface to base64 encoded PNG"""
-        # Get the surface data as a string buffer
-        string_image = pygame.image.tostring(surface, 'RGB')
-        
-        # Convert to PIL Image
-        pil_image = Image.frombytes('RGB', surface.get_size(), string_image)
-        
-        # Save to bytes buffer
+    def pixels_to_jpeg(pixels: bytes, size: Tuple[int, int], quality: int = 70) -> bytes:
+        """Encode RGBX pixel bytes (from pygame.image.tobytes, a plain copy for 32-bit surfaces) as JPEG bytes"""
+        pil_image = Image.frombytes('RGB', size, pixels, 'raw', 'RGBX')
         img_buffer = io.BytesIO()
-        pil_image.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        
-        # Convert to base64
-        img_str = base64.b64encode(img_buffer.getvalue()).decode()
-        return f"data:image/png;base64,{img_str}"
+        pil_image.save(img_buffer, format='JPEG', quality=quality)
+        return img_buffer.getvalue()
+
+    @staticmethod
+    def array_to_png(pixels: np.ndarray) -> bytes:
+        """Encode a (y, x) grayscale or (y, x, rgb) array as PNG bytes"""
+        img_buffer = io.BytesIO()
+        Image.fromarray(np.ascontiguousarray(pixels)).save(img_buffer, format='PNG')
+        return img_buffer.getvalue()
 
     @staticmethod
-    def update_webpage(image_data):
-        """Write the image data to index.html"""
-        html_content = [
-            "<!DOCTYPE html>",
-            "<html>",
-            "<head>",
-            "<title>Game Display</title>",
-            "<style>",
-            "body{margin:0;background:#000;display:flex;justify-content:center;align-items:center;height:100vh}",
-            "img{max-width:100vw;max-height:100vh}",
-            "</style>",
-            "</head>",
-            "<body>",
-            f'<img src="data:image/png;base64,{image_data}">',
-            "</body>",
-            "</html>"
-        ]
-        
-        with open('index.html', 'w') as f:
-            f.write('\n'.join(html_content))
+    def frames_to_png(frames: List[pygame.Surface]) -> bytes:
+        """Encode animation frames side by side as one RGBA PNG strip"""
+        width, height = frames[0].get_size()
+        strip = pygame.Surface((width * len(frames), height), pygame.SRCALPHA)
+        for index, frame in enumerate(frames):
+            strip.blit(frame, (index * width, 0))
+        pil_image = Image.frombytes('RGBA', strip.get_size(), pygame.image.tobytes(strip, 'RGBA'))
+        img_buffer = io.BytesIO()
+        pil_image.save(img_buffer, format='PNG')
+        return img_buffer.getvalue()
+
+class FrameStream:
+    """
+    The latest encoded frame, handed from the simulation to streaming clients.
+
+    The simulation publishes frames and every client waits for one newer than
+    the last it sent. Only the newest frame is kept, so a slow client skips
+    straight to the current frame instead of queueing stale ones, and nothing
+    is written to disk.
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.frame: Optional[bytes] = None
+        self.sequence = 0
+        self.viewers = 0
+        self.closed = False
+
+    def publish(self, frame: bytes) -> None:
+        """Replace the current frame and wake every waiting client"""
+        with self._condition:
+            self.frame = frame
+            self.sequence += 1
+            self._condition.notify_all()
+
+    def wait(self, after: int, timeout: Optional[float] = None) -> Tuple[int, Optional[bytes]]:
+        """Wait for a frame newer than sequence number after; returns (sequence, frame or None on timeout)"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.sequence > after or self.closed, timeout)
+            if self.sequence > after:
+                return self.sequence, self.frame
+            return after, None
+
+    def join(self) -> None:
+        """Count a connected client"""
+        with self._condition:
+            self.viewers += 1
+
+    def leave(self) -> None:
+        """Count a client that went away"""
+        with self._condition:
+            self.viewers -= 1
+
+    def close(self) -> None:
+        """Stop the stream, releasing every waiting client"""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+class FrameEncoder:
+    """
+    Encodes frames for a FrameStream on a worker thread.
+
+    submit() copies the screen's pixels and returns; the game loop never
+    waits for compression. At most queue_size frames wait for the worker,
+    and when it falls behind the oldest waiting frame is dropped, so viewers
+    always get the newest one and the tick rate does not depend on how fast
+    frames are encoded.
+    """
+    def __init__(self, frames: FrameStream, quality: int = 70, queue_size: int = 1):
+        self.frames = frames
+        self.quality = quality
+        self.encoded_count = 0
+        self.dropped_count = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="frame-encoder", daemon=True)
+        self._thread.start()
+
+    def submit(self, surface: pygame.Surface) -> None:
+        """Queue a copy of the surface's pixels for encoding, dropping the oldest waiting frame if full"""
+        frame = (pygame.image.tobytes(surface, 'RGBX'), surface.get_size())
+        while True:
+            try:
+                self._queue.put_nowait(frame)
+                return
+            except queue.Full:
+                pass
+            try:
+                self._queue.get_nowait()
+                self.dropped_count += 1
+            except queue.Empty:
+                pass  # The worker took it meanwhile
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop the worker once it finishes the frame it is encoding; waiting frames are dropped"""
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        """Encode and publish queued frames until closed"""
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                return
+            pixels, size = frame
+            try:
+                self.frames.publish(WebDisplay.pixels_to_jpeg(pixels, size, self.quality))
+                self.encoded_count += 1
+            except Exception as e:
+                print(f"Frame encoding error: {e}")
+
+class DeltaEncoder:
+    """
+    Describes the game state for index.html's client-side renderer.
+
+    The terrain goes out as two images at one pixel per tile, biome colors
+    and a resource mask, named by a hash of their content so browsers cache
+    them for good. After that each tick's delta holds only what changed
+    since the previous one: tiles as [x, y, r, g, b, has_resource], entities
+    as id -> [x, y, sprite key, frame], removed entity ids, and the camera
+    and UI text when they differ. A keyframe holds the full state a new
+    viewer starts from. Tile changes pile up in keyframes until there are
+    MAX_PENDING_TILES of them, when the images are encoded afresh.
+    """
+    MAX_PENDING_TILES = 4096
+
+    def __init__(self, game):
+        self.game = game
+        self.tick = 0
+
+        # Encoded images (terrain and entity sprite strips) by name, served at /assets/<name>
+        self.assets: Dict[str, bytes] = {}
+        self._terrain: Dict[str, str] = {}
+        self._tile_version = 0
+        self._pending_tiles: List[list] = []
+        self._entities: Dict[int, list] = {}
+        self._ui: Dict[str, Any] = {}
+
+    def encode(self) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        """Describe the current tick: (delta since the last call or None if nothing changed, keyframe)"""
+        self.tick += 1
+        delta: Dict[str, Any] = {}
+
+        # Tiles, or new terrain images once the changes outgrow a keyframe
+        world = self.game.world
+        changes = world.tile_changes_since(self._tile_version)
+        self._tile_version = world.tile_version
+        if not self._terrain or changes is None or len(self._pending_tiles) + sum(
+                (x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in changes) > self.MAX_PENDING_TILES:
+            self._encode_terrain()
+            delta.update(self._terrain)
+        elif changes:
+            delta["tiles"] = self._encode_tiles(changes)
+            self._pending_tiles.extend(delta["tiles"])
+
+        # Entities that appeared, moved or changed frame, and those that are gone
+        entities = {entity.id: self._encode_entity(entity)
+                    for entity in self.game.entity_manager.entities.values() if entity.alive}
+        moved = {entity_id: state for entity_id, state in entities.items()
+                 if self._entities.get(entity_id) != state}
+        removed = [entity_id for entity_id in self._entities if entity_id not in entities]
+        if moved:
+            delta["entities"] = moved
+        if removed:
+            delta["removed"] = removed
+        self._entities = entities
+
+        ui = self._encode_ui()
+        delta.update((key, value) for key, value in ui.items() if self._ui.get(key) != value)
+        self._ui = ui
+
+        keyframe = {"type": "keyframe", "tick": self.tick, **self._terrain,
+                    "tiles": list(self._pending_tiles), "entities": entities, **ui}
+        if not delta:
+            return None, keyframe
+        return {"type": "delta", "tick": self.tick, **delta}, keyframe
+
+    def _encode_terrain(self) -> None:
+        """
+        Encode the whole map as the color and resource images, forgetting the
+        tile changes they include. A lazy world's images hold only its resident
+        chunks; chunks generated later reach viewers as tile changes.
+        """
+        world = self.game.world
+        colors = world.renderer.pyramid.levels[0].transpose(1, 0, 2)
+        if world.chunks is None:
+            resources = world.get_region("resources", 0, 0, world.width, world.height) != NO_RESOURCE
+        else:
+            resources = np.zeros((world.height, world.width), dtype=bool)
+            size = world.chunks.chunk_size
+            for chunk in world.chunks.chunks.values():
+                layer = chunk.layers["resources"]
+                x0, y0 = chunk.chunk_x * size, chunk.chunk_y * size
+                resources[y0:y0 + layer.shape[0], x0:x0 + layer.shape[1]] = layer != NO_RESOURCE
+
+        # Only the newest images and the ones before them, which viewers may still be loading
+        previous = set(self._terrain.values())
+        for name in [name for name in self.assets if name.startswith(("terrain-", "resources-"))]:
+            if name not in previous:
+                del self.assets[name]
+
+        self._terrain = {}
+        for kind, pixels in (("terrain", colors), ("resources", resources.astype(np.uint8) * 255)):
+            png = WebDisplay.array_to_png(pixels)
+            name = f"{kind}-{zlib.crc32(png):08x}.png"
+            self.assets[name] = png
+            self._terrain[kind] = name
+        self._pending_tiles = []
+
+    def _encode_tiles(self, changes: List[Tuple[int, int, int, int]]) -> List[list]:
+        """[x, y, r, g, b, has_resource] for every tile in the changed rectangles"""
+        world = self.game.world
+        colors = world.renderer.pyramid.levels[0]
+        tiles = []
+        for x0, y0, x1, y1 in changes:
+            resources = world.get_region("resources", x0, y0, x1, y1)
+            for y in range(y0, y1):
+                for x in range(x0, x1):
+                    r, g, b = colors[x, y].tolist()
+                    tiles.append([x, y, r, g, b, int(resources[y - y0, x - x0] != NO_RESOURCE)])
+        return tiles
+
+    def _encode_entity(self, entity) -> list:
+        """An entity's position, sprite and frame, encoding its sprite strip the first time it is seen"""
+        name = f"sprite-{entity.sprite_key}.png"
+        if name not in self.assets:
+            self.assets[name] = WebDisplay.frames_to_png(entity.animation_frames)
+        return [round(float(entity.x), 2), round(float(entity.y), 2), entity.sprite_key, int(entity.current_frame)]
+
+    def _encode_ui(self) -> Dict[str, Any]:
+        """The view and the text drawn over it"""
+        game = self.game
+        config = game.config
+        selected = game.selected_entity
+        return {
+            "screen": [config.SCREEN_WIDTH, config.SCREEN_HEIGHT],
+            "world": [game.world.width, game.world.height],
+            "tile_size": config.WORLD.TILE_SIZE,
+            "camera": [game.camera_x, game.camera_y, game.zoom_level],
+            "minimap": config.DISPLAY.MINIMAP_SIZE if game.show_minimap else 0,
+            "time": game.time_system.get_time_string(),
+            "info": game.entity_info_lines(selected) if selected else [],
+        }
+
+class DeltaStream:
+    """
+    DeltaEncoder messages, handed from the simulation to browser viewers.
+
+    Recent deltas are kept in order, so a viewer a few ticks behind replays
+    them. A new viewer, or one that fell further behind than the history,
+    gets the latest keyframe instead and carries on from there. Each message
+    is serialized once and shared by every viewer; keyframes only when a
+    viewer asks for one.
+    """
+    def __init__(self, assets: Optional[Dict[str, bytes]] = None, history: int = 256):
+        self._condition = threading.Condition()
+        self._deltas: deque = deque(maxlen=history)
+        self._keyframe: Optional[Dict[str, Any]] = None
+        self._keyframe_json: Optional[bytes] = None
+        self.assets = assets if assets is not None else {}
+        self.sequence = 0
+        self.viewers = 0
+        self.closed = False
+
+    def publish(self, delta: Optional[Dict[str, Any]], keyframe: Dict[str, Any]) -> None:
+        """Add a tick's delta (None if nothing changed) and replace the keyframe, waking every viewer"""
+        message = json.dumps(delta, separators=(',', ':')).encode() if delta is not None else None
+        with self._condition:
+            self._keyframe = keyframe
+            self._keyframe_json = None
+            if message is None and self.sequence > 0:
+                return  # Nothing for viewers to replay
+            self.sequence += 1
+            if message is not None:
+                self._deltas.append((self.sequence, message))
+            self._condition.notify_all()
+
+    def wait(self, after: int, timeout: Optional[float] = None) -> Tuple[int, List[bytes]]:
+        """Wait for messages newer than sequence number after; returns (sequence, messages, empty on timeout)"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.sequence > after or self.closed, timeout)
+            if self.sequence <= after:
+                return after, []
+            if after > 0 and self._deltas and self._deltas[0][0] <= after + 1:
+                return self.sequence, [message for sequence, message in self._deltas if sequence > after]
+            sequence, keyframe, message = self.sequence, self._keyframe, self._keyframe_json
+
+        if message is None:
+            message = json.dumps(keyframe, separators=(',', ':')).encode()
+            with self._condition:
+                if self._keyframe is keyframe:
+                    self._keyframe_json = message
+        return sequence, [message]
+
+    def join(self) -> None:
+        """Count a connected viewer"""
+        with self._condition:
+            self.viewers += 1
+
+    def leave(self) -> None:
+        """Count a viewer that went away"""
+        with self._condition:
+            self.viewers -= 1
+
+    def close(self) -> None:
+        """Stop the stream, releasing every waiting viewer"""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+class SnapshotStream:
+    """
+    The latest Game.snapshot() and Game.world_snapshot(), handed from the
+    simulation to HTTP clients.
+
+    Both are taken on the simulation's thread, where the game state is
+    consistent. Snapshots are only taken while clients ask for them, until
+    IDLE_SECONDS pass without a request, and the world layers only when a
+    client asks for a newer version than the last copy.
+    """
+    IDLE_SECONDS = 5.0
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._requested_at = float('-inf')
+        self.snapshot: Optional[Snapshot] = None
+        self.sequence = 0
+        self.world: Optional[WorldSnapshot] = None
+        self.world_wanted = False
+        self.closed = False
+
+    @property
+    def active(self) -> bool:
+        """Whether a client asked for a snapshot recently"""
+        return time.monotonic() - self._requested_at < self.IDLE_SECONDS
+
+    def follow(self, game) -> None:
+        """Publish the game's state after a tick, if clients are asking for it"""
+        if not self.active:
+            return
+        self.publish(game.snapshot())
+        if self.world_wanted:
+            self.publish_world(game.world_snapshot())
+
+    def publish(self, snapshot: Snapshot) -> None:
+        """Replace the current snapshot and wake every waiting client"""
+        with self._condition:
+            self.snapshot = snapshot
+            self.sequence += 1
+            self._condition.notify_all()
+
+    def publish_world(self, world: WorldSnapshot) -> None:
+        """Replace the world layers and wake every client waiting for them"""
+        with self._condition:
+            self.world = world
+            self.world_wanted = False
+            self._condition.notify_all()
+
+    def latest(self, after_minute: Optional[int] = None, timeout: Optional[float] = None) -> Optional[Snapshot]:
+        """Wait for a current snapshot, from a game minute after after_minute if given; None on timeout"""
+        with self._condition:
+            # Snapshots stop while nobody asks, so the last one may be out of date
+            sequence = self.sequence if not self.active else 0
+            self._requested_at = time.monotonic()
+
+            def ready():
+                return self.sequence > sequence and (after_minute is None or self.snapshot.minute > after_minute)
+            self._condition.wait_for(lambda: ready() or self.closed, timeout)
+            return self.snapshot if ready() else None
+
+    def world_at(self, version: int, timeout: Optional[float] = None) -> Optional[WorldSnapshot]:
+        """Wait for the world layers at version or later, asking the simulation for a copy; None on timeout"""
+        def ready():
+            return self.world is not None and self.world.version >= version
+
+        with self._condition:
+            if not ready():
+                self.world_wanted = True
+            self._condition.wait_for(lambda: ready() or self.closed, timeout)
+            return self.world if ready() else None
+
+    def close(self) -> None:
+        """Stop the stream, releasing every waiting client"""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()